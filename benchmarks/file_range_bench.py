@@ -0,0 +1,136 @@
+"""
+视频预览拖动（seek）延迟基准测试
+
+模拟前端预览拖动进度条：每次 seek 到随机位置并读取 --read-kb 数据，对比：
+
+    full        不带 Range，从头下载直到读到 seek 位置之后的数据（不支持 Range 时的行为）
+    open-range  Range: bytes=N-（浏览器 <video> 的请求方式），读到需要的数据后断开
+    range       Range: bytes=N-(N+read)，有界区间
+    revalidate  带 If-None-Match 重新验证缓存（命中返回 304）
+
+默认在本地启动 Flask 开发服务器（注册 file_bp）并在 videoFile/.bench/ 下生成测试文件，结束后删除；
+也可以用 --url 指定已运行的服务（如 gunicorn 下验证 sendfile），此时 --file-path 为 videoFile 下的相对路径。
+
+    python benchmarks/file_range_bench.py --size-mb 512 --seeks 20
+    python benchmarks/file_range_bench.py --url http://127.0.0.1:5409 --file-path 2024/01/01/xxx.mp4
+"""
+import argparse
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conf import BASE_DIR  # noqa: E402
+
+
+def _request(host: str, port: int, path: str, headers: dict, read_bytes: int = None):
+    """发送请求，读取 read_bytes 字节（None 表示读完）后断开，返回 (状态码, 响应头, 读取字节数, 耗时秒)"""
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        received = 0
+        while read_bytes is None or received < read_bytes:
+            data = response.read(min(256 * 1024, read_bytes - received) if read_bytes else 256 * 1024)
+            if not data:
+                break
+            received += len(data)
+        return response.status, dict(response.getheaders()), received, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def _start_local_server():
+    from flask import Flask
+    from werkzeug.serving import make_server
+    from routes.file_routes import file_bp
+
+    app = Flask(__name__)
+    app.register_blueprint(file_bp)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _summary(values):
+    values = sorted(values)
+    return (
+        sum(values) / len(values) * 1000,
+        values[len(values) // 2] * 1000,
+        values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video preview seek latency on /getFile")
+    parser.add_argument("--url", help="已运行的服务地址（默认本地启动 Flask 开发服务器）")
+    parser.add_argument("--file-path", help="videoFile 下的相对路径（配合 --url 使用）")
+    parser.add_argument("--size-mb", type=int, default=256, help="生成的测试文件大小（MB）")
+    parser.add_argument("--seeks", type=int, default=20)
+    parser.add_argument("--read-kb", type=int, default=1024, help="每次 seek 后读取的数据量（KB）")
+    parser.add_argument("--skip-full", action="store_true", help="跳过 full（大文件时很慢）")
+    args = parser.parse_args()
+
+    server = None
+    bench_file = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+        file_path = args.file_path
+    else:
+        bench_dir = Path(BASE_DIR / "videoFile" / ".bench")
+        bench_dir.mkdir(parents=True, exist_ok=True)
+        bench_file = bench_dir / f"seek_{args.size_mb}mb.mp4"
+        with open(bench_file, "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+        server = _start_local_server()
+        host, port = "127.0.0.1", server.server_port
+        file_path = f".bench/{bench_file.name}"
+
+    path = f"/getFile?file_path={quote(file_path)}"
+    read_bytes = args.read_kb * 1024
+    try:
+        status, headers, _, _ = _request(host, port, path, {"Range": "bytes=0-0"}, read_bytes=1)
+        size = int(headers["Content-Range"].rsplit("/", 1)[1]) if status == 206 else int(headers["Content-Length"])
+        etag = headers.get("ETag")
+        print(f"file size: {size / 1024 / 1024:.0f} MB, ETag: {etag}, first response: {status}")
+
+        offsets = [random.randrange(0, max(1, size - read_bytes)) for _ in range(args.seeks)]
+        modes = {
+            "open-range": lambda n: _request(host, port, path, {"Range": f"bytes={n}-"}, read_bytes),
+            "range": lambda n: _request(host, port, path, {"Range": f"bytes={n}-{n + read_bytes - 1}"}),
+            "revalidate": lambda n: _request(host, port, path, {"If-None-Match": etag or '""'}),
+        }
+        if not args.skip_full:
+            modes = {"full": lambda n: _request(host, port, path, {}, n + read_bytes), **modes}
+
+        print(f"\n{'mode':<12}{'status':>8}{'avg ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'MB/seek':>10}")
+        for name, run in modes.items():
+            timings, received, statuses = [], 0, set()
+            for offset in offsets:
+                status, _, got, elapsed = run(offset)
+                statuses.add(status)
+                timings.append(elapsed)
+                received += got
+            avg, p50, p95 = _summary(timings)
+            status_text = ",".join(str(s) for s in sorted(statuses))
+            print(f"{name:<12}{status_text:>8}{avg:>10.1f}{p50:>10.1f}{p95:>10.1f}"
+                  f"{received / len(offsets) / 1024 / 1024:>10.2f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if bench_file is not None and bench_file.exists():
+            bench_file.unlink()
+
+
+if __name__ == "__main__":
+    main()
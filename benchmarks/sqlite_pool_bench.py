@@ -0,0 +1,124 @@
+"""
+SQLite 连接池基准测试
+
+对比「每次查询新建连接 + 默认 rollback journal」与 utils.sqlite_pool（按线程复用连接 + WAL）
+在读、写、读写混合（多线程）场景下的 queries/sec。使用临时数据库，不影响 db/database.db。
+
+    python benchmarks/sqlite_pool_bench.py --rows 5000 --ops 20000 --threads 4
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.sqlite_pool import SQLitePool  # noqa: E402
+
+
+def _create_db(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE publish_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            platform_type INTEGER NOT NULL,
+            account_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            status INTEGER DEFAULT 0,
+            update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO publish_tasks (platform_type, account_id, title) VALUES (?, ?, ?)",
+        [(i % 7 + 1, i % 50, f"title {i}") for i in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _legacy_connection(path: str):
+    # 与改造前各 service 的 _get_connection 一致
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _read(get_conn, rows: int):
+    conn = get_conn()
+    try:
+        conn.execute("SELECT * FROM publish_tasks WHERE id = ?", (random.randint(1, rows),)).fetchone()
+    finally:
+        conn.close()
+
+
+def _write(get_conn, rows: int):
+    conn = get_conn()
+    try:
+        conn.execute(
+            "UPDATE publish_tasks SET status = ?, update_time = CURRENT_TIMESTAMP WHERE id = ?",
+            (random.randint(0, 4), random.randint(1, rows)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _run(get_conn, rows: int, ops: int, threads: int, write_ratio: float):
+    per_thread = ops // threads
+    errors = []
+
+    def worker():
+        for _ in range(per_thread):
+            try:
+                if random.random() < write_ratio:
+                    _write(get_conn, rows)
+                else:
+                    _read(get_conn, rows)
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-query sqlite3.connect vs utils.sqlite_pool")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("read", 1, 0.0),
+        ("write", 1, 1.0),
+        (f"mixed 20% write x{args.threads} threads", args.threads, 0.2),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'scenario':<32}{'legacy q/s':>14}{'pool q/s':>14}{'speedup':>10}{'lock errors':>14}")
+        for name, threads, write_ratio in scenarios:
+            legacy_db = os.path.join(tmp, f"legacy_{threads}_{write_ratio}.db")
+            pooled_db = os.path.join(tmp, f"pooled_{threads}_{write_ratio}.db")
+            _create_db(legacy_db, args.rows)
+            _create_db(pooled_db, args.rows)
+            pool = SQLitePool(pooled_db)
+
+            legacy_qps, legacy_errors = _run(lambda: _legacy_connection(legacy_db), args.rows, args.ops, threads, write_ratio)
+            pooled_qps, pooled_errors = _run(pool.connection, args.rows, args.ops, threads, write_ratio)
+            print(f"{name:<32}{legacy_qps:>14.0f}{pooled_qps:>14.0f}{pooled_qps / legacy_qps:>9.1f}x"
+                  f"{f'{legacy_errors}/{pooled_errors}':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+上传等待方式基准测试
+
+在本地夹具页面（benchmarks/fixtures/upload_page.html，模拟标题区域渲染、视频上传、发布跳转）上对比：
+
+    legacy   改造前的写法：固定 asyncio.sleep 等待 + 固定间隔轮询上传状态 + 观感延迟
+    normal   utils.waits 事件等待，保留观感延迟（UPLOAD_PACING=normal）
+    fast     utils.waits 事件等待，去掉观感延迟（UPLOAD_PACING=fast）
+
+输出每种方式的分步耗时（StepTimer 报告）。需要安装 playwright 及 chromium。
+
+    python benchmarks/upload_pacing_bench.py --render 800 --upload 3000 --publish 500 --rounds 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from playwright.async_api import async_playwright  # noqa: E402
+
+from utils.waits import StepTimer, pace, wait_for_any, wait_visible  # noqa: E402
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "upload_page.html"
+
+
+async def _legacy_flow(page, video: str, timer: StepTimer):
+    # 与改造前各 uploader 的等待方式一致
+    with timer.step("render"):
+        await page.locator('#file').set_input_files(video)
+        await asyncio.sleep(1)
+        await page.locator('input.d-text').fill("标题")
+    with timer.step("upload"):
+        while True:
+            if await page.locator('button#publish.btn-ready').count():
+                break
+            await asyncio.sleep(2)
+    with timer.step("publish"):
+        await page.locator('button#publish').click()
+        while '#success' not in page.url:
+            await asyncio.sleep(0.5)
+    with timer.step("pacing"):
+        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+
+
+async def _event_flow(page, video: str, timer: StepTimer):
+    with timer.step("render"):
+        await page.locator('#file').set_input_files(video)
+        await wait_visible(page, 'input.d-text')
+        await page.locator('input.d-text').fill("标题")
+    with timer.step("upload"):
+        while await wait_for_any(page, {'done': 'button#publish.btn-ready'}, timeout=2000) != 'done':
+            pass
+    with timer.step("publish"):
+        await page.locator('button#publish').click()
+        await wait_visible(page, 'div.done')
+    with timer.step("pacing"):
+        await pace(2)  # 这里延迟是为了方便眼睛直观的观看
+
+
+async def _run(args):
+    url = f"{FIXTURE.as_uri()}?render={args.render}&upload={args.upload}&publish={args.publish}"
+    flows = [("legacy", "normal", _legacy_flow), ("normal", "normal", _event_flow), ("fast", "fast", _event_flow)]
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+        f.write(b"\0" * 1024)
+        video = f.name
+    try:
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(headless=True)
+            totals = {}
+            for name, mode, flow in flows:
+                os.environ["UPLOAD_PACING"] = mode
+                for i in range(args.rounds):
+                    page = await browser.new_page()
+                    await page.goto(url)
+                    timer = StepTimer(f"{name} #{i + 1}")
+                    await flow(page, video, timer)
+                    await page.close()
+                    print(timer.format())
+                    totals.setdefault(name, []).append(timer.report()['total'])
+            await browser.close()
+    finally:
+        os.unlink(video)
+
+    baseline = sum(totals["legacy"]) / len(totals["legacy"])
+    print(f"\n{'mode':<10}{'avg total (s)':>16}{'vs legacy':>12}")
+    for name, values in totals.items():
+        avg = sum(values) / len(values)
+        print(f"{name:<10}{avg:>16.2f}{avg - baseline:>+11.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixed sleeps vs utils.waits on a local upload fixture page")
+    parser.add_argument("--render", type=int, default=800, help="标题区域出现耗时（毫秒）")
+    parser.add_argument("--upload", type=int, default=3000, help="视频上传耗时（毫秒）")
+    parser.add_argument("--publish", type=int, default=500, help="发布跳转耗时（毫秒）")
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
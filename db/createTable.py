@@ -58,6 +58,7 @@ CREATE TABLE IF NOT EXISTS user_info (
             auto_refresh_enabled INTEGER DEFAULT 1,   -- 是否启用自动刷新：0否 1是
             refresh_interval_days INTEGER DEFAULT 7,   -- 刷新间隔（天）
             next_refresh_time DATETIME,               -- 下次刷新时间
+            predicted_expiry_time DATETIME,           -- 预测的 Cookie 过期时间（根据验证历史估计）
             last_used_time DATETIME,                  -- 最后使用时间（发布任务时更新）
             publish_count INTEGER DEFAULT 0,          -- 发布次数
             success_count INTEGER DEFAULT 0,          -- 成功次数
@@ -80,7 +81,12 @@ CREATE TABLE IF NOT EXISTS user_info (
             duration REAL,                            -- 视频时长（秒，仅视频文件，可选）
             width INTEGER,                            -- 宽度（像素，仅图片/视频，可选）
             height INTEGER,                           -- 高度（像素，仅图片/视频，可选）
+            video_codec TEXT,                         -- 视频编码（如 avc1/h264，媒体探测填充）
+            probe_status TEXT,                        -- 媒体探测状态：NULL未探测 done成功 failed失败
+            probe_error TEXT,                         -- 媒体探测失败原因
             md5_hash TEXT,                            -- MD5哈希值（用于去重，可选）
+            sha256_hash TEXT,                         -- SHA-256哈希值（上传时计算）
+            blob_id INTEGER,                          -- 内容ID（关联 media_blobs 表，相同内容共用一个文件）
             upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,  -- 上传时间
             last_used_time DATETIME,                  -- 最后使用时间
             use_count INTEGER DEFAULT 0,             -- 使用次数
@@ -116,6 +122,10 @@ CREATE TABLE IF NOT EXISTS user_info (
             create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
             update_time DATETIME DEFAULT CURRENT_TIMESTAMP,
             publish_time DATETIME,                    -- 实际发布时间
+            lease_owner TEXT,                         -- 执行中任务的租约持有者（worker ID）
+            lease_expires_at REAL,                    -- 租约过期时间（Unix 时间戳，心跳续期）
+            not_before REAL,                          -- 失败重试时最早可执行时间（Unix 时间戳）
+            error_kind TEXT,                          -- 最近一次错误类型：auth/transient/timeout/permanent
             FOREIGN KEY (account_id) REFERENCES user_info(id) ON DELETE CASCADE,
             FOREIGN KEY (file_id) REFERENCES file_records(id) ON DELETE SET NULL
         )
@@ -154,6 +164,7 @@ CREATE TABLE IF NOT EXISTS user_info (
             error_message TEXT,                       -- 错误信息（失败时）
             verify_time DATETIME DEFAULT CURRENT_TIMESTAMP,
             duration_ms INTEGER,                      -- 验证耗时（毫秒）
+            predicted_expiry_time DATETIME,           -- 验证失败时账号的预测过期时间（用于对比预测与实际）
             FOREIGN KEY (account_id) REFERENCES user_info(id) ON DELETE CASCADE
         )
         ''')
@@ -202,10 +213,74 @@ CREATE TABLE IF NOT EXISTS user_info (
             is_enabled INTEGER DEFAULT 1,            -- 是否启用：0禁用 1启用
             create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
             update_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            remark TEXT                               -- 备注
+            remark TEXT,                              -- 备注
+            health_status TEXT DEFAULT 'unknown',    -- 健康状态：unknown/healthy/unhealthy
+            last_latency_ms INTEGER,                 -- 最近一次探测延迟（毫秒）
+            success_rate REAL,                       -- 探测成功率（指数滑动平均）
+            consecutive_failures INTEGER DEFAULT 0,  -- 连续探测失败次数
+            check_count INTEGER DEFAULT 0,           -- 累计探测次数
+            last_check_time DATETIME,                -- 最近探测时间
+            last_check_error TEXT                    -- 最近探测失败原因
         )
 ''')
 
+        # 9. 创建上传步骤耗时表
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_step_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER,                          -- 关联publish_tasks.id
+            platform_type INTEGER NOT NULL,           -- 平台类型
+            account_id INTEGER,                       -- 账号ID
+            step TEXT NOT NULL,                       -- 步骤名：launch/navigate/attach_file/wait_transcode/fill_meta/publish/confirm
+            duration_ms INTEGER NOT NULL,             -- 步骤耗时（毫秒）
+            success INTEGER NOT NULL,                 -- 步骤是否完成：0失败 1成功
+            pacing TEXT,                              -- 节奏模式（UPLOAD_PACING）
+            create_time DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # 10. 创建分块上传会话表
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            upload_id TEXT PRIMARY KEY,               -- 会话ID
+            filename TEXT NOT NULL,                   -- 原始文件名
+            size INTEGER NOT NULL,                    -- 文件总大小（字节）
+            chunk_size INTEGER NOT NULL,              -- 分块大小（字节）
+            received_bitmap BLOB NOT NULL,            -- 已接收分块位图（第 i 位表示第 i 块）
+            received_bytes INTEGER DEFAULT 0,         -- 已接收字节数
+            temp_path TEXT NOT NULL,                  -- 预分配的临时文件路径
+            status TEXT DEFAULT 'uploading',          -- 状态：uploading/completed/aborted
+            file_id INTEGER,                          -- 完成后关联 file_records.id
+            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # 11. 创建内容去重表（相同 MD5 的文件只保存一份，file_records.blob_id 引用）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_blobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            md5_hash TEXT NOT NULL UNIQUE,            -- 内容MD5（去重键）
+            sha256_hash TEXT,                         -- 内容SHA-256
+            file_path TEXT NOT NULL,                  -- 磁盘文件相对路径（videoFile 下）
+            size_bytes INTEGER NOT NULL,              -- 文件大小（字节）
+            ref_count INTEGER DEFAULT 1,              -- 引用该文件的 file_records 数量
+            create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # 12. 创建发布限速令牌桶表（多个 worker 进程共享限速状态）
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            dimension TEXT NOT NULL,                  -- 维度：platform/account/proxy
+            bucket_key TEXT NOT NULL,                 -- 平台类型/账号ID/代理地址
+            tokens REAL NOT NULL,                     -- 上次更新时的令牌数
+            updated REAL NOT NULL,                    -- 上次更新时间（Unix 时间戳）
+            PRIMARY KEY (dimension, bucket_key)
+        )
+        ''')
+
         # 创建索引
         create_indexes(cursor)
 
@@ -235,6 +310,9 @@ def create_indexes(cursor):
         
         # file_records 表索引
         ("idx_file_records_uuid", "file_records", "uuid"),
+        ("idx_file_records_md5_hash", "file_records", "md5_hash"),
+        ("idx_file_records_blob_id", "file_records", "blob_id"),
+        ("idx_file_records_file_path", "file_records", "file_path"),
         ("idx_file_records_file_type", "file_records", "file_type"),
         ("idx_file_records_upload_time", "file_records", "upload_time"),
         ("idx_file_records_is_deleted", "file_records", "is_deleted"),
@@ -260,6 +338,13 @@ def create_indexes(cursor):
         # platform_statistics 表索引
         ("idx_platform_stats_date", "platform_statistics", "stat_date"),
         ("idx_platform_stats_platform", "platform_statistics", "platform_type"),
+
+        # upload_step_metrics 表索引
+        ("idx_upload_step_metrics_task", "upload_step_metrics", "task_id"),
+        ("idx_upload_step_metrics_platform", "upload_step_metrics", "platform_type, create_time"),
+
+        # upload_sessions 表索引
+        ("idx_upload_sessions_status", "upload_sessions", "status, update_time"),
     ]
     
     for idx_name, table_name, column_name in indexes:
@@ -78,6 +78,10 @@ CREATE TABLE IF NOT EXISTS publish_tasks (
     create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
     update_time DATETIME DEFAULT CURRENT_TIMESTAMP,
     publish_time DATETIME,                    -- 实际发布时间
+    lease_owner TEXT,                         -- 执行中任务的租约持有者（worker ID）
+    lease_expires_at REAL,                    -- 租约过期时间（Unix 时间戳，心跳续期）
+    not_before REAL,                          -- 失败重试时最早可执行时间（Unix 时间戳）
+    error_kind TEXT,                          -- 最近一次错误类型：auth/transient/timeout/permanent
     FOREIGN KEY (account_id) REFERENCES user_info(id) ON DELETE CASCADE,
     FOREIGN KEY (file_id) REFERENCES file_records(id) ON DELETE SET NULL
 );
@@ -116,6 +120,7 @@ CREATE TABLE IF NOT EXISTS cookie_verification_log (
     error_message TEXT,                       -- 错误信息（失败时）
     verify_time DATETIME DEFAULT CURRENT_TIMESTAMP,
     duration_ms INTEGER,                      -- 验证耗时（毫秒）
+    predicted_expiry_time DATETIME,           -- 验证失败时账号的预测过期时间（用于对比预测与实际）
     FOREIGN KEY (account_id) REFERENCES user_info(id) ON DELETE CASCADE
 );
 
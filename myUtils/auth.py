@@ -7,6 +7,8 @@ from playwright.async_api import async_playwright
 from xhs import XhsClient
 
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS
+from myUtils.cookie_cache import get_cookie_check_cache
+from myUtils.cookie_probe import get_cookie_probe
 from utils.base_social_media import set_init_script
 from utils.log import tencent_logger, kuaishou_logger, douyin_logger
 from pathlib import Path
@@ -153,7 +155,50 @@ async def cookie_auth_xhs(account_file, account_id=None):
             return True
 
 
-async def check_cookie(type, file_path, account_id=None):
+async def check_cookie(type, file_path, account_id=None, use_cache=True):
+    """
+    校验账号 Cookie 是否有效
+
+    COOKIE_CHECK_MODE（默认 auto）：
+        auto     先用 HTTP 会话接口探测（myUtils.cookie_probe），无法判断时再启动浏览器校验
+        http     只用 HTTP 探测，无法判断时视为失效（不启动浏览器）
+        browser  始终启动浏览器校验
+
+    结果按 (平台, Cookie 文件内容, 代理) 缓存（myUtils.cookie_cache），use_cache=False 时强制重新校验。
+    """
+    cookie_file = Path(BASE_DIR / "cookiesFile" / file_path)
+    proxy_config = None
+    if account_id:
+        from myUtils.proxy_helper import get_proxy_config_dict
+        proxy_config = get_proxy_config_dict(account_id)
+    proxy_server = proxy_config['server'] if proxy_config else None
+
+    cache = get_cookie_check_cache()
+    if use_cache:
+        cached = cache.get(type, cookie_file, proxy_server)
+        if cached is not None:
+            return cached
+
+    result = await _check_cookie_uncached(type, cookie_file, file_path, account_id, proxy_config)
+    cache.put(type, cookie_file, proxy_server, result)
+    return result
+
+
+async def _check_cookie_uncached(type, cookie_file, file_path, account_id, proxy_config):
+    mode = os.environ.get("COOKIE_CHECK_MODE", "auto").lower()
+    if mode != "browser":
+        probe = get_cookie_probe()
+        if probe.supports(type):
+            result = await probe.probe(type, cookie_file, proxy_config)
+            if result is not None:
+                return result
+            if mode == "http":
+                print(f"[CookieProbe] platform={type} 无法判断 Cookie 状态，按失效处理")
+                return False
+    return bool(await check_cookie_with_browser(type, file_path, account_id))
+
+
+async def check_cookie_with_browser(type, file_path, account_id=None):
     match type:
         # 小红书
         case 1:
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cookie 校验结果缓存
+按 (平台, Cookie 文件内容哈希, 代理) 缓存 check_cookie 的结果，短时间内重复校验同一份 Cookie 时不再启动浏览器。
+Cookie 文件被重写后内容哈希变化，旧结果自然失效；写入 Cookie 文件的地方也可显式调用 invalidate()。
+
+配置（环境变量）：
+    COOKIE_CHECK_CACHE_TTL_SECONDS            有效结果缓存时间（默认300秒，0 表示关闭缓存）
+    COOKIE_CHECK_CACHE_NEGATIVE_TTL_SECONDS   失效结果缓存时间（默认30秒，失效多由网络/风控引起，缓存时间更短）
+    COOKIE_CHECK_CACHE_MAX_ENTRIES            最大缓存条数（默认10000，超出后淘汰最早写入的）
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+
+class CookieCheckCache:
+    """Cookie 校验结果 TTL 缓存（线程安全）"""
+
+    def __init__(self, ttl: float = None, negative_ttl: float = None, max_entries: int = None):
+        self.ttl = float(ttl if ttl is not None else os.environ.get("COOKIE_CHECK_CACHE_TTL_SECONDS", "300"))
+        self.negative_ttl = float(
+            negative_ttl if negative_ttl is not None
+            else os.environ.get("COOKIE_CHECK_CACHE_NEGATIVE_TTL_SECONDS", "30")
+        )
+        self.max_entries = int(max_entries or os.environ.get("COOKIE_CHECK_CACHE_MAX_ENTRIES", "10000"))
+        self._entries: "OrderedDict[Tuple, Tuple[bool, float]]" = OrderedDict()
+        # 文件路径 -> (mtime_ns, size, 内容哈希)，文件未变化时不重复计算哈希
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _file_digest(self, path: Union[str, Path]) -> Optional[str]:
+        key = str(path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        with self._lock:
+            memo = self._digests.get(key)
+        if memo and memo[0] == st.st_mtime_ns and memo[1] == st.st_size:
+            return memo[2]
+        try:
+            digest = hashlib.sha256(Path(key).read_bytes()).hexdigest()
+        except OSError:
+            return None
+        with self._lock:
+            self._digests[key] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def _key(self, platform_type: int, path: Union[str, Path], proxy: Optional[str]) -> Optional[Tuple]:
+        digest = self._file_digest(path)
+        if digest is None:
+            return None
+        return int(platform_type), digest, proxy or ''
+
+    def get(self, platform_type: int, path: Union[str, Path], proxy: Optional[str] = None) -> Optional[bool]:
+        """
+        查询缓存
+        :returns: 缓存的校验结果；未命中/已过期返回 None
+        """
+        if not self.enabled:
+            return None
+        key = self._key(platform_type, path, proxy)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, platform_type: int, path: Union[str, Path], proxy: Optional[str], result: bool):
+        """写入校验结果"""
+        ttl = self.ttl if result else self.negative_ttl
+        if not self.enabled or ttl <= 0:
+            return
+        key = self._key(platform_type, path, proxy)
+        if key is None:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (bool(result), time.monotonic() + ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, path: Union[str, Path] = None):
+        """
+        使缓存失效
+        :param path: Cookie 文件路径（写入/删除 Cookie 文件后调用）；为空时清空全部缓存
+        """
+        with self._lock:
+            self._stats['invalidations'] += 1
+            if path is None:
+                self._entries.clear()
+                self._digests.clear()
+                return
+            memo = self._digests.pop(str(path), None)
+            if memo:
+                for key in [k for k in self._entries if k[1] == memo[2]]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats.update({'ttl': self.ttl, 'negative_ttl': self.negative_ttl})
+        return stats
+
+
+_cache: Optional[CookieCheckCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cookie_check_cache() -> CookieCheckCache:
+    """获取进程内共享的校验结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CookieCheckCache()
+        return _cache
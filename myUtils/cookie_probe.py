@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cookie 轻量探测（不启动浏览器）
+读取 Playwright 导出的 storage_state JSON，把对应域名的 Cookie 通过 httpx 发送到平台的会话接口，
+根据响应判断 Cookie 是否有效：
+
+    True   接口返回已登录且带有用户信息
+    False  Cookie 已过期 / 接口返回未登录 / 跳转到登录页
+    None   无法判断（网络错误、风控验证、接口改版、未配置的平台等），由调用方回退到浏览器校验
+
+平台接口可能随平台改版变化，可通过环境变量覆盖，如：
+    COOKIE_PROBE_URL_3=https://creator.douyin.com/web/api/media/user/info/
+本地测试时也可将接口指向桩服务（CookieProbe(endpoints=...)）。
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+_LOGIN_MARKERS = ('login', 'passport', 'signin')
+
+
+@dataclass
+class ProbeEndpoint:
+    """平台会话接口及响应解析规则"""
+    url: str
+    method: str = 'GET'
+    json_body: Optional[Dict] = None
+    code_field: str = 'code'                   # 业务状态码字段
+    ok_codes: Tuple = (0,)                     # 已登录的状态码
+    logout_codes: Tuple = ()                   # 明确表示未登录/登录过期的状态码
+    user_field: str = 'data'                   # 已登录时必须非空的用户信息字段（支持 a.b 路径）
+    session_cookies: Tuple[str, ...] = ()      # 会话 Cookie 名称，全部过期时无需请求即可判定失效
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+DEFAULT_ENDPOINTS: Dict[int, ProbeEndpoint] = {
+    # 小红书
+    1: ProbeEndpoint(
+        url="https://creator.xiaohongshu.com/api/galaxy/user/info",
+        code_field='code', ok_codes=(0,), logout_codes=(-100, -101),
+        user_field='data',
+        session_cookies=('galaxy_creator_session_id', 'access-token-creator.xiaohongshu.com'),
+        headers={'Referer': 'https://creator.xiaohongshu.com/'},
+    ),
+    # 视频号
+    2: ProbeEndpoint(
+        url="https://channels.weixin.qq.com/cgi-bin/mmfinderassistant-bin/auth/auth_data",
+        method='POST', json_body={},
+        code_field='errCode', ok_codes=(0,), logout_codes=(300333, 300334),
+        user_field='data.finderUser',
+        session_cookies=('sessionid',),
+        headers={'Referer': 'https://channels.weixin.qq.com/platform'},
+    ),
+    # 抖音
+    3: ProbeEndpoint(
+        url="https://creator.douyin.com/web/api/media/user/info/",
+        code_field='status_code', ok_codes=(0,), logout_codes=(8,),
+        user_field='user',
+        session_cookies=('sessionid', 'sessionid_ss'),
+        headers={'Referer': 'https://creator.douyin.com/'},
+    ),
+    # 快手
+    4: ProbeEndpoint(
+        url="https://cp.kuaishou.com/rest/cp/creator/pc/home/infoV2",
+        method='POST', json_body={},
+        code_field='result', ok_codes=(1,), logout_codes=(109,),
+        user_field='data',
+        session_cookies=('kuaishou.web.cp.api_st',),
+        headers={'Referer': 'https://cp.kuaishou.com/'},
+    ),
+}
+
+
+def _get_path(data: Any, path: str) -> Any:
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _domain_matches(host: str, domain: str) -> bool:
+    domain = (domain or '').lstrip('.').lower()
+    return bool(domain) and (host == domain or host.endswith('.' + domain))
+
+
+def _proxy_url(proxy: Optional[Dict]) -> Optional[str]:
+    """Playwright 代理配置 {'server','username','password'} 转为 httpx 代理 URL"""
+    if not proxy or not proxy.get('server'):
+        return None
+    server = proxy['server']
+    if '://' not in server:
+        server = f"http://{server}"
+    if proxy.get('username'):
+        scheme, rest = server.split('://', 1)
+        credentials = quote(proxy['username'], safe='')
+        if proxy.get('password'):
+            credentials += ':' + quote(proxy['password'], safe='')
+        server = f"{scheme}://{credentials}@{rest}"
+    return server
+
+
+class CookieProbe:
+    """基于 HTTP 会话接口的 Cookie 校验"""
+
+    def __init__(self, endpoints: Dict[int, ProbeEndpoint] = None, timeout: float = None):
+        self.endpoints = dict(endpoints) if endpoints is not None else self._endpoints_from_env()
+        self.timeout = float(timeout or os.environ.get("COOKIE_PROBE_TIMEOUT_SECONDS", "10"))
+        self._lock = threading.Lock()
+        self._ssl_context = None
+        self._stats = {'valid': 0, 'invalid': 0, 'ambiguous': 0, 'expired_offline': 0}
+
+    @staticmethod
+    def _endpoints_from_env() -> Dict[int, ProbeEndpoint]:
+        endpoints = {}
+        for platform_type, endpoint in DEFAULT_ENDPOINTS.items():
+            url = os.environ.get(f"COOKIE_PROBE_URL_{platform_type}")
+            if url:
+                endpoint = ProbeEndpoint(**{**endpoint.__dict__, 'url': url})
+            endpoints[platform_type] = endpoint
+        return endpoints
+
+    def _get_ssl_context(self):
+        # 创建 SSL 上下文需要加载系统证书（约 50ms），所有请求共享一个
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context()
+        return self._ssl_context
+
+    def supports(self, platform_type: int) -> bool:
+        return int(platform_type) in self.endpoints
+
+    def _count(self, result: Optional[bool], offline: bool = False):
+        key = 'ambiguous' if result is None else ('valid' if result else 'invalid')
+        with self._lock:
+            self._stats[key] += 1
+            if offline:
+                self._stats['expired_offline'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def load_cookies(account_file: Union[str, Path]) -> list:
+        """读取 storage_state 中的 cookies 列表"""
+        data = json.loads(Path(account_file).read_text(encoding='utf-8'))
+        cookies = data.get('cookies', []) if isinstance(data, dict) else []
+        return [c for c in cookies if isinstance(c, dict) and c.get('name')]
+
+    @staticmethod
+    def _session_expired(endpoint: ProbeEndpoint, cookies: list, now: float) -> bool:
+        """会话 Cookie 均存在且都已过期（expires 为 -1 表示会话级 Cookie，不视为过期）"""
+        session = [c for c in cookies if c['name'] in endpoint.session_cookies]
+        if not session:
+            return False
+        return all(0 < (c.get('expires') or -1) < now for c in session)
+
+    def _build_request(self, endpoint: ProbeEndpoint, cookies: list, now: float) -> Tuple[Dict, httpx.Cookies]:
+        host = (urlsplit(endpoint.url).hostname or '').lower()
+        jar = httpx.Cookies()
+        for c in cookies:
+            expires = c.get('expires') or -1
+            if 0 < expires < now:
+                continue
+            domain = c.get('domain') or host
+            if not _domain_matches(host, domain):
+                continue
+            jar.set(c['name'], str(c.get('value', '')), domain=domain.lstrip('.'), path=c.get('path') or '/')
+        headers = {'User-Agent': _USER_AGENT, 'Accept': 'application/json, text/plain, */*', **endpoint.headers}
+        return headers, jar
+
+    def interpret(self, endpoint: ProbeEndpoint, response: httpx.Response) -> Optional[bool]:
+        """根据接口响应判断登录状态"""
+        if response.status_code == 401:
+            return False
+        if response.is_redirect:
+            location = response.headers.get('location', '').lower()
+            return False if any(m in location for m in _LOGIN_MARKERS) else None
+        if response.status_code != 200:
+            return None
+        try:
+            payload = response.json()
+        except ValueError:
+            return None
+        code = _get_path(payload, endpoint.code_field)
+        if code in endpoint.ok_codes and _get_path(payload, endpoint.user_field):
+            return True
+        if code in endpoint.logout_codes:
+            return False
+        return None
+
+    async def probe(
+        self,
+        platform_type: int,
+        account_file: Union[str, Path],
+        proxy: Optional[Dict] = None,
+    ) -> Optional[bool]:
+        """
+        探测 Cookie 是否有效
+        :param platform_type: 平台类型
+        :param account_file: storage_state JSON 文件路径
+        :param proxy: 账号关联的代理配置（get_proxy_config_dict 的返回值）
+        :returns: True 有效 / False 失效 / None 无法判断
+        """
+        endpoint = self.endpoints.get(int(platform_type))
+        if endpoint is None:
+            return None
+        try:
+            cookies = self.load_cookies(account_file)
+        except (OSError, ValueError):
+            self._count(False)
+            return False
+        now = time.time()
+        if not cookies or self._session_expired(endpoint, cookies, now):
+            self._count(False, offline=True)
+            return False
+
+        headers, jar = self._build_request(endpoint, cookies, now)
+        try:
+            async with httpx.AsyncClient(
+                proxy=_proxy_url(proxy), timeout=self.timeout, follow_redirects=False,
+                cookies=jar, verify=self._get_ssl_context()
+            ) as client:
+                response = await client.request(
+                    endpoint.method, endpoint.url, headers=headers, json=endpoint.json_body
+                )
+            result = self.interpret(endpoint, response)
+        except (httpx.HTTPError, ImportError, ValueError) as e:
+            # 网络错误、代理不可用（如缺少 socks 依赖）等均视为无法判断
+            print(f"[CookieProbe] platform={platform_type} 探测失败: {e}")
+            result = None
+        self._count(result)
+        return result
+
+
+_probe: Optional[CookieProbe] = None
+_probe_lock = threading.Lock()
+
+
+def get_cookie_probe() -> CookieProbe:
+    """获取进程内共享的 CookieProbe"""
+    global _probe
+    with _probe_lock:
+        if _probe is None:
+            _probe = CookieProbe()
+        return _probe
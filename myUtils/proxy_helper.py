@@ -3,11 +3,97 @@
 """
 代理辅助工具
 用于获取账号关联的代理配置，并转换为 Playwright 可用的代理格式
+
+账号 -> 代理配置的查询结果缓存在进程内（每次上传/登录/校验启动浏览器都会查询），
+代理或账号被修改/删除时由 ProxyService / AccountService 调用 invalidate_proxy_cache() 失效。
+其他进程直接修改数据库的情况由 TTL 兜底：
+    PROXY_CACHE_TTL_SECONDS   缓存时间（默认60秒，0 表示关闭缓存）
 """
-import sqlite3
-from pathlib import Path
-from typing import Optional, Dict
-from conf import BASE_DIR
+import os
+import threading
+import time
+from typing import Callable, Optional, Dict, Iterable
+from utils.sqlite_pool import get_connection
+
+
+class ProxyConfigCache:
+    """账号代理配置缓存（线程安全，未关联代理的结果 None 同样缓存）"""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = float(ttl if ttl is not None else os.environ.get("PROXY_CACHE_TTL_SECONDS", "60"))
+        self._entries: Dict[int, tuple] = {}   # 账号ID -> (代理配置, 过期时间)
+        self._generation = 0                   # 每次失效+1，查询期间发生失效时不写回旧结果
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get_or_load(self, account_id: int, loader: Callable[[int], Optional[Dict]]) -> Optional[Dict]:
+        """命中时返回缓存的代理配置副本，否则调用 loader 查询并写入缓存"""
+        if self.ttl <= 0:
+            return loader(account_id)
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._stats['hits'] += 1
+                return dict(entry[0]) if entry[0] else None
+            self._stats['misses'] += 1
+            generation = self._generation
+        config = loader(account_id)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[account_id] = (dict(config) if config else None, time.monotonic() + self.ttl)
+        return config
+
+    def invalidate(self, account_ids: Iterable[int] = None):
+        """使缓存失效；account_ids 为空时清空全部"""
+        with self._lock:
+            self._stats['invalidations'] += 1
+            self._generation += 1
+            if account_ids is None:
+                self._entries.clear()
+                return
+            for account_id in account_ids:
+                self._entries.pop(account_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['ttl'] = self.ttl
+        return stats
+
+
+_proxy_cache = ProxyConfigCache()
+
+
+def invalidate_proxy_cache(account_ids: Iterable[int] = None):
+    """
+    使账号代理配置缓存失效
+    :param account_ids: 代理关联发生变化的账号ID；为空时清空全部（代理本身被修改/删除时）
+    """
+    _proxy_cache.invalidate(account_ids)
+
+
+def get_proxy_cache_stats() -> Dict:
+    """代理配置缓存命中统计"""
+    return _proxy_cache.stats()
+
+
+def build_proxy_config(proxy: Dict) -> Dict:
+    """
+    proxies 表的一行转为 Playwright 代理配置
+    {'server': 'http://host:port', 'username': ..., 'password': ...}
+    """
+    config = {
+        'server': f"{proxy['proxy_type']}://{proxy['host']}:{proxy['port']}"
+    }
+
+    # 添加认证信息（如果有）
+    if proxy.get('username') and proxy.get('password'):
+        config['username'] = proxy['username']
+        config['password'] = proxy['password']
+    return config
 
 
 def get_proxy_by_id(proxy_id: int) -> Optional[Dict]:
@@ -25,9 +111,7 @@ def get_proxy_by_id(proxy_id: int) -> Optional[Dict]:
             'password': 'pass'   # 可选
         }
     """
-    db_path = BASE_DIR / "db" / "database.db"
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    conn = get_connection(foreign_keys=False)
     cursor = conn.cursor()
 
     try:
@@ -43,21 +127,7 @@ def get_proxy_by_id(proxy_id: int) -> Optional[Dict]:
             print(f"[Proxy] Proxy {proxy_id} not found or disabled")
             return None
 
-        proxy = dict(proxy_row)
-
-        # 构建 Playwright 代理配置
-        proxy_type = proxy['proxy_type']
-        server = f"{proxy_type}://{proxy['host']}:{proxy['port']}"
-
-        config = {
-            'server': server
-        }
-
-        # 添加认证信息（如果有）
-        if proxy.get('username') and proxy.get('password'):
-            config['username'] = proxy['username']
-            config['password'] = proxy['password']
-
+        config = build_proxy_config(dict(proxy_row))
         print(f"[Proxy] Using proxy by ID: {config}")
         return config
 
@@ -80,9 +150,7 @@ def get_proxy_by_account_id(account_id: int) -> Optional[Dict]:
             'password': 'pass'   # 可选
         }
     """
-    db_path = BASE_DIR / "db" / "database.db"
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    conn = get_connection(foreign_keys=False)
     cursor = conn.cursor()
 
     try:
@@ -98,21 +166,7 @@ def get_proxy_by_account_id(account_id: int) -> Optional[Dict]:
         if not proxy_row:
             return None
 
-        proxy = dict(proxy_row)
-
-        # 构建 Playwright 代理配置
-        proxy_type = proxy['proxy_type']
-        server = f"{proxy_type}://{proxy['host']}:{proxy['port']}"
-        
-        config = {
-            'server': server
-        }
-
-        # 添加认证信息（如果有）
-        if proxy.get('username') and proxy.get('password'):
-            config['username'] = proxy['username']
-            config['password'] = proxy['password']
-        return config
+        return build_proxy_config(dict(proxy_row))
 
     finally:
         conn.close()
@@ -128,4 +182,4 @@ def get_proxy_config_dict(account_id: int) -> Optional[Dict]:
     Returns:
         代理配置字典或 None
     """
-    return get_proxy_by_account_id(account_id)
+    return _proxy_cache.get_or_load(account_id, get_proxy_by_account_id)
@@ -2,14 +2,22 @@
 账号管理路由
 """
 import asyncio
+import json
 import sqlite3
+import threading
 import uuid
 from pathlib import Path
-from flask import Blueprint, request, jsonify, send_from_directory
+from queue import Queue
+from flask import Blueprint, request, jsonify, send_from_directory, Response
 from conf import BASE_DIR
 from myUtils.auth import check_cookie
+from myUtils.cookie_cache import get_cookie_check_cache
+from myUtils.cookie_probe import get_cookie_probe
 from services.account_service import AccountService
+from services.account_verify_service import AccountVerifyService
 from services.cookie_refresh_service import CookieRefreshService
+from services.refresh_planner import RefreshPlanner
+from utils.sqlite_pool import get_connection
 
 account_bp = Blueprint('account', __name__)
 
@@ -55,7 +63,7 @@ def upload_cookie():
 
         # -------- 更新已有账号 --------
         if account_id:
-            with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
+            with get_connection(foreign_keys=False) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 cursor.execute('SELECT filePath FROM user_info WHERE id = ?', (account_id,))
@@ -67,6 +75,7 @@ def upload_cookie():
             cookie_file_path = Path(BASE_DIR / "cookiesFile" / result['filePath'])
             cookie_file_path.parent.mkdir(parents=True, exist_ok=True)
             file.save(str(cookie_file_path))
+            get_cookie_check_cache().invalidate(cookie_file_path)
 
             # 校验并更新状态
             ok = asyncio.run(check_cookie(platform_type, result['filePath']))
@@ -341,11 +350,59 @@ def batch_delete_accounts_api():
         }), 500
 
 
+def _run_batch_verify(account_ids, status_queue):
+    """在新线程中并发验证，逐个推送结果，最后推送汇总（None 表示结束）"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        results = loop.run_until_complete(
+            AccountVerifyService().verify_accounts(
+                account_ids,
+                on_result=lambda r: status_queue.put({"event": "result", **r}),
+            )
+        )
+        status_queue.put({
+            "event": "done",
+            "total": len(results),
+            "valid": sum(1 for r in results if r['success']),
+            "invalid": sum(1 for r in results if not r['success']),
+        })
+    except Exception as e:
+        status_queue.put({"event": "error", "code": 500, "msg": str(e)})
+    finally:
+        loop.close()
+        status_queue.put(None)
+
+
+def _batch_verify_stream(account_ids):
+    """SSE：每个账号验证完成即推送一条 result 事件，结束时推送 done 事件"""
+    status_queue = Queue()
+    threading.Thread(target=_run_batch_verify, args=(account_ids, status_queue), daemon=True).start()
+
+    def stream():
+        yield f"data: {json.dumps({'event': 'start', 'total': len(account_ids)}, ensure_ascii=False)}\n\n"
+        while True:
+            msg = status_queue.get()
+            if msg is None:
+                break
+            yield f"data: {json.dumps(msg, ensure_ascii=False)}\n\n"
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # 禁用 Nginx 缓冲
+    response.headers['Connection'] = 'keep-alive'
+    return response
+
+
 @account_bp.route('/api/accounts/batch-verify', methods=['POST'])
 def batch_verify_accounts_api():
-    """批量验证Cookie"""
+    """
+    批量验证Cookie（按全局/平台/代理并发执行）
+    请求体：{"account_ids": [...], "stream": false}
+    stream 为 true 时以 SSE 逐个推送验证结果
+    """
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         account_ids = data.get('account_ids', [])
 
         if not account_ids:
@@ -355,25 +412,12 @@ def batch_verify_accounts_api():
                 "data": None
             }), 400
 
-        account_service = AccountService()
-        accounts = [account_service.get_account_by_id(id) for id in account_ids]
-
-        async def verify_all():
-            results = []
-            for account in accounts:
-                if account:
-                    # 传递 account_id 以支持代理
-                    result = await check_cookie(account['type'], account['filePath'], account['id'])
-                    account_service.update_verify_time(account['id'], result)
-                    results.append({
-                        'account_id': account['id'],
-                        'success': result
-                    })
-            return results
+        if data.get('stream'):
+            return _batch_verify_stream(account_ids)
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        verify_results = loop.run_until_complete(verify_all())
+        verify_results = loop.run_until_complete(AccountVerifyService().verify_accounts(account_ids))
         loop.close()
 
         return jsonify({
@@ -389,6 +433,52 @@ def batch_verify_accounts_api():
         }), 500
 
 
+@account_bp.route('/api/accounts/batch-verify/stream', methods=['GET'])
+def batch_verify_accounts_stream_api():
+    """
+    批量验证Cookie（SSE，供 EventSource 使用）
+    参数：account_ids=1,2,3
+    """
+    account_ids = [int(i) for i in request.args.get('account_ids', '').split(',') if i.strip().isdigit()]
+    if not account_ids:
+        return jsonify({
+            "code": 400,
+            "msg": "账号ID列表不能为空",
+            "data": None
+        }), 400
+    return _batch_verify_stream(account_ids)
+
+
+@account_bp.route('/api/accounts/cookie-check/stats', methods=['GET'])
+def cookie_check_stats_api():
+    """Cookie 校验统计（结果缓存命中率、HTTP 探测结果分布）"""
+    return jsonify({
+        "code": 200,
+        "msg": "success",
+        "data": {
+            "cache": get_cookie_check_cache().stats(),
+            "probe": get_cookie_probe().stats(),
+        }
+    }), 200
+
+
+@account_bp.route('/api/accounts/refresh-plan/report', methods=['GET'])
+def refresh_plan_report_api():
+    """Cookie 刷新计划报表（各平台估计有效期、预测与实际过期对比、未来24小时刷新量）"""
+    try:
+        return jsonify({
+            "code": 200,
+            "msg": "success",
+            "data": RefreshPlanner().report()
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"获取刷新计划报表失败: {str(e)}",
+            "data": None
+        }), 500
+
+
 @account_bp.route('/api/accounts/<int:account_id>/refresh-cookie', methods=['POST'])
 def refresh_cookie_api(account_id):
     """手动刷新Cookie"""
@@ -1,13 +1,13 @@
 """
 文件管理路由
 """
-import os
 import sqlite3
-import uuid
-from datetime import datetime
 from pathlib import Path
-from flask import Blueprint, request, jsonify, send_from_directory, send_file
+from flask import Blueprint, request, jsonify
 from conf import BASE_DIR
+from utils.http_range import send_range_file
+from utils.sqlite_pool import get_connection
+from services.upload_service import UploadError, get_upload_service
 
 file_bp = Blueprint('file', __name__)
 
@@ -26,9 +26,29 @@ def _safe_resolve_under(base_dir: Path, relative_path: str) -> Path:
     return target
 
 
+def _stored_etag(base_dir: Path, target: Path):
+    """已入库文件使用内容 MD5 作为 ETag（去重后多条记录共用同一文件，哈希相同）"""
+    try:
+        relative_path = target.relative_to(base_dir.resolve()).as_posix()
+    except ValueError:
+        return None
+    with get_connection(foreign_keys=False) as conn:
+        row = conn.execute(
+            "SELECT md5_hash FROM file_records WHERE file_path = ? AND md5_hash IS NOT NULL LIMIT 1",
+            (relative_path,),
+        ).fetchone()
+        return row['md5_hash'] if row else None
+
+
+def _allow_large_body():
+    """上传接口按 UPLOAD_MAX_FILE_SIZE_MB 放开请求体大小限制（其它接口仍使用 MAX_CONTENT_LENGTH）"""
+    request.max_content_length = get_upload_service().max_file_size + 1024 * 1024
+
+
 @file_bp.route('/upload', methods=['POST'])
 def upload_file():
     """简单文件上传（不保存到数据库）"""
+    _allow_large_body()
     if 'file' not in request.files:
         return jsonify({
             "code": 200,
@@ -43,23 +63,18 @@ def upload_file():
             "msg": "No selected file"
         }), 400
     try:
-        # 保存文件到指定位置
-        uuid_v1 = uuid.uuid1()
-        print(f"UUID v1: {uuid_v1}")
-        # 按日期分目录：videoFile/YYYY/MM/DD/
-        date_dir = datetime.now().strftime("%Y/%m/%d")
-        save_dir = Path(BASE_DIR / "videoFile" / date_dir)
-        save_dir.mkdir(parents=True, exist_ok=True)
-        filepath = save_dir / f"{uuid_v1}_{file.filename}"
-        file.save(filepath)
-        return jsonify({"code": 200, "msg": "File uploaded successfully", "data": f"{date_dir}/{uuid_v1}_{file.filename}"}), 200
+        # 按块写入 videoFile/YYYY/MM/DD/（不入库）
+        info = get_upload_service().save_stream(file.stream, file.filename, record=False)
+        return jsonify({"code": 200, "msg": "File uploaded successfully", "data": info['file_path']}), 200
+    except UploadError as e:
+        return jsonify({"code": e.code, "msg": str(e), "data": None}), e.code
     except Exception as e:
         return jsonify({"code": 200, "msg": str(e), "data": None}), 500
 
 
 @file_bp.route('/getFile', methods=['GET'])
 def get_file():
-    """获取文件"""
+    """获取文件（支持 Range 断点/拖动预览和 ETag 条件请求）"""
     # 新：支持传 file_path（含子目录）；旧：兼容 filename（仅根目录）
     file_path = request.args.get('file_path') or request.args.get('path')
     filename = request.args.get('filename')
@@ -71,7 +86,7 @@ def get_file():
             target = _safe_resolve_under(base_dir, file_path)
             if not target.exists() or not target.is_file():
                 return {"error": "File not found"}, 404
-            return send_file(str(target), as_attachment=False)
+            return send_range_file(request, str(target), etag=_stored_etag(base_dir, target))
 
         if not filename:
             return {"error": "file_path or filename is required"}, 400
@@ -79,27 +94,33 @@ def get_file():
         # 旧逻辑：仅允许根目录文件名
         if '..' in filename or filename.startswith('/') or filename.startswith('\\'):
             return {"error": "Invalid filename"}, 400
-        return send_from_directory(str(base_dir), filename)
+        target = _safe_resolve_under(base_dir, filename)
+        if not target.is_file():
+            return {"error": "File not found"}, 404
+        return send_range_file(request, str(target), etag=_stored_etag(base_dir, target))
     except ValueError:
         return {"error": "Invalid path"}, 400
 
 
 @file_bp.route('/download/<path:file_path>', methods=['GET'])
 def download_file(file_path: str):
-    """下载文件（支持子目录）"""
+    """下载文件（支持子目录、Range 断点续传）"""
     base_dir = Path(BASE_DIR / "videoFile")
     try:
         target = _safe_resolve_under(base_dir, file_path)
         if not target.exists() or not target.is_file():
             return jsonify({"code": 404, "msg": "File not found", "data": None}), 404
-        return send_file(str(target), as_attachment=True, download_name=target.name)
+        return send_range_file(
+            request, str(target), etag=_stored_etag(base_dir, target), as_attachment=True, download_name=target.name
+        )
     except ValueError:
         return jsonify({"code": 400, "msg": "Invalid path", "data": None}), 400
 
 
 @file_bp.route('/uploadSave', methods=['POST'])
 def upload_save():
-    """上传文件并保存到数据库"""
+    """上传文件并保存到数据库（按块写入磁盘，同时计算 MD5/SHA-256）"""
+    _allow_large_body()
     if 'file' not in request.files:
         return jsonify({
             "code": 400,
@@ -123,41 +144,21 @@ def upload_save():
         filename = file.filename
 
     try:
-        # 生成 UUID v1
-        uuid_v1 = uuid.uuid1()
-        print(f"UUID v1: {uuid_v1}")
-
-        # 按日期分目录：videoFile/YYYY/MM/DD/
-        date_dir = datetime.now().strftime("%Y/%m/%d")
-        save_dir = Path(BASE_DIR / "videoFile" / date_dir)
-        save_dir.mkdir(parents=True, exist_ok=True)
-
-        # 构造文件名和路径（file_path 存相对路径，含日期目录）
-        final_filename = f"{uuid_v1}_{filename}"
-        relative_path = f"{date_dir}/{final_filename}"
-        filepath = save_dir / final_filename
-
-        # 保存文件
-        file.save(filepath)
-
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO file_records (filename, filesize, file_path)
-                VALUES (?, ?, ?)
-            ''', (filename, round(float(os.path.getsize(filepath)) / (1024 * 1024), 2), relative_path))
-            conn.commit()
-            print("✅ 上传文件已记录")
+        info = get_upload_service().save_stream(file.stream, filename)
+        print(f"✅ 上传文件已记录: {info['file_path']} md5={info['md5_hash']}")
 
         return jsonify({
             "code": 200,
             "msg": "File uploaded and saved successfully",
             "data": {
                 "filename": filename,
-                "filepath": relative_path
+                "filepath": info['file_path'],
+                **info
             }
         }), 200
 
+    except UploadError as e:
+        return jsonify({"code": e.code, "msg": str(e), "data": None}), e.code
     except Exception as e:
         print(f"Upload failed: {e}")
         return jsonify({
@@ -167,6 +168,80 @@ def upload_save():
         }), 500
 
 
+@file_bp.route('/uploadInit', methods=['POST'])
+def upload_init():
+    """
+    创建分块上传会话（可断点续传）
+    Body: {"filename": "a.mp4", "size": 123456789, "chunk_size": 8388608, "md5": "...", "sha256": "..."}
+    chunk_size/md5/sha256 可选；提供 md5 且内容已存在时直接秒传，返回 data.instant = true 和文件信息，无需上传分块
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        service = get_upload_service()
+        size = int(data['size']) if data.get('size') is not None else None
+        if data.get('md5'):
+            info = service.link_existing(data.get('filename'), data['md5'], size, sha256=data.get('sha256'))
+            if info:
+                return jsonify({"code": 200, "msg": "File already exists", "data": {**info, "instant": True}}), 200
+        result = service.init(data.get('filename'), size, chunk_size=data.get('chunk_size'))
+        return jsonify({"code": 200, "msg": "success", "data": {**result, "instant": False}}), 200
+    except UploadError as e:
+        return jsonify({"code": e.code, "msg": str(e), "data": e.data}), e.code
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"创建上传会话失败: {e}", "data": None}), 500
+
+
+@file_bp.route('/uploadChunk/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id: str):
+    """
+    上传一个分块（请求体为分块原始字节，可并行、乱序上传）
+    Query: offset 分块在文件中的起始字节位置（按 chunk_size 对齐）
+    """
+    offset = request.args.get('offset', default=0, type=int)
+    try:
+        result = get_upload_service().write_chunk(upload_id, offset, request.stream, request.content_length)
+        return jsonify({"code": 200, "msg": "success", "data": result}), 200
+    except UploadError as e:
+        return jsonify({"code": e.code, "msg": str(e), "data": e.data}), e.code
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"上传分块失败: {e}", "data": None}), 500
+
+
+@file_bp.route('/uploadStatus/<upload_id>', methods=['GET'])
+def upload_status(upload_id: str):
+    """查询上传会话状态：已接收字节数和缺失的字节区间 missing_ranges（[[start, end), ...]）"""
+    try:
+        return jsonify({"code": 200, "msg": "success", "data": get_upload_service().status(upload_id)}), 200
+    except UploadError as e:
+        return jsonify({"code": e.code, "msg": str(e), "data": e.data}), e.code
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"查询上传状态失败: {e}", "data": None}), 500
+
+
+@file_bp.route('/uploadComplete/<upload_id>', methods=['POST'])
+def upload_complete(upload_id: str):
+    """
+    完成分块上传并入库
+    Body: {"md5": "...", "sha256": "..."}（可选，提供时校验）
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        info = get_upload_service().complete(upload_id, md5=data.get('md5'), sha256=data.get('sha256'))
+        return jsonify({"code": 200, "msg": "File uploaded and saved successfully", "data": info}), 200
+    except UploadError as e:
+        return jsonify({"code": e.code, "msg": str(e), "data": e.data}), e.code
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"完成上传失败: {e}", "data": None}), 500
+
+
+@file_bp.route('/uploadAbort/<upload_id>', methods=['POST', 'DELETE'])
+def upload_abort(upload_id: str):
+    """取消分块上传"""
+    if not get_upload_service().abort(upload_id):
+        return jsonify({"code": 404, "msg": "上传会话不存在或已过期", "data": None}), 404
+    return jsonify({"code": 200, "msg": "已取消", "data": None}), 200
+
+
 @file_bp.route('/getFiles', methods=['GET'])
 def get_all_files():
     """获取所有文件列表"""
@@ -176,7 +251,7 @@ def get_all_files():
         keyword = request.args.get('keyword', default=None, type=str)
 
         # 使用 with 自动管理数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
+        with get_connection(foreign_keys=False) as conn:
             conn.row_factory = sqlite3.Row  # 允许通过列名访问结果
             cursor = conn.cursor()
 
@@ -201,6 +276,10 @@ def get_all_files():
             for row in rows:
                 row_dict = dict(row)
                 # 从 file_path 中提取 UUID (文件名的第一部分，下划线前)
+                # 去重的记录与其它记录共用文件，已存储 uuid 时以记录自身的 uuid 为准
+                if row_dict.get('uuid'):
+                    data.append(row_dict)
+                    continue
                 if row_dict.get('file_path'):
                     # file_path 可能包含子目录：YYYY/MM/DD/uuid_xxx.ext
                     name = Path(row_dict['file_path']).name
@@ -233,7 +312,7 @@ def get_all_files():
 
 @file_bp.route('/deleteFile', methods=['GET'])
 def delete_file():
-    """删除文件"""
+    """删除文件（多条记录引用同一内容时，最后一条记录删除后才删除实际文件）"""
     file_id = request.args.get('id')
 
     if not file_id or not file_id.isdigit():
@@ -244,39 +323,13 @@ def delete_file():
         }), 400
 
     try:
-        # 获取数据库连接
-        with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            # 查询要删除的记录
-            cursor.execute("SELECT * FROM file_records WHERE id = ?", (file_id,))
-            record = cursor.fetchone()
-
-            if not record:
-                return jsonify({
-                    "code": 404,
-                    "msg": "File not found",
-                    "data": None
-                }), 404
-
-            record = dict(record)
-
-            # 获取文件路径并删除实际文件
-            file_path = Path(BASE_DIR / "videoFile" / record['file_path'])
-            if file_path.exists():
-                try:
-                    file_path.unlink()  # 删除文件
-                    print(f"✅ 实际文件已删除: {file_path}")
-                except Exception as e:
-                    print(f"⚠️ 删除实际文件失败: {e}")
-                    # 即使删除文件失败，也要继续删除数据库记录，避免数据不一致
-            else:
-                print(f"⚠️ 实际文件不存在: {file_path}")
-
-            # 删除数据库记录
-            cursor.execute("DELETE FROM file_records WHERE id = ?", (file_id,))
-            conn.commit()
+        record = get_upload_service().delete_file(int(file_id))
+        if not record:
+            return jsonify({
+                "code": 404,
+                "msg": "File not found",
+                "data": None
+            }), 404
 
         return jsonify({
             "code": 200,
@@ -1,8 +1,11 @@
 """
 代理管理路由
 """
+import asyncio
 from flask import Blueprint, request, jsonify
 from services.proxy_service import ProxyService
+from services.proxy_health_service import ProxyHealthService
+from myUtils.proxy_helper import get_proxy_cache_stats
 
 proxy_bp = Blueprint('proxy', __name__)
 
@@ -17,6 +20,7 @@ def get_proxies_api():
         filters = {}
         proxy_type = request.args.get('proxy_type')
         is_enabled = request.args.get('is_enabled')
+        health_status = request.args.get('health_status')
         limit = request.args.get('limit', default=50, type=int)
         offset = request.args.get('offset', default=0, type=int)
 
@@ -24,6 +28,8 @@ def get_proxies_api():
             filters['proxy_type'] = proxy_type
         if is_enabled is not None:
             filters['is_enabled'] = int(is_enabled)
+        if health_status:
+            filters['health_status'] = health_status
 
         proxies = proxy_service.get_proxies_paginated(filters, limit=limit, offset=offset)
 
@@ -229,3 +235,40 @@ def get_proxies_simple_api():
             "msg": f"获取代理列表失败: {str(e)}",
             "data": []
         }), 500
+
+
+@proxy_bp.route('/api/proxies/cache/stats', methods=['GET'])
+def get_proxy_cache_stats_api():
+    """获取账号代理配置缓存的命中统计"""
+    return jsonify({
+        "code": 200,
+        "msg": "获取成功",
+        "data": get_proxy_cache_stats()
+    }), 200
+
+
+@proxy_bp.route('/api/proxies/check', methods=['POST'])
+def check_proxies_api():
+    """
+    立即探测代理健康状态
+    请求体（可选）：{"proxy_ids": [1, 2]}，为空时探测全部已启用代理
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        proxy_ids = data.get('proxy_ids')
+        if proxy_ids is not None:
+            proxy_ids = [int(i) for i in proxy_ids]
+
+        results = asyncio.run(ProxyHealthService().check_proxies(proxy_ids))
+
+        return jsonify({
+            "code": 200,
+            "msg": "探测完成",
+            "data": results
+        }), 200
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"探测代理失败: {str(e)}",
+            "data": None
+        }), 500
@@ -1,10 +1,10 @@
 """
 任务管理路由
 """
-import threading
 from flask import Blueprint, request, jsonify
 from services.task_service import TaskService
-from services.task_executor import TaskExecutor
+from services.task_worker import get_task_worker
+from services.upload_metrics_service import UploadMetricsService
 
 task_bp = Blueprint('task', __name__)
 
@@ -89,6 +89,39 @@ def list_tasks():
         }), 500
 
 
+@task_bp.route('/createTasks', methods=['POST'])
+def create_tasks():
+    """
+    批量创建发布任务（单个事务插入），每个任务可单独指定标题/标签/定时等字段
+    请求体：{"tasks": [{"platform_type", "account_id", "file_id", "title", "tags", "schedule_enabled", "scheduled_time", ...}],
+            "execute": true}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        tasks = data.get('tasks')
+        if not isinstance(tasks, list) or not tasks:
+            return jsonify({"code": 400, "msg": "tasks 不能为空", "data": None}), 400
+
+        task_ids = TaskService().create_tasks_bulk(tasks)
+        if data.get('execute', True):
+            get_task_worker().submit(task_ids)
+
+        return jsonify({
+            "code": 200,
+            "msg": "任务已创建",
+            "data": {
+                "task_ids": task_ids,
+                "total_tasks": len(task_ids),
+                "first_id": task_ids[0],
+                "last_id": task_ids[-1]
+            }
+        }), 200
+    except ValueError as e:
+        return jsonify({"code": 400, "msg": str(e), "data": None}), 400
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"创建任务失败: {str(e)}", "data": None}), 500
+
+
 @task_bp.route('/cancelTask/<int:task_id>', methods=['POST'])
 def cancel_task(task_id):
     """取消任务"""
@@ -97,6 +130,7 @@ def cancel_task(task_id):
         success = task_service.cancel_task(task_id)
 
         if success:
+            get_task_worker().discard([task_id])
             return jsonify({
                 "code": 200,
                 "msg": "任务已取消",
@@ -140,21 +174,7 @@ def retry_task(task_id):
         # 将任务状态重置为待发布
         task_service.update_task_status(task_id, TaskService.STATUS_PENDING, error_message=None)
 
-        # 启动后台任务执行
-        def execute_task_async():
-            import asyncio
-            executor = TaskExecutor()
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(executor.execute_with_retry(task_id))
-            except Exception as e:
-                print(f"重试任务 {task_id} 失败: {e}")
-            finally:
-                loop.close()
-
-        thread = threading.Thread(target=execute_task_async, daemon=True)
-        thread.start()
+        get_task_worker().submit([task_id])
 
         return jsonify({
             "code": 200,
@@ -177,7 +197,39 @@ def delete_task(task_id):
         ok = task_service.soft_delete_task(task_id)
         if not ok:
             return jsonify({"code": 404, "msg": "任务不存在", "data": None}), 404
+        get_task_worker().discard([task_id])
         return jsonify({"code": 200, "msg": "已删除", "data": None}), 200
     except Exception as e:
         return jsonify({"code": 500, "msg": f"删除任务失败: {str(e)}", "data": None}), 500
 
+
+
+@task_bp.route('/workerStats', methods=['GET'])
+def worker_stats():
+    """任务 worker 运行状态（队列长度、并发占用、浏览器池）"""
+    try:
+        return jsonify({"code": 200, "msg": "success", "data": get_task_worker().stats()}), 200
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"获取 worker 状态失败: {str(e)}", "data": None}), 500
+
+
+@task_bp.route('/stepStats', methods=['GET'])
+def step_stats():
+    """上传步骤耗时统计（按平台/步骤汇总平均值、P50/P95、失败次数）"""
+    try:
+        platform_type = request.args.get('platform_type', type=int)
+        days = request.args.get('days', default=7, type=int)
+        stats = UploadMetricsService().get_step_stats(platform_type=platform_type, days=days)
+        return jsonify({"code": 200, "msg": "success", "data": stats}), 200
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"获取步骤耗时统计失败: {str(e)}", "data": None}), 500
+
+
+@task_bp.route('/getTask/<int:task_id>/steps', methods=['GET'])
+def get_task_steps(task_id):
+    """任务各步骤耗时"""
+    try:
+        steps = UploadMetricsService().get_task_steps(task_id)
+        return jsonify({"code": 200, "msg": "success", "data": steps}), 200
+    except Exception as e:
+        return jsonify({"code": 500, "msg": f"获取任务步骤耗时失败: {str(e)}", "data": None}), 500
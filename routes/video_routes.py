@@ -1,13 +1,10 @@
 """
 视频发布路由
 """
-import sqlite3
-import threading
-from pathlib import Path
 from flask import Blueprint, request, jsonify
-from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
 from services.task_service import TaskService
-from services.task_executor import TaskExecutor
+from services.task_worker import get_task_worker
 from utils.files_times import generate_schedule_time_next_day
 
 video_bp = Blueprint('video', __name__)
@@ -15,7 +12,7 @@ video_bp = Blueprint('video', __name__)
 
 def _get_file_id_by_path(file_path: str) -> int:
     """根据文件路径获取文件ID"""
-    with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
+    with get_connection(foreign_keys=False) as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT id FROM file_records WHERE file_path = ?', (file_path,))
         row = cursor.fetchone()
@@ -24,7 +21,7 @@ def _get_file_id_by_path(file_path: str) -> int:
 
 def _get_account_id_by_filepath(file_path: str) -> int:
     """根据账号文件路径获取账号ID"""
-    with sqlite3.connect(Path(BASE_DIR / "db" / "database.db")) as conn:
+    with get_connection(foreign_keys=False) as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT id FROM user_info WHERE filePath = ?', (file_path,))
         row = cursor.fetchone()
@@ -162,25 +159,8 @@ def postVideo():
             scheduled_times=scheduled_times
         )
 
-        # 启动后台任务执行
-        def execute_tasks_async():
-            """异步执行任务"""
-            import asyncio
-            executor = TaskExecutor()
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            for task_id in task_ids:
-                try:
-                    loop.run_until_complete(executor.execute_with_retry(task_id))
-                except Exception as e:
-                    print(f"任务 {task_id} 执行失败: {e}")
-
-            loop.close()
-
-        # 在新线程中执行任务
-        thread = threading.Thread(target=execute_tasks_async, daemon=True)
-        thread.start()
+        # 投递到常驻任务 worker，按全局/平台/账号并发限制并行执行
+        get_task_worker().submit(task_ids)
 
         # 立即返回任务ID列表
         return jsonify({
@@ -6,7 +6,10 @@ import os
 from flask_cors import CORS
 from flask import Flask
 from services.scheduler_service import SchedulerService
+from services.proxy_health_service import ProxyHealthService
 from services.login_service import LoginService
+from services.task_worker import get_task_worker
+from services.media_probe_service import get_media_probe_service
 from routes import (
     static_bp,
     file_bp,
@@ -28,7 +31,7 @@ app = Flask(__name__)
 # 允许所有来源跨域访问
 CORS(app)
 
-# 限制上传文件大小为160MB
+# 限制请求体大小为160MB（上传接口按 UPLOAD_MAX_FILE_SIZE_MB 单独放开，大文件使用分块上传 /uploadInit）
 app.config['MAX_CONTENT_LENGTH'] = 160 * 1024 * 1024
 
 # 初始化全局变量
@@ -50,15 +53,16 @@ app.register_blueprint(video_bp)
 app.register_blueprint(proxy_bp)
 
 _scheduler = SchedulerService()
+_proxy_health = ProxyHealthService()
 
 
-def _should_start_scheduler() -> bool:
+def _should_start_scheduler(env_key: str = "RUN_SCHEDULER") -> bool:
     """
-    确保在以下场景启动一次 scheduler：
+    确保在以下场景启动一次 scheduler / 任务 worker：
     - python sau_backend.py
     - flask run（避免 reloader 导致启动两次）
     """
-    if os.environ.get("RUN_SCHEDULER", "1") != "1":
+    if os.environ.get(env_key, "1") != "1":
         return False
     # Flask reloader 子进程标记
     if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
@@ -73,6 +77,18 @@ def _should_start_scheduler() -> bool:
 if _should_start_scheduler():
     _scheduler.start_cookie_refresh_scheduler()
 
+# 代理健康检查：后台定期探测代理延迟/可用性
+if _should_start_scheduler("RUN_PROXY_HEALTH_CHECK"):
+    _proxy_health.start()
+
+# 媒体探测：后台填充上传文件的时长/宽高（包括历史上未探测的视频）
+if _should_start_scheduler("RUN_MEDIA_PROBE"):
+    get_media_probe_service().start()
+
+# 常驻任务 worker：恢复数据库中的待发布任务并处理后续投递
+if _should_start_scheduler("RUN_TASK_WORKER"):
+    get_task_worker().start()
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5409)
@@ -0,0 +1,61 @@
+"""
+独立任务 worker 进程
+
+从共享数据库中领取并执行发布任务，可在同一台机器或多台机器（共享同一个数据库文件）上启动多个：
+    python sau_worker.py --concurrency 2
+    python sau_worker.py --platforms 3,4 --poll-interval 3
+
+任务通过原子 UPDATE ... RETURNING 领取，同一账号同一时间只会被一个 worker 使用；
+进程崩溃后其任务租约过期，由其他 worker 回收并重新排队。
+后端（sau_backend.py）只负责创建任务时，设置 RUN_TASK_WORKER=0 关闭内置 worker。
+
+本地测试多进程调度（不启动浏览器，模拟上传）：
+    python sau_worker.py --dry-run & python sau_worker.py --dry-run & python sau_worker.py --dry-run
+"""
+import argparse
+import os
+import signal
+import time
+
+from services.task_worker import TaskWorker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a publish task worker against the shared database.")
+    parser.add_argument("-c", "--concurrency", type=int, default=None,
+                        help="Max tasks running in this process (default: TASK_WORKER_CONCURRENCY or 4)")
+    parser.add_argument("-p", "--platforms", default="",
+                        help="Only run tasks of these platform types, e.g. 3,4 (default: all)")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help="Seconds between database polls (default: TASK_WORKER_POLL_SECONDS or 5)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Simulate uploads instead of launching browsers")
+    args = parser.parse_args()
+
+    platform_types = [int(p) for p in args.platforms.split(",") if p.strip()]
+    worker = TaskWorker(
+        concurrency=args.concurrency,
+        poll_interval=args.poll_interval or float(os.environ.get("TASK_WORKER_POLL_SECONDS", "5")),
+        platform_types=platform_types or None,
+        dry_run=args.dry_run,
+    )
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    worker.start()
+    print(f"worker_id={worker.worker_id}, platforms={platform_types or 'all'}, dry_run={args.dry_run}")
+    while not stopping and worker.is_running():
+        time.sleep(1)
+    worker.stop()
+    print(worker.stats())
+
+
+if __name__ == "__main__":
+    main()
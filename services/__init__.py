@@ -8,8 +8,11 @@ from .task_executor import TaskExecutor
 from .account_service import AccountService
 from .group_service import GroupService
 from .cookie_refresh_service import CookieRefreshService
+from .account_verify_service import AccountVerifyService
 from .scheduler_service import SchedulerService
 from .login_service import LoginService
+from .browser_pool import BrowserPool
+from .task_worker import TaskWorker, get_task_worker
 
 __all__ = [
     'TaskService', 
@@ -17,7 +20,11 @@ __all__ = [
     'AccountService',
     'GroupService',
     'CookieRefreshService',
+    'AccountVerifyService',
     'SchedulerService',
-    'LoginService'
+    'LoginService',
+    'BrowserPool',
+    'TaskWorker',
+    'get_task_worker'
 ]
 
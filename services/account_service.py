@@ -4,12 +4,13 @@
 账号管理服务
 负责账号的CRUD操作、统计、分组管理等
 """
-import sqlite3
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
+from myUtils.proxy_helper import invalidate_proxy_cache
 
 
 class AccountService:
@@ -20,15 +21,52 @@ class AccountService:
     STATUS_VALID = 1        # 有效
     STATUS_VERIFYING = 2    # 验证中
     
+    # 刷新计划变更监听器（进程内共享），参数为账号ID列表
+    _refresh_listeners: List[Callable[[List[int]], None]] = []
+    
     def __init__(self):
         self.db_path = BASE_DIR / "db" / "database.db"
+        # 轻量 schema 自修复：避免本地库未重建导致缺列报错
+        self._ensure_schema()
     
     def _get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
-        return conn
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
+    
+    @classmethod
+    def add_refresh_listener(cls, listener: Callable[[List[int]], None]):
+        """注册刷新计划变更监听器（账号的 next_refresh_time/自动刷新开关变化或账号删除时回调）"""
+        if listener not in cls._refresh_listeners:
+            cls._refresh_listeners.append(listener)
+    
+    @classmethod
+    def remove_refresh_listener(cls, listener: Callable[[List[int]], None]):
+        if listener in cls._refresh_listeners:
+            cls._refresh_listeners.remove(listener)
+    
+    @classmethod
+    def _notify_refresh_changed(cls, account_ids: List[int]):
+        for listener in list(cls._refresh_listeners):
+            try:
+                listener([int(i) for i in account_ids])
+            except Exception as e:
+                print(f"刷新计划监听器回调失败: {e}")
+    
+    def _ensure_schema(self):
+        """确保账号表、验证日志表具备预测过期时间字段"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            for table in ("user_info", "cookie_verification_log"):
+                cursor.execute(f"PRAGMA table_info({table})")
+                cols = {row["name"] for row in cursor.fetchall()}
+                if cols and "predicted_expiry_time" not in cols:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN predicted_expiry_time DATETIME")
+                    conn.commit()
+        except Exception as e:
+            print(f"账号表结构检查失败: {e}")
+        finally:
+            conn.close()
     
     def get_accounts(self, filters: Optional[Dict] = None) -> List[Dict]:
         """
@@ -211,6 +249,47 @@ class AccountService:
         finally:
             conn.close()
     
+    def get_accounts_by_ids(self, account_ids: List[int]) -> List[Dict]:
+        """
+        批量获取账号详情（附带关联代理地址 proxy_server，未关联或代理未启用时为 None）
+        
+        Args:
+            account_ids: 账号ID列表
+        
+        Returns:
+            账号列表，按传入顺序排列，不存在的ID被忽略
+        """
+        ids = list(dict.fromkeys(int(i) for i in account_ids))
+        if not ids:
+            return []
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            rows = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join(['?'] * len(chunk))
+                cursor.execute(f"""
+                    SELECT u.*,
+                           CASE WHEN p.id IS NOT NULL
+                                THEN p.proxy_type || '://' || p.host || ':' || p.port END AS proxy_server
+                    FROM user_info u
+                    LEFT JOIN proxies p ON p.id = u.proxy_id AND p.is_enabled = 1
+                    WHERE u.id IN ({placeholders})
+                """, chunk)
+                for row in cursor.fetchall():
+                    account = dict(row)
+                    try:
+                        account['tags'] = json.loads(account['tags']) if account.get('tags') else []
+                    except:
+                        account['tags'] = []
+                    rows[account['id']] = account
+            return [rows[i] for i in ids if i in rows]
+        finally:
+            conn.close()
+    
     def create_account(self, data: Dict) -> int:
         """
         创建账号
@@ -265,9 +344,13 @@ class AccountService:
 
             account_id = cursor.lastrowid
             conn.commit()
-            return account_id
         finally:
             conn.close()
+        # 账号ID可能被复用，清掉旧账号残留的缓存
+        invalidate_proxy_cache([account_id])
+        if next_refresh_time:
+            self._notify_refresh_changed([account_id])
+        return account_id
     
     def update_account(self, account_id: int, data: Dict) -> bool:
         """
@@ -336,6 +419,10 @@ class AccountService:
                     updates.append("next_refresh_time = ?")
                     params.append(next_refresh_time.strftime('%Y-%m-%d %H:%M:%S'))
             
+            if 'next_refresh_time' in data:
+                updates.append("next_refresh_time = ?")
+                params.append(data['next_refresh_time'])
+            
             if 'remark' in data:
                 updates.append("remark = ?")
                 params.append(data['remark'])
@@ -353,10 +440,14 @@ class AccountService:
             query = f"UPDATE user_info SET {', '.join(updates)} WHERE id = ?"
             cursor.execute(query, params)
             conn.commit()
-            
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
         finally:
             conn.close()
+        if updated and 'proxy_id' in data:
+            invalidate_proxy_cache([account_id])
+        if updated and any(k in data for k in ('auto_refresh_enabled', 'refresh_interval_days', 'next_refresh_time')):
+            self._notify_refresh_changed([account_id])
+        return updated
     
     def delete_account(self, account_id: int) -> bool:
         """删除账号"""
@@ -366,9 +457,13 @@ class AccountService:
         try:
             cursor.execute("DELETE FROM user_info WHERE id = ?", (account_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
         finally:
             conn.close()
+        if deleted:
+            invalidate_proxy_cache([account_id])
+            self._notify_refresh_changed([account_id])
+        return deleted
     
     def batch_delete_accounts(self, account_ids: List[int]) -> int:
         """批量删除账号"""
@@ -382,9 +477,13 @@ class AccountService:
             placeholders = ','.join(['?'] * len(account_ids))
             cursor.execute(f"DELETE FROM user_info WHERE id IN ({placeholders})", account_ids)
             conn.commit()
-            return cursor.rowcount
+            deleted = cursor.rowcount
         finally:
             conn.close()
+        if deleted:
+            invalidate_proxy_cache(account_ids)
+            self._notify_refresh_changed(account_ids)
+        return deleted
     
     def get_account_statistics(self, account_id: int) -> Dict:
         """
@@ -511,6 +610,40 @@ class AccountService:
         finally:
             conn.close()
     
+    def bulk_update_verify_time(self, results: Dict[int, bool]) -> int:
+        """
+        批量更新验证结果（单个事务）
+        
+        Args:
+            results: {账号ID: 验证结果}
+        
+        Returns:
+            更新的账号数
+        """
+        if not results:
+            return 0
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            cursor.executemany("""
+                UPDATE user_info
+                SET status = ?,
+                    last_verify_time = ?,
+                    verify_count = verify_count + 1,
+                    update_time = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [
+                (self.STATUS_VALID if ok else self.STATUS_INVALID, now, account_id)
+                for account_id, ok in results.items()
+            ])
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+    
     def get_accounts_need_refresh(self) -> List[Dict]:
         """
         获取需要刷新的账号列表（next_refresh_time <= NOW()）
@@ -536,33 +669,98 @@ class AccountService:
         finally:
             conn.close()
     
-    def schedule_next_refresh(self, account_id: int):
+    def schedule_next_refresh(self, account_id: int) -> Optional[Dict]:
         """
-        安排下次刷新时间（刷新完成后调用）
+        安排下次刷新时间（登录/刷新完成后调用）
+        根据验证历史估计的 Cookie 有效期在预测过期前刷新，样本不足时按 refresh_interval_days
         
         Args:
             account_id: 账号ID
+        
+        Returns:
+            刷新计划（见 RefreshPlanner.plan），账号不存在或未设置刷新间隔时返回None
+        """
+        from services.refresh_planner import RefreshPlanner
+        plan = RefreshPlanner().schedule(account_id)
+        self._notify_refresh_changed([account_id])
+        return plan
+    
+    def postpone_refresh(self, account_id: int, seconds: float):
+        """刷新失败后推迟下次刷新（避免到期账号被反复立即重试）"""
+        next_refresh_time = (datetime.now() + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S')
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE user_info
+                SET next_refresh_time = ?, update_time = CURRENT_TIMESTAMP
+                WHERE id = ? AND auto_refresh_enabled = 1
+            """, (next_refresh_time, account_id))
+            conn.commit()
+        finally:
+            conn.close()
+        self._notify_refresh_changed([account_id])
+    
+    def get_refresh_schedule(self, account_ids: List[int] = None) -> Dict[int, str]:
+        """
+        获取启用自动刷新的账号的下次刷新时间
+        
+        Args:
+            account_ids: 账号ID列表，为空时返回全部
+        
+        Returns:
+            {账号ID: next_refresh_time}（未启用自动刷新或未设置时间的账号不包含在内）
         """
         conn = self._get_connection()
         cursor = conn.cursor()
+        try:
+            sql = """
+                SELECT id, next_refresh_time FROM user_info
+                WHERE auto_refresh_enabled = 1 AND next_refresh_time IS NOT NULL
+            """
+            if account_ids is None:
+                cursor.execute(sql)
+                return {row['id']: row['next_refresh_time'] for row in cursor.fetchall()}
+            schedule = {}
+            ids = list(account_ids)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor.execute(sql + f" AND id IN ({','.join(['?'] * len(chunk))})", chunk)
+                schedule.update({row['id']: row['next_refresh_time'] for row in cursor.fetchall()})
+            return schedule
+        finally:
+            conn.close()
+    
+    def log_verifications(self, records: List[Dict]):
+        """
+        批量记录 Cookie 验证结果到 cookie_verification_log（用于估计 Cookie 有效期）
+        失败记录会附带账号当时的预测过期时间，便于对比预测与实际
+        
+        Args:
+            records: [{'account_id', 'platform_type', 'success', 'verify_method', 'error_message'?, 'duration_ms'?}, ...]
+        """
+        if not records:
+            return
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
         
         try:
-            # 获取刷新间隔
-            cursor.execute("SELECT refresh_interval_days FROM user_info WHERE id = ?", (account_id,))
-            row = cursor.fetchone()
-            
-            if row and row[0]:
-                interval_days = row[0]
-                next_refresh_time = datetime.now() + timedelta(days=interval_days)
-                
-                cursor.execute("""
-                    UPDATE user_info
-                    SET next_refresh_time = ?,
-                        update_time = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (next_refresh_time.strftime('%Y-%m-%d %H:%M:%S'), account_id))
-                
-                conn.commit()
+            cursor.executemany("""
+                INSERT INTO cookie_verification_log (
+                    account_id, platform_type, verify_result, verify_method,
+                    error_message, duration_ms, predicted_expiry_time
+                ) VALUES (?, ?, ?, ?, ?, ?,
+                    CASE WHEN ? = 0 THEN (SELECT predicted_expiry_time FROM user_info WHERE id = ?) END)
+            """, [
+                (
+                    r['account_id'], r['platform_type'], 1 if r['success'] else 0, r['verify_method'],
+                    r.get('error_message'), r.get('duration_ms'),
+                    1 if r['success'] else 0, r['account_id'],
+                )
+                for r in records
+            ])
+            conn.commit()
         finally:
             conn.close()
 
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+账号批量验证服务
+并发校验多个账号的 Cookie，按全局/平台/代理限制并发，每个账号完成后立即回调（用于 SSE 推送），
+全部完成后一次性批量写回验证结果。
+
+配置（环境变量）：
+    COOKIE_VERIFY_CONCURRENCY            全局并发（默认16）
+    COOKIE_VERIFY_PLATFORM_CONCURRENCY   平台并发，如 "3=4,2=2"（默认不单独限制）
+    COOKIE_VERIFY_PROXY_CONCURRENCY      同一代理出口的并发（默认4，未关联代理的账号不限制）
+"""
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from myUtils.auth import check_cookie
+from services.account_service import AccountService
+from utils.concurrency import KeyedSemaphore, parse_limit_spec
+
+
+class AccountVerifyService:
+    """账号批量验证服务"""
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        platform_limits: Dict[str, int] = None,
+        proxy_concurrency: int = None,
+    ):
+        self.concurrency = max(1, int(concurrency or os.environ.get("COOKIE_VERIFY_CONCURRENCY", "16")))
+        self.platform_limits = platform_limits or parse_limit_spec(
+            os.environ.get("COOKIE_VERIFY_PLATFORM_CONCURRENCY", ""), default=self.concurrency
+        )
+        self.proxy_concurrency = int(proxy_concurrency or os.environ.get("COOKIE_VERIFY_PROXY_CONCURRENCY", "4"))
+        self.account_service = AccountService()
+
+    async def verify_accounts(
+        self,
+        account_ids: List[int],
+        on_result: Callable[[Dict], None] = None,
+    ) -> List[Dict]:
+        """
+        并发验证账号 Cookie
+
+        Args:
+            account_ids: 账号ID列表
+            on_result: 每个账号验证完成后的回调，参数为单个结果字典
+
+        Returns:
+            [{'account_id', 'platform_type', 'success', 'duration', 'error'?}, ...]（按完成顺序）
+        """
+        accounts = self.account_service.get_accounts_by_ids(account_ids)
+        global_sem = asyncio.Semaphore(self.concurrency)
+        platform_sem = KeyedSemaphore.from_spec(self.platform_limits)
+        proxy_sem = KeyedSemaphore(lambda key: None if key is None else self.proxy_concurrency)
+        results: List[Dict] = []
+
+        async def verify(account: Dict):
+            # 先占平台/代理名额，最后占全局名额，避免等待中的账号占用全局并发
+            async with platform_sem.slot(account['type']), proxy_sem.slot(account.get('proxy_server')):
+                async with global_sem:
+                    start = time.monotonic()
+                    result = {'account_id': account['id'], 'platform_type': account['type']}
+                    try:
+                        # 批量验证的结果会写入验证日志和验证时间，必须是本次实际校验，不使用缓存
+                        result['success'] = bool(
+                            await check_cookie(account['type'], account['filePath'], account['id'], use_cache=False)
+                        )
+                    except Exception as e:
+                        result['success'] = False
+                        result['error'] = str(e)
+                    result['duration'] = round(time.monotonic() - start, 2)
+            results.append(result)
+            if on_result:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    print(f"批量验证结果回调失败: {e}")
+
+        try:
+            await asyncio.gather(*(verify(account) for account in accounts))
+        finally:
+            # 已完成的结果一次性写回（即使部分验证被取消）；校验过程出错的账号不改变状态
+            finished = [r for r in results if 'error' not in r]
+            self.account_service.bulk_update_verify_time({r['account_id']: r['success'] for r in finished})
+            self.account_service.log_verifications([
+                {**r, 'verify_method': 'batch_verify', 'duration_ms': int(r['duration'] * 1000)}
+                for r in finished
+            ])
+        return results
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+浏览器池服务
+维护 N 个常驻 Chromium 进程，按任务分配独立的 BrowserContext（Cookie/代理按 context 隔离），
+避免每次上传都重新启动浏览器；浏览器在使用 M 次后或失去连接时自动回收重建。
+
+固定分配：同一代理（使用代理时）或同一账号（未使用代理时）的 context 固定分配到同一个浏览器，
+该浏览器回收重建后仍使用同一位置；正在等待回收或已断开时改为分配负载最低的浏览器并重新固定。
+
+配置（环境变量）：
+    BROWSER_POOL_SIZE       浏览器数量（默认2）
+    BROWSER_POOL_MAX_USES   单个浏览器分配多少个 context 后回收（默认50）
+    BROWSER_POOL_PINNING    是否按账号/代理固定分配浏览器（默认1）
+
+注意：Playwright 对象绑定在创建它的事件循环上，池必须在同一个事件循环内启动和使用。
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
+from utils.base_social_media import set_init_script, set_route_filter
+
+
+class _PooledBrowser:
+    """池中的单个浏览器进程"""
+
+    def __init__(self, browser: Browser, slot: int):
+        self.browser = browser
+        self.slot = slot
+        self.uses = 0            # 已分配过的 context 数量
+        self.active = 0          # 当前正在使用的 context 数量
+        self.retiring = False    # 达到使用上限，等待空闲后回收
+        self.launched_at = time.time()
+
+    def is_healthy(self) -> bool:
+        return self.browser.is_connected() and not self.retiring
+
+
+class BrowserPool:
+    """
+    Playwright 浏览器池
+
+    用法：
+        async with BrowserPool() as pool:
+            async with pool.context(storage_state=cookie_file, proxy=proxy_config, key=account_id) as context:
+                page = await context.new_page()
+                ...
+    """
+
+    def __init__(
+        self,
+        size: int = None,
+        max_uses: int = None,
+        headless: bool = None,
+        executable_path: str = None,
+        pinning: bool = None,
+    ):
+        self.size = max(1, int(size or os.environ.get("BROWSER_POOL_SIZE", "2")))
+        self.max_uses = max(1, int(max_uses or os.environ.get("BROWSER_POOL_MAX_USES", "50")))
+        if pinning is None:
+            pinning = os.environ.get("BROWSER_POOL_PINNING", "1") == "1"
+        self.pinning = pinning
+        self.headless = LOCAL_CHROME_HEADLESS if headless is None else headless
+        if executable_path is None and LOCAL_CHROME_PATH and Path(LOCAL_CHROME_PATH).exists():
+            executable_path = LOCAL_CHROME_PATH
+        self.executable_path = executable_path
+
+        self._playwright_cm = None
+        self._playwright = None
+        self._browsers: List[Optional[_PooledBrowser]] = [None] * self.size
+        # 固定分配：分配标识（代理/账号） -> 浏览器位置
+        self._pins: Dict[Hashable, int] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._started = False
+        self._stats = {
+            'launched': 0,
+            'recycled': 0,
+            'unhealthy': 0,
+            'contexts': 0,
+            'pinned': 0,
+            'repinned': 0,
+        }
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """启动 Playwright 并预热浏览器"""
+        if self._started:
+            return
+        self._lock = asyncio.Lock()
+        self._playwright_cm = async_playwright()
+        self._playwright = await self._playwright_cm.__aenter__()
+        self._started = True
+        async with self._lock:
+            for slot in range(self.size):
+                try:
+                    self._browsers[slot] = await self._launch(slot)
+                except Exception as e:
+                    # 预热失败不影响启动，使用时再按需拉起
+                    print(f"[BrowserPool] 预热浏览器 {slot} 失败: {e}")
+        print(f"✅ 浏览器池已启动 (size={self.size}, max_uses={self.max_uses})")
+
+    async def close(self):
+        """关闭全部浏览器和 Playwright"""
+        if not self._started:
+            return
+        self._started = False
+        for slot, pooled in enumerate(self._browsers):
+            if pooled:
+                await self._close_browser(pooled)
+            self._browsers[slot] = None
+        try:
+            await self._playwright_cm.__aexit__(None, None, None)
+        finally:
+            self._playwright_cm = None
+            self._playwright = None
+
+    async def _launch(self, slot: int) -> _PooledBrowser:
+        options = {"headless": self.headless}
+        if self.executable_path:
+            options["executable_path"] = self.executable_path
+        browser = await self._playwright.chromium.launch(**options)
+        self._stats['launched'] += 1
+        return _PooledBrowser(browser, slot)
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            print(f"[BrowserPool] 关闭浏览器 {pooled.slot} 失败: {e}")
+
+    async def _acquire_browser(self, pin_key: Hashable = None) -> _PooledBrowser:
+        """
+        选择浏览器，必要时重建
+        :param pin_key: 固定分配标识；已固定且浏览器健康时使用同一浏览器，否则选择负载最低的健康浏览器并固定
+        """
+        if not self._started:
+            await self.start()
+        async with self._lock:
+            for slot, pooled in enumerate(self._browsers):
+                if pooled is None:
+                    self._browsers[slot] = await self._launch(slot)
+                elif not pooled.browser.is_connected():
+                    self._stats['unhealthy'] += 1
+                    print(f"[BrowserPool] 浏览器 {slot} 已断开，重新启动")
+                    await self._close_browser(pooled)
+                    self._browsers[slot] = await self._launch(slot)
+                elif pooled.retiring and pooled.active == 0:
+                    self._stats['recycled'] += 1
+                    await self._close_browser(pooled)
+                    self._browsers[slot] = await self._launch(slot)
+
+            candidates = [b for b in self._browsers if b and b.is_healthy()]
+            if not candidates:
+                # 所有浏览器都在等待回收：临时替换负载最低的那个
+                pooled = min(self._browsers, key=lambda b: b.active)
+                self._stats['recycled'] += 1
+                replacement = await self._launch(pooled.slot)
+                self._browsers[pooled.slot] = replacement
+                if pooled.active == 0:
+                    await self._close_browser(pooled)
+                candidates = [replacement]
+
+            pinned_slot = self._pins.get(pin_key) if pin_key is not None else None
+            pinned = self._browsers[pinned_slot] if pinned_slot is not None else None
+            if pinned is not None and pinned.is_healthy():
+                pooled = pinned
+                self._stats['pinned'] += 1
+            else:
+                pooled = min(candidates, key=lambda b: (b.active, b.uses))
+                if pin_key is not None:
+                    if pinned_slot is not None:
+                        self._stats['repinned'] += 1
+                    self._pins[pin_key] = pooled.slot
+            pooled.uses += 1
+            pooled.active += 1
+            if pooled.uses >= self.max_uses:
+                pooled.retiring = True
+            return pooled
+
+    async def _release_browser(self, pooled: _PooledBrowser):
+        async with self._lock:
+            pooled.active -= 1
+            # 已被替换出池的浏览器，在最后一个 context 释放后关闭
+            if pooled.active == 0 and self._browsers[pooled.slot] is not pooled:
+                await self._close_browser(pooled)
+
+    def _pin_key(self, proxy: Optional[Dict], key) -> Optional[Hashable]:
+        """固定分配标识：使用代理时按代理出口，否则按账号"""
+        if not self.pinning:
+            return None
+        if proxy and proxy.get('server'):
+            return ('proxy', proxy['server'], proxy.get('username'))
+        if key is not None:
+            return ('account', key)
+        return None
+
+    @asynccontextmanager
+    async def context(
+        self, storage_state=None, proxy: Optional[Dict] = None, key=None, platform: str = None, **context_options
+    ):
+        """
+        分配一个新的 BrowserContext，退出时自动关闭
+
+        Args:
+            storage_state: Cookie 文件路径（storage_state）
+            proxy: Playwright 代理配置
+            key: 分配标识（通常为账号ID）；未使用代理时按它固定分配浏览器
+            platform: 平台名（SOCIAL_MEDIA_*），传入时拦截上传不需要的请求（set_route_filter）
+            context_options: 其它 new_context 参数（如 viewport）
+        """
+        pooled = await self._acquire_browser(self._pin_key(proxy, key))
+        context: Optional[BrowserContext] = None
+        try:
+            context_config = dict(context_options)
+            if storage_state:
+                context_config["storage_state"] = str(storage_state)
+            if proxy:
+                context_config["proxy"] = proxy
+            context = await pooled.browser.new_context(**context_config)
+            context = await set_init_script(context)
+            if platform:
+                context = await set_route_filter(context, platform)
+            self._stats['contexts'] += 1
+            print(f"[BrowserPool] 分配 context: browser={pooled.slot}, key={key}, proxy={'yes' if proxy else 'no'}")
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            await self._release_browser(pooled)
+
+    def stats(self) -> Dict:
+        """返回池状态"""
+        return {
+            **self._stats,
+            'size': self.size,
+            'max_uses': self.max_uses,
+            'pinning': self.pinning,
+            'pins': len(self._pins),
+            'browsers': [
+                {
+                    'slot': b.slot,
+                    'connected': b.browser.is_connected(),
+                    'uses': b.uses,
+                    'active': b.active,
+                    'retiring': b.retiring,
+                }
+                for b in self._browsers if b
+            ],
+        }
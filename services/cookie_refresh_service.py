@@ -5,14 +5,15 @@ Cookie刷新服务
 负责自动刷新账号Cookie，避免过期
 """
 import asyncio
-import sqlite3
 import uuid
 from datetime import datetime
 from pathlib import Path
 from queue import Queue
 from typing import List, Dict, Optional
 from conf import BASE_DIR, LOCAL_CHROME_HEADLESS, LOCAL_CHROME_PATH
+from utils.sqlite_pool import get_connection
 from myUtils.auth import check_cookie
+from myUtils.cookie_cache import get_cookie_check_cache
 from playwright.async_api import async_playwright
 from utils.base_social_media import set_init_script
 from services.account_service import AccountService
@@ -28,11 +29,8 @@ class CookieRefreshService:
         self.db_path = BASE_DIR / "db" / "database.db"
     
     def _get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
-        return conn
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
     
     def _log_refresh_result(
         self,
@@ -44,26 +42,14 @@ class CookieRefreshService:
         verify_method: str = 'auto_refresh',
     ):
         """记录刷新结果到日志表"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                INSERT INTO cookie_verification_log (
-                    account_id, platform_type, verify_result, 
-                    verify_method, error_message, duration_ms
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                account_id,
-                platform_type,
-                1 if success else 0,
-                verify_method,
-                error_message,
-                duration_ms
-            ))
-            conn.commit()
-        finally:
-            conn.close()
+        self.account_service.log_verifications([{
+            'account_id': account_id,
+            'platform_type': platform_type,
+            'success': success,
+            'verify_method': verify_method,
+            'error_message': error_message,
+            'duration_ms': duration_ms,
+        }])
 
     async def refresh_account_cookie_background(self, account_id: int) -> Dict:
         """
@@ -128,6 +114,7 @@ class CookieRefreshService:
 
                 # 覆盖导出最新 cookie
                 await context.storage_state(path=str(cookie_file))
+                get_cookie_check_cache().invalidate(cookie_file)
 
                 await page.close()
                 await context.close()
@@ -265,29 +252,17 @@ class CookieRefreshService:
         
         return results
 
-    async def batch_refresh_cookies_background(self, account_ids: List[int], concurrency: int = 1) -> Dict:
-        """批量后台无感刷新（并发受控）"""
-        results = {'total': len(account_ids), 'success': 0, 'failed': 0, 'details': []}
-        sem = asyncio.Semaphore(max(1, int(concurrency or 1)))
-
-        async def run_one(aid: int):
-            async with sem:
-                return await self.refresh_account_cookie_background(aid)
-
-        tasks = [asyncio.create_task(run_one(aid)) for aid in account_ids]
-        done = await asyncio.gather(*tasks, return_exceptions=True)
-        for aid, r in zip(account_ids, done):
-            if isinstance(r, Exception):
-                results['failed'] += 1
-                results['details'].append({'account_id': aid, 'success': False, 'message': f'后台刷新异常: {str(r)}'})
-                continue
-            if r.get('success'):
-                results['success'] += 1
-            else:
-                results['failed'] += 1
-            results['details'].append({'account_id': aid, **r})
+    async def batch_refresh_cookies_background(self, account_ids: List[int], concurrency: int = None) -> Dict:
+        """
+        批量后台无感刷新
+        并发受全局/平台/代理/内存预算限制，近期有待发布任务的账号优先刷新（见 RefreshExecutor）
 
-        return results
+        Args:
+            concurrency: 全局并发，为空时读取 COOKIE_REFRESH_CONCURRENCY
+        """
+        from services.refresh_executor import RefreshExecutor
+        executor = RefreshExecutor(self.refresh_account_cookie_background, concurrency=concurrency)
+        return await executor.refresh_many(account_ids)
 
     def get_refresh_logs(self, account_id: int, limit: int = 50, offset: int = 0) -> Dict:
         """分页获取单账号刷新/验证日志"""
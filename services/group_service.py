@@ -4,11 +4,11 @@
 分组管理服务
 负责账号分组的CRUD操作
 """
-import sqlite3
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
 
 
 class GroupService:
@@ -18,11 +18,8 @@ class GroupService:
         self.db_path = BASE_DIR / "db" / "database.db"
     
     def _get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
-        return conn
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
     
     def get_groups(self) -> List[Dict]:
         """获取所有分组"""
@@ -172,6 +172,10 @@ class LoginService:
             if account_id:
                 self.account_service.update_account(account_id, {"filePath": cookie_file, "status": AccountService.STATUS_VALID})
                 self.account_service.update_verify_time(account_id, True)
+                self.account_service.log_verifications([{
+                    'account_id': account_id, 'platform_type': platform_type,
+                    'success': True, 'verify_method': 'login',
+                }])
                 self.account_service.schedule_next_refresh(account_id)
                 push({"event": "success", "code": 200, "msg": "刷新 Cookie 成功", "account_id": account_id, "filePath": cookie_file})
                 return {"success": True, "account_id": account_id, "filePath": cookie_file}
@@ -188,6 +192,10 @@ class LoginService:
                 account_data["proxy_id"] = proxy_id
             new_id = self.account_service.create_account(account_data)
             self.account_service.update_verify_time(new_id, True)
+            self.account_service.log_verifications([{
+                'account_id': new_id, 'platform_type': platform_type,
+                'success': True, 'verify_method': 'login',
+            }])
             self.account_service.schedule_next_refresh(new_id)
             push({"event": "success", "code": 200, "msg": "登录成功", "account_id": new_id, "filePath": cookie_file})
             return {"success": True, "account_id": new_id, "filePath": cookie_file}
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+媒体探测服务
+上传完成后把文件ID投递到后台队列，在任务 worker 的事件循环上以有限并发探测视频时长/宽高/编码，
+写回 file_records（duration、width、height、video_codec、probe_status）。
+任务执行器启动浏览器前调用 check_before_launch()，时长或宽高比不符合平台限制的视频直接失败（不重试）。
+
+探测方式：安装了 ffprobe 时优先使用（子进程），否则使用纯 Python 的 MP4 box 解析（utils.media_info）。
+队列满或进程重启时未探测的文件保留 probe_status 为空，后台定期从数据库补充。
+
+配置（环境变量）：
+    MEDIA_PROBE_BACKEND           auto（默认）/ ffprobe / mp4
+    MEDIA_PROBE_CONCURRENCY       探测并发（默认2）
+    MEDIA_PROBE_QUEUE_SIZE        队列容量（默认1000）
+    MEDIA_PROBE_TIMEOUT_SECONDS   单个文件 ffprobe 超时（默认30秒）
+    MEDIA_PROBE_RESCAN_SECONDS    从数据库补充未探测文件的间隔（默认300秒）
+    MEDIA_MAX_DURATION_SECONDS    各平台视频时长上限（秒），如 "*=3600,1=900"，0 或未配置表示不限制
+    MEDIA_ASPECT_RANGE            各平台允许的宽高比范围（宽/高），如 "*=0.3:3,3=0.5:1"，未配置表示不限制
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from conf import BASE_DIR
+from utils.concurrency import parse_limit_spec
+from utils.media_info import MP4_EXTENSIONS, MediaProbeError, ffprobe_available, probe_ffprobe, probe_mp4
+from utils.sqlite_pool import get_connection
+from services.task_worker import get_task_worker
+
+
+class MediaIncompatibleError(Exception):
+    """视频不符合平台限制（按永久错误处理，不重试）"""
+
+
+def _parse_aspect_range(value: str) -> Tuple[float, float]:
+    low, _, high = value.partition(':')
+    return float(low), float(high)
+
+
+class MediaProbeService:
+    """媒体探测服务"""
+
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self):
+        self.db_path = BASE_DIR / "db" / "database.db"
+        self.video_dir = Path(BASE_DIR / "videoFile")
+        self.backend = os.environ.get("MEDIA_PROBE_BACKEND", "auto").lower()
+        self.concurrency = max(1, int(os.environ.get("MEDIA_PROBE_CONCURRENCY", "2")))
+        self.queue_size = max(1, int(os.environ.get("MEDIA_PROBE_QUEUE_SIZE", "1000")))
+        self.timeout = float(os.environ.get("MEDIA_PROBE_TIMEOUT_SECONDS", "30"))
+        self.rescan_interval = max(1.0, float(os.environ.get("MEDIA_PROBE_RESCAN_SECONDS", "300")))
+        self.max_durations = parse_limit_spec(os.environ.get("MEDIA_MAX_DURATION_SECONDS", ""), value_type=float)
+        self.aspect_ranges = parse_limit_spec(
+            os.environ.get("MEDIA_ASPECT_RANGE", ""), value_type=_parse_aspect_range
+        )
+        # RUN_MEDIA_PROBE=0：本进程不在后台探测（执行任务前仍会按需探测）
+        self.autostart = os.environ.get("RUN_MEDIA_PROBE", "1") == "1"
+        self._running = False
+        self._future: Optional[Future] = None
+        # 以下对象仅在 worker 事件循环内访问
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued = set()
+        self._stats = {'probed': 0, 'failed': 0, 'overflowed': 0}
+        self._ensure_schema()
+
+    def _get_connection(self):
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path, foreign_keys=False)
+
+    def _ensure_schema(self):
+        """确保文件表具备探测结果字段"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA table_info(file_records)")
+            cols = {row["name"] for row in cursor.fetchall()}
+            for name, ddl in (
+                ("duration", "REAL"),
+                ("width", "INTEGER"),
+                ("height", "INTEGER"),
+                ("video_codec", "TEXT"),
+                ("probe_status", "TEXT"),
+                ("probe_error", "TEXT"),
+            ):
+                if name not in cols:
+                    cursor.execute(f"ALTER TABLE file_records ADD COLUMN {name} {ddl}")
+                    conn.commit()
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # 后台队列
+    # ---------------------------
+    def start(self):
+        """在任务 worker 的事件循环上启动后台探测"""
+        if self._running:
+            return
+        self._running = True
+        self._future = get_task_worker().run_coroutine(self._probe_loop())
+        print(f"✅ 媒体探测已启动 (backend={self._backend()}, concurrency={self.concurrency})")
+
+    def stop(self):
+        self._running = False
+        if self._future:
+            self._future.cancel()
+            self._future = None
+
+    def submit(self, file_id: int):
+        """投递新上传的文件（线程安全，立即返回）；未启动后台探测时由执行任务前按需探测"""
+        if not self._running:
+            if not self.autostart:
+                return
+            self.start()
+        get_task_worker().run_coroutine(self._enqueue(int(file_id)))
+
+    def stats(self) -> Dict:
+        return {**self._stats, 'running': self._running, 'queued': len(self._queued), 'backend': self._backend()}
+
+    async def _probe_loop(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        try:
+            while self._running:
+                # 补充队列满时被丢弃的、进程重启前未探测的文件
+                for file_id in self._get_unprobed_ids(self.queue_size - self._queue.qsize()):
+                    await self._enqueue(file_id)
+                await asyncio.sleep(self.rescan_interval)
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+
+    async def _enqueue(self, file_id: int):
+        if self._queue is None or file_id in self._queued:
+            return
+        try:
+            self._queue.put_nowait(file_id)
+        except asyncio.QueueFull:
+            # probe_status 仍为空，下次从数据库补充
+            self._stats['overflowed'] += 1
+            return
+        self._queued.add(file_id)
+
+    async def _consume(self):
+        while True:
+            file_id = await self._queue.get()
+            try:
+                await self.probe_file(file_id)
+            except Exception as e:
+                print(f"❌ 媒体探测出错 file_id={file_id}: {e}")
+            finally:
+                self._queued.discard(file_id)
+                self._queue.task_done()
+
+    def _get_unprobed_ids(self, limit: int) -> List[int]:
+        if limit <= 0:
+            return []
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT id FROM file_records
+                WHERE probe_status IS NULL AND file_type = 'video'
+                ORDER BY id DESC LIMIT ?
+            ''', (limit,)).fetchall()
+            return [row['id'] for row in rows]
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # 探测
+    # ---------------------------
+    def _backend(self) -> str:
+        if self.backend == 'auto':
+            return 'ffprobe' if ffprobe_available() else 'mp4'
+        return self.backend
+
+    async def probe_path(self, path: Path) -> Dict:
+        """
+        探测单个文件
+        :raises MediaProbeError: 无法解析
+        """
+        if self._backend() == 'ffprobe':
+            try:
+                return await probe_ffprobe(path, timeout=self.timeout)
+            except (MediaProbeError, OSError):
+                if self.backend == 'ffprobe' or path.suffix.lower() not in MP4_EXTENSIONS:
+                    raise
+        if path.suffix.lower() not in MP4_EXTENSIONS:
+            raise MediaProbeError(f"未安装 ffprobe，无法解析 {path.suffix} 文件")
+        # 只读取文件头部的 box，放到线程中避免阻塞事件循环
+        return await asyncio.to_thread(probe_mp4, path)
+
+    async def probe_file(self, file_id: int) -> Optional[Dict]:
+        """
+        探测 file_records 中的文件并写回结果；同一内容（blob_id）已探测过时直接复制结果
+        :returns: 更新后的文件记录，记录不存在时返回 None
+        """
+        record = self._get_record(file_id)
+        if record is None:
+            return None
+        info = self._find_probed_sibling(record)
+        error = None
+        if info is None:
+            try:
+                info = await self.probe_path(self.video_dir / record['file_path'])
+            except (MediaProbeError, OSError, ValueError) as e:
+                error = str(e)
+        self._save_result(file_id, info, error)
+        if error:
+            self._stats['failed'] += 1
+            print(f"⚠️ 媒体探测失败 file_id={file_id}: {error}")
+        else:
+            self._stats['probed'] += 1
+        return self._get_record(file_id)
+
+    def _get_record(self, file_id: int) -> Optional[Dict]:
+        conn = self._get_connection()
+        try:
+            row = conn.execute("SELECT * FROM file_records WHERE id = ?", (file_id,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def _find_probed_sibling(self, record: Dict) -> Optional[Dict]:
+        if not record.get('blob_id'):
+            return None
+        conn = self._get_connection()
+        try:
+            row = conn.execute('''
+                SELECT duration, width, height, video_codec AS codec FROM file_records
+                WHERE blob_id = ? AND id != ? AND probe_status = ? LIMIT 1
+            ''', (record['blob_id'], record['id'], self.DONE)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def _save_result(self, file_id: int, info: Optional[Dict], error: Optional[str]):
+        conn = self._get_connection()
+        try:
+            if error:
+                conn.execute(
+                    "UPDATE file_records SET probe_status = ?, probe_error = ? WHERE id = ?",
+                    (self.FAILED, error[:500], file_id),
+                )
+            else:
+                conn.execute('''
+                    UPDATE file_records
+                    SET duration = ?, width = ?, height = ?, video_codec = ?, probe_status = ?, probe_error = NULL
+                    WHERE id = ?
+                ''', (info.get('duration'), info.get('width'), info.get('height'), info.get('codec'),
+                      self.DONE, file_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # 发布前检查
+    # ---------------------------
+    def incompatibility(self, platform_type: int, record: Dict) -> Optional[str]:
+        """
+        按平台限制检查已探测的文件
+        :returns: 不符合时返回原因，符合或无法判断（未探测成功）时返回 None
+        """
+        if record.get('probe_status') != self.DONE:
+            return None
+        key = str(platform_type)
+        max_duration = self.max_durations.get(key, self.max_durations.get('*'))
+        duration = record.get('duration')
+        if max_duration and duration and duration > max_duration:
+            return f"视频时长 {duration:.0f}秒 超过平台限制 {max_duration:.0f}秒"
+        aspect_range = self.aspect_ranges.get(key, self.aspect_ranges.get('*'))
+        width, height = record.get('width'), record.get('height')
+        if aspect_range and width and height:
+            aspect = width / height
+            low, high = aspect_range
+            if not low <= aspect <= high:
+                return f"视频宽高比 {width}x{height}（{aspect:.2f}）不在平台允许范围 {low:g}~{high:g}"
+        return None
+
+    async def check_before_launch(self, platform_type: int, file_info: Dict) -> Dict:
+        """
+        任务执行器启动浏览器前调用：尚未探测的文件当场探测，再按平台限制检查
+
+        Returns:
+            探测后的文件记录
+
+        Raises:
+            MediaIncompatibleError: 视频不符合平台限制
+        """
+        if file_info.get('probe_status') is None and file_info.get('file_type') == 'video':
+            file_info = await self.probe_file(file_info['id']) or file_info
+        reason = self.incompatibility(platform_type, file_info)
+        if reason:
+            raise MediaIncompatibleError(f"视频不兼容: {reason}")
+        return file_info
+
+
+_media_probe: Optional[MediaProbeService] = None
+_media_probe_lock = threading.Lock()
+
+
+def get_media_probe_service() -> MediaProbeService:
+    """获取进程内共享的媒体探测服务（后台队列只有一个）"""
+    global _media_probe
+    with _media_probe_lock:
+        if _media_probe is None:
+            _media_probe = MediaProbeService()
+        return _media_probe
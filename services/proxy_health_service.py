@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+代理健康检查服务
+后台定期探测代理：与代理建立 TCP 连接后通过 HTTP CONNECT / SOCKS5 握手连到目标地址，记录延迟、
+成功率（指数滑动平均）和最近检查时间，写回 proxies 表（/api/proxies 直接返回这些字段）。
+任务执行器启动浏览器前调用 check_before_launch()，按策略延后任务或临时换用健康代理。
+
+配置（环境变量）：
+    PROXY_HEALTH_TARGET            探测目标（默认 www.baidu.com:443）
+    PROXY_HEALTH_TIMEOUT_SECONDS   单次探测超时（默认5秒）
+    PROXY_HEALTH_INTERVAL_SECONDS  后台探测间隔（默认300秒）
+    PROXY_HEALTH_MAX_AGE_SECONDS   启动浏览器前，检查结果超过该时间则重新探测（默认600秒）
+    PROXY_HEALTH_CONCURRENCY       后台探测并发（默认8）
+    PROXY_HEALTH_FAIL_THRESHOLD    连续失败多少次判定为不健康（默认2）
+    PROXY_HEALTH_MAX_LATENCY_MS    延迟超过该值判定为不健康（默认5000）
+    PROXY_UNHEALTHY_POLICY         代理不健康时的处理：defer 延后重试（默认）/ substitute 换用健康代理 / ignore 照常使用
+"""
+import asyncio
+import base64
+import os
+import ssl
+import struct
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
+from services.task_worker import get_task_worker
+
+
+class ProxyUnavailableError(Exception):
+    """账号关联的代理不可用（按临时错误重试）"""
+
+
+class ProxyHealthService:
+    """代理健康检查服务"""
+
+    HEALTHY = 'healthy'
+    UNHEALTHY = 'unhealthy'
+    UNKNOWN = 'unknown'
+
+    # 成功率滑动平均系数
+    SUCCESS_RATE_ALPHA = 0.3
+
+    def __init__(self, target: str = None, timeout: float = None, policy: str = None):
+        self.db_path = BASE_DIR / "db" / "database.db"
+        target = target or os.environ.get("PROXY_HEALTH_TARGET", "www.baidu.com:443")
+        host, _, port = target.rpartition(':')
+        self.target: Tuple[str, int] = (host or target, int(port) if host else 443)
+        self.timeout = float(timeout or os.environ.get("PROXY_HEALTH_TIMEOUT_SECONDS", "5"))
+        self.interval = float(os.environ.get("PROXY_HEALTH_INTERVAL_SECONDS", "300"))
+        self.max_age = float(os.environ.get("PROXY_HEALTH_MAX_AGE_SECONDS", "600"))
+        self.concurrency = max(1, int(os.environ.get("PROXY_HEALTH_CONCURRENCY", "8")))
+        self.fail_threshold = max(1, int(os.environ.get("PROXY_HEALTH_FAIL_THRESHOLD", "2")))
+        self.max_latency_ms = int(os.environ.get("PROXY_HEALTH_MAX_LATENCY_MS", "5000"))
+        self.policy = (policy or os.environ.get("PROXY_UNHEALTHY_POLICY", "defer")).lower()
+        self._running = False
+        self._future: Optional[Future] = None
+        self._ensure_schema()
+
+    def _get_connection(self):
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
+
+    def _ensure_schema(self):
+        """确保代理表具备健康检查字段"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA table_info(proxies)")
+            cols = {row["name"] for row in cursor.fetchall()}
+            for name, ddl in (
+                ("health_status", "TEXT DEFAULT 'unknown'"),
+                ("last_latency_ms", "INTEGER"),
+                ("success_rate", "REAL"),
+                ("consecutive_failures", "INTEGER DEFAULT 0"),
+                ("check_count", "INTEGER DEFAULT 0"),
+                ("last_check_time", "DATETIME"),
+                ("last_check_error", "TEXT"),
+            ):
+                if name not in cols:
+                    cursor.execute(f"ALTER TABLE proxies ADD COLUMN {name} {ddl}")
+                    conn.commit()
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # 探测
+    # ---------------------------
+    async def _handshake_http(self, reader, writer, proxy: Dict):
+        host, port = self.target
+        lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+        if proxy.get('username'):
+            token = base64.b64encode(f"{proxy['username']}:{proxy.get('password') or ''}".encode()).decode()
+            lines.append(f"Proxy-Authorization: Basic {token}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await writer.drain()
+        status_line = (await reader.readline()).decode('latin-1').strip()
+        parts = status_line.split(' ', 2)
+        if len(parts) < 2 or parts[1] != '200':
+            raise ConnectionError(f"CONNECT 失败: {status_line or '无响应'}")
+
+    async def _handshake_socks5(self, reader, writer, proxy: Dict):
+        host, port = self.target
+        username, password = proxy.get('username'), proxy.get('password') or ''
+        writer.write(b'\x05\x02\x00\x02' if username else b'\x05\x01\x00')
+        await writer.drain()
+        version, method = await reader.readexactly(2)
+        if version != 5 or method == 0xFF:
+            raise ConnectionError("SOCKS5 不接受认证方式")
+        if method == 0x02:
+            if not username:
+                raise ConnectionError("SOCKS5 需要用户名密码")
+            user, pwd = username.encode(), password.encode()
+            writer.write(bytes([1, len(user)]) + user + bytes([len(pwd)]) + pwd)
+            await writer.drain()
+            _, status = await reader.readexactly(2)
+            if status != 0:
+                raise ConnectionError("SOCKS5 认证失败")
+        name = host.encode()
+        writer.write(b'\x05\x01\x00\x03' + bytes([len(name)]) + name + struct.pack('>H', port))
+        await writer.drain()
+        _, rep, _, atyp = await reader.readexactly(4)
+        if rep != 0:
+            raise ConnectionError(f"SOCKS5 连接目标失败: rep={rep}")
+        # 读掉绑定地址，保证握手完整
+        addr_len = {1: 4, 4: 16}.get(atyp)
+        if addr_len is None:
+            addr_len = (await reader.readexactly(1))[0]
+        await reader.readexactly(addr_len + 2)
+
+    async def probe(self, proxy: Dict) -> Dict:
+        """
+        探测单个代理
+
+        Args:
+            proxy: proxies 表的一行
+
+        Returns:
+            {'proxy_id', 'success', 'latency_ms', 'error'}
+        """
+        proxy_type = (proxy.get('proxy_type') or 'http').lower()
+        start = time.monotonic()
+        result = {'proxy_id': proxy['id'], 'success': False, 'latency_ms': None, 'error': None}
+        writer = None
+        try:
+            async def connect():
+                nonlocal writer
+                tls = ssl.create_default_context() if proxy_type == 'https' else None
+                reader, writer = await asyncio.open_connection(proxy['host'], int(proxy['port']), ssl=tls)
+                if proxy_type.startswith('socks'):
+                    await self._handshake_socks5(reader, writer, proxy)
+                else:
+                    await self._handshake_http(reader, writer, proxy)
+            await asyncio.wait_for(connect(), timeout=self.timeout)
+            result['success'] = True
+            result['latency_ms'] = int((time.monotonic() - start) * 1000)
+        except asyncio.TimeoutError:
+            result['error'] = f"探测超时（{self.timeout:g}秒）"
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            result['error'] = str(e) or type(e).__name__
+        finally:
+            if writer is not None:
+                writer.close()
+        return result
+
+    # ---------------------------
+    # 记录
+    # ---------------------------
+    def _evaluate(self, success: bool, latency_ms: Optional[int], failures: int) -> Tuple[str, Optional[str]]:
+        if failures >= self.fail_threshold:
+            return self.UNHEALTHY, None
+        if success and latency_ms is not None and latency_ms > self.max_latency_ms:
+            return self.UNHEALTHY, f"延迟过高: {latency_ms}ms"
+        return self.HEALTHY, None
+
+    def record_results(self, results: List[Dict]):
+        """将探测结果写回 proxies 表"""
+        if not results:
+            return
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            ids = [r['proxy_id'] for r in results]
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(
+                f"SELECT id, success_rate, consecutive_failures FROM proxies WHERE id IN ({placeholders})", ids
+            )
+            previous = {row['id']: dict(row) for row in cursor.fetchall()}
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            updates = []
+            for r in results:
+                prev = previous.get(r['proxy_id'])
+                if prev is None:
+                    continue
+                ok = 1.0 if r['success'] else 0.0
+                rate = ok if prev['success_rate'] is None else (
+                    prev['success_rate'] * (1 - self.SUCCESS_RATE_ALPHA) + ok * self.SUCCESS_RATE_ALPHA
+                )
+                failures = 0 if r['success'] else (prev['consecutive_failures'] or 0) + 1
+                status, reason = self._evaluate(r['success'], r['latency_ms'], failures)
+                updates.append((
+                    status, r['latency_ms'], round(rate, 4), failures, now, r['error'] or reason, r['proxy_id']
+                ))
+            cursor.executemany('''
+                UPDATE proxies
+                SET health_status = ?, last_latency_ms = ?, success_rate = ?,
+                    consecutive_failures = ?, last_check_time = ?, last_check_error = ?,
+                    check_count = COALESCE(check_count, 0) + 1
+                WHERE id = ?
+            ''', updates)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _get_proxies(self, proxy_ids: List[int] = None) -> List[Dict]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            if proxy_ids is None:
+                cursor.execute("SELECT * FROM proxies WHERE is_enabled = 1")
+            else:
+                placeholders = ','.join('?' * len(proxy_ids))
+                cursor.execute(f"SELECT * FROM proxies WHERE id IN ({placeholders})", list(proxy_ids))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    async def check_proxies(self, proxy_ids: List[int] = None) -> List[Dict]:
+        """
+        并发探测代理并写回结果
+
+        Args:
+            proxy_ids: 要探测的代理ID；为空时探测全部已启用代理
+
+        Returns:
+            探测结果列表
+        """
+        proxies = self._get_proxies(proxy_ids)
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def run(proxy):
+            async with sem:
+                return await self.probe(proxy)
+
+        results = list(await asyncio.gather(*(run(p) for p in proxies)))
+        self.record_results(results)
+        return results
+
+    # ---------------------------
+    # 启动浏览器前的检查
+    # ---------------------------
+    def _is_stale(self, proxy: Dict) -> bool:
+        try:
+            checked = datetime.strptime(proxy.get('last_check_time') or '', '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return True
+        return time.time() - checked.timestamp() > self.max_age
+
+    def _find_substitute(self, proxy: Dict) -> Optional[Dict]:
+        """选一个健康的代理（优先同类型，其次成功率高、延迟低）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT * FROM proxies
+                WHERE is_enabled = 1 AND health_status = ? AND id != ?
+                ORDER BY (proxy_type = ?) DESC, success_rate DESC, last_latency_ms ASC
+                LIMIT 1
+            ''', (self.HEALTHY, proxy['id'], proxy['proxy_type']))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    async def check_before_launch(self, proxy_id: Optional[int]) -> Optional[Dict]:
+        """
+        启动浏览器前检查账号关联的代理
+
+        Returns:
+            None 表示照常使用账号的代理；返回 proxies 表的一行表示临时换用该代理
+
+        Raises:
+            ProxyUnavailableError: 代理不健康且策略为 defer（或找不到可替代的代理）
+        """
+        if not proxy_id or self.policy == 'ignore':
+            return None
+        proxies = self._get_proxies([proxy_id])
+        if not proxies or not proxies[0].get('is_enabled'):
+            return None
+        proxy = proxies[0]
+        unhealthy = proxy.get('health_status') == self.UNHEALTHY
+        if self._is_stale(proxy):
+            # 结果过期时当场探测一次，这次探测失败即视为不可用
+            results = await self.check_proxies([proxy_id])
+            proxy = self._get_proxies([proxy_id])[0]
+            unhealthy = proxy.get('health_status') == self.UNHEALTHY or not results[0]['success']
+        if not unhealthy:
+            return None
+
+        reason = f"代理不可用 proxy={proxy['proxy_name']}: {proxy.get('last_check_error') or '连续探测失败'}"
+        if self.policy == 'substitute':
+            substitute = self._find_substitute(proxy)
+            if substitute:
+                print(f"⚠️ {reason}，临时换用代理 {substitute['proxy_name']}")
+                return substitute
+        raise ProxyUnavailableError(reason)
+
+    # ---------------------------
+    # 后台探测
+    # ---------------------------
+    def start(self):
+        """在任务 worker 的事件循环上启动后台探测"""
+        if self._running:
+            return
+        self._running = True
+        self._future = get_task_worker().run_coroutine(self._check_loop())
+        print(f"✅ 代理健康检查已启动 (interval={self.interval:.0f}s, target={self.target[0]}:{self.target[1]})")
+
+    def stop(self):
+        self._running = False
+        if self._future:
+            self._future.cancel()
+            self._future = None
+
+    async def _check_loop(self):
+        while self._running:
+            try:
+                results = await self.check_proxies()
+                failed = [r['proxy_id'] for r in results if not r['success']]
+                if failed:
+                    print(f"⚠️ 代理健康检查: {len(failed)}/{len(results)} 个代理探测失败 {failed}")
+            except Exception as e:
+                print(f"❌ 代理健康检查出错: {e}")
+            await asyncio.sleep(self.interval)
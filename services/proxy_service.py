@@ -4,10 +4,11 @@
 代理管理服务
 负责代理的CRUD操作
 """
-import sqlite3
 from pathlib import Path
 from typing import List, Dict, Optional
 from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
+from myUtils.proxy_helper import invalidate_proxy_cache
 
 
 class ProxyService:
@@ -17,11 +18,8 @@ class ProxyService:
         self.db_path = BASE_DIR / "db" / "database.db"
 
     def _get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
-        return conn
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
 
     def get_proxies(self, filters: Optional[Dict] = None) -> List[Dict]:
         """
@@ -31,6 +29,7 @@ class ProxyService:
             filters: 筛选条件
                 - proxy_type: 代理类型
                 - is_enabled: 是否启用
+                - health_status: 健康状态（unknown/healthy/unhealthy）
 
         Returns:
             代理列表
@@ -51,6 +50,10 @@ class ProxyService:
                     query += " AND is_enabled = ?"
                     params.append(filters['is_enabled'])
 
+                if filters.get('health_status'):
+                    query += " AND health_status = ?"
+                    params.append(filters['health_status'])
+
             query += " ORDER BY create_time DESC"
 
             cursor.execute(query, params)
@@ -78,6 +81,10 @@ class ProxyService:
                     where += " AND is_enabled = ?"
                     params.append(filters['is_enabled'])
 
+                if filters.get('health_status'):
+                    where += " AND health_status = ?"
+                    params.append(filters['health_status'])
+
             cursor.execute(f"SELECT COUNT(1) as cnt {base} {where}", params)
             total = int(cursor.fetchone()['cnt'])
 
@@ -206,10 +213,12 @@ class ProxyService:
             query = f"UPDATE proxies SET {', '.join(updates)} WHERE id = ?"
             cursor.execute(query, params)
             conn.commit()
-
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
         finally:
             conn.close()
+        if updated:
+            invalidate_proxy_cache()
+        return updated
 
     def delete_proxy(self, proxy_id: int) -> bool:
         """删除代理"""
@@ -219,9 +228,12 @@ class ProxyService:
         try:
             cursor.execute("DELETE FROM proxies WHERE id = ?", (proxy_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
         finally:
             conn.close()
+        if deleted:
+            invalidate_proxy_cache()
+        return deleted
 
     def batch_delete_proxies(self, proxy_ids: List[int]) -> int:
         """批量删除代理"""
@@ -235,9 +247,12 @@ class ProxyService:
             placeholders = ','.join(['?'] * len(proxy_ids))
             cursor.execute(f"DELETE FROM proxies WHERE id IN ({placeholders})", proxy_ids)
             conn.commit()
-            return cursor.rowcount
+            deleted = cursor.rowcount
         finally:
             conn.close()
+        if deleted:
+            invalidate_proxy_cache()
+        return deleted
 
     def get_proxy_by_account_id(self, account_id: int) -> Optional[Dict]:
         """通过账号ID获取关联的代理"""
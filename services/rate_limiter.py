@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+发布限速服务
+按平台、账号、代理三个维度的令牌桶控制发布速率，避免发布过快触发平台风控。
+
+配置（环境变量，格式同 TASK_WORKER_PLATFORM_CONCURRENCY，"*" 表示默认值，未配置的维度不限速）：
+    RATE_LIMIT_PLATFORM="3=20/h,4=30/h"     抖音每小时20条、快手每小时30条
+    RATE_LIMIT_ACCOUNT="*=4/h:2"            每个账号每小时4条，允许连续发2条（突发容量）
+    RATE_LIMIT_PROXY="*=60/h"               每个代理出口每小时60条
+速率格式：<次数>/<周期>[:<突发容量>]，周期支持 s/m/h/d 及 30m、2h 等写法，突发容量默认1（均匀间隔）。
+
+令牌桶状态保存在数据库 rate_limit_buckets 表中（按墙上时钟计算补充的令牌），
+启动多个 sau_worker 进程时共享同一组令牌桶；检查和扣减在同一个写事务（BEGIN IMMEDIATE）中完成。
+"""
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+from conf import BASE_DIR
+from utils.concurrency import parse_limit_spec
+from utils.sqlite_pool import get_connection
+
+_PERIOD_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_RATE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*/\s*(\d*(?:\.\d+)?)\s*([smhd])\s*(?::\s*(\d+))?\s*$')
+
+
+class Rate:
+    """速率：每 period 秒 count 次，最多累积 burst 个令牌"""
+
+    def __init__(self, count: float, period: float, burst: int = 1):
+        if count <= 0 or period <= 0:
+            raise ValueError("rate count and period must be positive")
+        self.count = count
+        self.period = period
+        self.burst = max(1, int(burst))
+
+    @classmethod
+    def parse(cls, spec: str) -> "Rate":
+        match = _RATE_PATTERN.match(spec or '')
+        if not match:
+            raise ValueError(f"invalid rate: {spec}")
+        count, multiple, unit, burst = match.groups()
+        period = float(multiple or 1) * _PERIOD_UNITS[unit]
+        return cls(float(count), period, int(burst or 1))
+
+    @property
+    def per_second(self) -> float:
+        return self.count / self.period
+
+    def __repr__(self):
+        return f"{self.count:g}/{self.period:g}s:{self.burst}"
+
+
+class TokenBucket:
+    """令牌桶（初始为满）"""
+
+    def __init__(self, rate: Rate, now: float = None, tokens: float = None):
+        self.rate = rate
+        self.tokens = float(rate.burst) if tokens is None else min(float(rate.burst), tokens)
+        self.updated = time.time() if now is None else now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.rate.burst, self.tokens + (now - self.updated) * self.rate.per_second)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """距离有可用令牌还需等待的秒数（0 表示可立即获取）"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate.per_second
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def refund(self):
+        self.tokens = min(self.rate.burst, self.tokens + 1)
+
+
+class RateLimiter:
+    """
+    多维度令牌桶限速器
+
+    try_acquire 只有在所有维度都有令牌时才同时扣减，否则返回需要等待的秒数，
+    由调用方推迟任务（不阻塞、不占用并发名额）。
+    """
+
+    DIMENSIONS = ('platform', 'account', 'proxy')
+
+    def __init__(self, limits: Dict[str, Dict[str, Rate]] = None, db_path: Union[str, Path] = None):
+        """
+        :param limits: {维度: {key 或 "*": Rate}}
+        :param db_path: 保存令牌桶状态的数据库（默认 db/database.db）
+        """
+        self.limits = {dim: dict(rates) for dim, rates in (limits or {}).items() if rates}
+        self.db_path = db_path or BASE_DIR / "db" / "database.db"
+        self._deferred_since: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'acquired': 0,
+            'deferred': {dim: 0 for dim in self.DIMENSIONS},
+            'waited': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+        if self.limits:
+            self._ensure_schema()
+
+    def _get_connection(self):
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path, foreign_keys=False)
+
+    def _ensure_schema(self):
+        """确保令牌桶表存在（本地库未重建时自动创建）"""
+        conn = self._get_connection()
+        try:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                dimension TEXT NOT NULL,                  -- 维度：platform/account/proxy
+                bucket_key TEXT NOT NULL,                 -- 平台类型/账号ID/代理地址
+                tokens REAL NOT NULL,                     -- 上次更新时的令牌数
+                updated REAL NOT NULL,                    -- 上次更新时间（Unix 时间戳）
+                PRIMARY KEY (dimension, bucket_key)
+            )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        limits = {}
+        for dim in cls.DIMENSIONS:
+            spec = os.environ.get(f"RATE_LIMIT_{dim.upper()}", "")
+            limits[dim] = parse_limit_spec(spec, value_type=Rate.parse)
+        return cls(limits)
+
+    def enabled(self, dimension: str = None) -> bool:
+        if dimension is None:
+            return bool(self.limits)
+        return dimension in self.limits
+
+    def _rate_for(self, dimension: str, key) -> Optional[Rate]:
+        rates = self.limits.get(dimension)
+        if not rates or key is None:
+            return None
+        return rates.get(str(key), rates.get('*'))
+
+    def _load_buckets(self, conn, keys: Dict[str, Hashable], now: float) -> List[Tuple[str, str, TokenBucket]]:
+        """读取各维度的令牌桶，返回 [(维度, key, 令牌桶)]（不限速的维度不返回）"""
+        buckets = []
+        for dim in self.DIMENSIONS:
+            key = keys.get(dim)
+            rate = self._rate_for(dim, key)
+            if rate is None:
+                continue
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE dimension = ? AND bucket_key = ?",
+                (dim, str(key)),
+            ).fetchone()
+            if row is None:
+                bucket = TokenBucket(rate, now)
+            else:
+                bucket = TokenBucket(rate, row['updated'], row['tokens'])
+            buckets.append((dim, str(key), bucket))
+        return buckets
+
+    def try_acquire(self, keys: Dict[str, Hashable], token: Hashable = None) -> Tuple[bool, float]:
+        """
+        尝试为一次发布获取令牌
+        :param keys: {维度: key}，如 {'platform': 3, 'account': 12, 'proxy': 'http://1.2.3.4:8080'}
+        :param token: 请求标识（如任务ID），用于统计从首次被限速到获取成功的等待时间
+        :returns: (是否获取成功, 需等待的秒数)
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                # 读取和扣减在同一个写事务中完成，多个进程不会同时拿到同一个令牌
+                conn.execute("BEGIN IMMEDIATE")
+                buckets = self._load_buckets(conn, keys, now)
+                wait, limiting = 0.0, None
+                for dim, _, bucket in buckets:
+                    delay = bucket.delay(now)
+                    if delay > wait:
+                        wait, limiting = delay, dim
+
+                if limiting is not None:
+                    self._stats['deferred'][limiting] += 1
+                    if token is not None:
+                        self._deferred_since.setdefault(token, now)
+                    return False, wait
+
+                for dim, key, bucket in buckets:
+                    bucket.consume(now)
+                    self._save_bucket(conn, dim, key, bucket)
+                conn.commit()
+            finally:
+                conn.close()
+            self._stats['acquired'] += 1
+            since = self._deferred_since.pop(token, None) if token is not None else None
+            if since is not None:
+                waited = now - since
+                self._stats['waited'] += 1
+                self._stats['wait_seconds_total'] += waited
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+            return True, 0.0
+
+    @staticmethod
+    def _save_bucket(conn, dimension: str, key: str, bucket: TokenBucket):
+        conn.execute('''
+            INSERT INTO rate_limit_buckets (dimension, bucket_key, tokens, updated) VALUES (?, ?, ?, ?)
+            ON CONFLICT(dimension, bucket_key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+        ''', (dimension, key, bucket.tokens, bucket.updated))
+
+    def refund(self, keys: Dict[str, Hashable]):
+        """归还令牌（获取令牌后任务未能执行，如被其他进程领取）"""
+        now = time.time()
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for dim, key, bucket in self._load_buckets(conn, keys, now):
+                    bucket.refund()
+                    self._save_bucket(conn, dim, key, bucket)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def forget(self, token: Hashable):
+        """任务被取消/删除时清理等待统计"""
+        with self._lock:
+            self._deferred_since.pop(token, None)
+
+    def _bucket_count(self) -> int:
+        conn = self._get_connection()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict:
+        buckets = self._bucket_count() if self.limits else 0
+        with self._lock:
+            stats = {
+                **self._stats,
+                'deferred': dict(self._stats['deferred']),
+                'waiting': len(self._deferred_since),
+                'buckets': buckets,
+                'limits': {dim: {k: repr(r) for k, r in rates.items()} for dim, rates in self.limits.items()},
+            }
+        waited = stats['waited']
+        stats['wait_seconds_avg'] = round(stats['wait_seconds_total'] / waited, 2) if waited else 0.0
+        stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 2)
+        stats['wait_seconds_max'] = round(stats['wait_seconds_max'], 2)
+        return stats
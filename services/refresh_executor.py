@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cookie 刷新执行器
+后台刷新会为每个账号启动一个 Chromium，大批量刷新时按以下限制并发执行：
+
+    COOKIE_REFRESH_CONCURRENCY            全局并发（默认4）
+    COOKIE_REFRESH_PLATFORM_CONCURRENCY   平台并发，如 "3=2,2=1"（默认不单独限制）
+    COOKIE_REFRESH_PROXY_CONCURRENCY      同一代理出口的并发（默认1，未关联代理的账号不限制）
+    COOKIE_REFRESH_MEMORY_BUDGET_MB       刷新浏览器的总内存预算（默认2048）
+    COOKIE_REFRESH_BROWSER_MB             单个刷新浏览器的估算内存（默认300）
+
+等待中的账号按优先级启动：最近有待发布任务的账号优先，其次按原有顺序（如 next_refresh_time）；
+某个平台/代理名额已满时跳过其账号，不阻塞其他账号。
+安装了 psutil 时，系统可用内存不足一个浏览器时暂停启动新的刷新（至少保留一个在执行）。
+"""
+import asyncio
+import itertools
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from services.account_service import AccountService
+from services.task_service import TaskService
+from utils.concurrency import KeyedSemaphore, parse_limit_spec
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class RefreshExecutor:
+    """按全局/平台/代理/内存预算限制并发的 Cookie 刷新执行器（必须在同一个事件循环内使用）"""
+
+    # psutil 可用内存检查间隔：等待中的账号每隔该秒数重新尝试启动
+    MEMORY_RECHECK_SECONDS = 5
+
+    def __init__(
+        self,
+        refresh_fn: Callable[[int], Awaitable[Dict]],
+        concurrency: int = None,
+        platform_limits: Dict[str, int] = None,
+        proxy_concurrency: int = None,
+        memory_budget_mb: int = None,
+        browser_memory_mb: int = None,
+    ):
+        """
+        Args:
+            refresh_fn: 刷新单个账号的协程函数（如 CookieRefreshService.refresh_account_cookie_background）
+        """
+        self.refresh_fn = refresh_fn
+        self.concurrency = max(1, int(concurrency or os.environ.get("COOKIE_REFRESH_CONCURRENCY", "4")))
+        self.platform_limits = platform_limits or parse_limit_spec(
+            os.environ.get("COOKIE_REFRESH_PLATFORM_CONCURRENCY", ""), default=self.concurrency
+        )
+        self.proxy_concurrency = int(proxy_concurrency or os.environ.get("COOKIE_REFRESH_PROXY_CONCURRENCY", "1"))
+        self.memory_budget_mb = int(memory_budget_mb or os.environ.get("COOKIE_REFRESH_MEMORY_BUDGET_MB", "2048"))
+        self.browser_memory_mb = max(1, int(browser_memory_mb or os.environ.get("COOKIE_REFRESH_BROWSER_MB", "300")))
+        # 全局并发与内存预算取较小值
+        self.max_active = max(1, min(self.concurrency, self.memory_budget_mb // self.browser_memory_mb))
+
+        self.account_service = AccountService()
+        self.task_service = TaskService()
+        self._platform_sem = KeyedSemaphore.from_spec(self.platform_limits)
+        self._proxy_sem = KeyedSemaphore(lambda key: None if key is None else self.proxy_concurrency)
+        self._waiting: List[Dict] = []
+        self._active = 0
+        self._seq = itertools.count()
+        self._recheck: Optional[asyncio.TimerHandle] = None
+        self._stats = {'started': 0, 'succeeded': 0, 'failed': 0, 'memory_deferred': 0, 'max_active_seen': 0}
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            'active': self._active,
+            'waiting': len(self._waiting),
+            'max_active': self.max_active,
+            'active_by_proxy': {str(k): v for k, v in self._proxy_sem.active().items()},
+        }
+
+    # ---------------------------
+    # 优先级
+    # ---------------------------
+    @staticmethod
+    def _parse_time(value: str) -> Optional[float]:
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+            try:
+                return datetime.strptime(value, fmt).timestamp()
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    def _next_task_times(self, account_ids: List[int]) -> Dict[int, float]:
+        """各账号最近一个待发布任务的时间（非定时任务视为当前时间）"""
+        now = time.time()
+        next_times: Dict[int, float] = {}
+        for row in self.task_service.get_pending_account_schedules(account_ids):
+            due = now
+            if row['schedule_enabled'] and row['scheduled_time']:
+                due = self._parse_time(row['scheduled_time']) or now
+            account_id = row['account_id']
+            next_times[account_id] = min(due, next_times.get(account_id, due))
+        return next_times
+
+    # ---------------------------
+    # 调度
+    # ---------------------------
+    def _memory_available(self) -> bool:
+        if psutil is None or self._active == 0:
+            return True
+        try:
+            available_mb = psutil.virtual_memory().available / (1024 * 1024)
+        except Exception:
+            return True
+        return available_mb >= self.browser_memory_mb
+
+    def _pump(self):
+        """按优先级启动可执行的账号"""
+        if not self._waiting:
+            return
+        self._waiting.sort(key=lambda entry: entry['priority'])
+        for entry in list(self._waiting):
+            if self._active >= self.max_active:
+                break
+            platform, proxy = entry['platform'], entry['proxy']
+            if self._platform_sem.locked(platform) or self._proxy_sem.locked(proxy):
+                continue
+            if not self._memory_available():
+                self._stats['memory_deferred'] += 1
+                self._schedule_recheck()
+                break
+            self._platform_sem.try_acquire(platform)
+            self._proxy_sem.try_acquire(proxy)
+            self._active += 1
+            self._stats['max_active_seen'] = max(self._stats['max_active_seen'], self._active)
+            self._waiting.remove(entry)
+            if not entry['future'].done():
+                entry['future'].set_result(None)
+
+    def _schedule_recheck(self):
+        if self._recheck is None:
+            def recheck():
+                self._recheck = None
+                self._pump()
+            self._recheck = asyncio.get_running_loop().call_later(self.MEMORY_RECHECK_SECONDS, recheck)
+
+    def _release(self, entry: Dict):
+        self._platform_sem.release(entry['platform'])
+        self._proxy_sem.release(entry['proxy'])
+        self._active -= 1
+        self._pump()
+
+    def _enqueue(self, account: Dict, priority) -> Dict:
+        entry = {
+            'priority': priority,
+            'platform': account['type'],
+            'proxy': account.get('proxy_server'),
+            'future': asyncio.get_running_loop().create_future(),
+        }
+        self._waiting.append(entry)
+        return entry
+
+    async def _run(self, account: Dict, entry: Dict) -> Dict:
+        try:
+            await entry['future']
+        except asyncio.CancelledError:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+            else:
+                self._release(entry)
+            raise
+
+        self._stats['started'] += 1
+        try:
+            result = await self.refresh_fn(account['id'])
+        except Exception as e:
+            result = {'success': False, 'message': f'后台刷新异常: {str(e)}'}
+        finally:
+            self._release(entry)
+        self._stats['succeeded' if result.get('success') else 'failed'] += 1
+        return result
+
+    async def refresh(self, account_id: int, order: float = None) -> Dict:
+        """刷新单个账号（等待名额后执行）"""
+        results = await self.refresh_many([account_id], order=order)
+        return results['details'][0]
+
+    async def refresh_many(self, account_ids: List[int], order: float = None) -> Dict:
+        """
+        批量刷新账号
+
+        Args:
+            account_ids: 账号ID列表（同优先级时按列表顺序启动）
+            order: 同优先级账号之间的排序值（如 next_refresh_time 时间戳），默认按提交顺序
+
+        Returns:
+            {'total', 'success', 'failed', 'details': [{'account_id', 'success', 'message', ...}, ...]}
+        """
+        accounts = self.account_service.get_accounts_by_ids(account_ids)
+        next_times = self._next_task_times([a['id'] for a in accounts])
+        no_task = float('inf')
+
+        # 整批入队后再启动，保证批内按优先级执行
+        entries = [
+            self._enqueue(account, (next_times.get(account['id'], no_task), order or 0, next(self._seq)))
+            for account in accounts
+        ]
+        self._pump()
+
+        async def run_one(account, entry):
+            return account['id'], await self._run(account, entry)
+
+        done = dict(await asyncio.gather(*(run_one(a, e) for a, e in zip(accounts, entries))))
+        results = {'total': len(account_ids), 'success': 0, 'failed': 0, 'details': []}
+        for account_id in account_ids:
+            r = done.get(account_id) or {'success': False, 'message': '账号不存在'}
+            results['success' if r.get('success') else 'failed'] += 1
+            results['details'].append({'account_id': account_id, **r})
+        return results
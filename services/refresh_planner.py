@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cookie 自适应刷新计划
+根据 cookie_verification_log 的历史估计各账号/平台 Cookie 的实际有效期，在预测过期前安排刷新。
+
+有效期估计：
+    以一次成功的登录/刷新（RENEWAL_METHODS）作为一代 Cookie 的开始，
+    之后第一次校验失败（FAILURE_METHODS）视为过期，有效期取最后一次校验成功与首次失败的中点；
+    账号样本不足时使用同平台样本，平台样本也不足时按账号的 refresh_interval_days 刷新。
+    尚未观察到过期的平台，以已存活的最长时间为下限，按 COOKIE_REFRESH_GROWTH 逐步延长刷新间隔。
+
+配置（环境变量）：
+    COOKIE_REFRESH_SAFETY          在预测有效期的该比例处刷新（默认0.85）
+    COOKIE_REFRESH_JITTER          刷新时间随机提前的最大比例（默认0.1），避免大量账号同时刷新
+    COOKIE_LIFETIME_QUANTILE       取有效期样本的该分位数作为预测值（默认0.2，偏保守）
+    COOKIE_LIFETIME_MIN_SAMPLES    使用估计值所需的最少样本数（默认3）
+    COOKIE_LIFETIME_HISTORY_DAYS   参与估计的历史天数（默认90）
+    COOKIE_REFRESH_GROWTH          未观察到过期时，刷新间隔相对已存活最长时间的放大倍数（默认1.2）
+    COOKIE_REFRESH_MIN_HOURS / COOKIE_REFRESH_MAX_DAYS   刷新间隔上下限（默认1小时 / 30天）
+"""
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _parse_utc(value: str) -> Optional[datetime]:
+    """cookie_verification_log.verify_time（CURRENT_TIMESTAMP，UTC）转为本地时间"""
+    try:
+        return datetime.strptime(value, _TIME_FORMAT).replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_local(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, _TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _quantile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    pos = (len(values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+class RefreshPlanner:
+    """Cookie 自适应刷新计划"""
+
+    # 产生新 Cookie 的操作（成功时开始新的一代）
+    RENEWAL_METHODS = ('login', 'auto_refresh', 'auto_refresh_background')
+    # 失败时说明 Cookie 已过期的校验（登录式刷新失败不代表原 Cookie 过期）
+    FAILURE_METHODS = ('verify', 'batch_verify', 'publish', 'auto_refresh_background')
+
+    def __init__(self):
+        self.db_path = BASE_DIR / "db" / "database.db"
+        self.safety = float(os.environ.get("COOKIE_REFRESH_SAFETY", "0.85"))
+        self.jitter = float(os.environ.get("COOKIE_REFRESH_JITTER", "0.1"))
+        self.quantile = float(os.environ.get("COOKIE_LIFETIME_QUANTILE", "0.2"))
+        self.min_samples = int(os.environ.get("COOKIE_LIFETIME_MIN_SAMPLES", "3"))
+        self.history_days = int(os.environ.get("COOKIE_LIFETIME_HISTORY_DAYS", "90"))
+        self.growth = float(os.environ.get("COOKIE_REFRESH_GROWTH", "1.2"))
+        self.min_interval = timedelta(hours=float(os.environ.get("COOKIE_REFRESH_MIN_HOURS", "1")))
+        self.max_interval = timedelta(days=float(os.environ.get("COOKIE_REFRESH_MAX_DAYS", "30")))
+        self._platform_cache: Dict[int, Dict] = {}
+
+    def _get_connection(self):
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
+
+    # ---------------------------
+    # 有效期估计
+    # ---------------------------
+    def _load_events(self, account_id: int = None, platform_type: int = None) -> Dict[int, List[Tuple]]:
+        """按账号加载验证日志 {account_id: [(时间, 是否成功, 方法), ...]}（时间升序）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            sql = '''
+                SELECT account_id, verify_result, verify_method, verify_time
+                FROM cookie_verification_log
+                WHERE verify_time >= datetime('now', ?)
+            '''
+            params = [f'-{self.history_days} days']
+            if account_id is not None:
+                sql += ' AND account_id = ?'
+                params.append(account_id)
+            if platform_type is not None:
+                sql += ' AND platform_type = ?'
+                params.append(platform_type)
+            sql += ' ORDER BY account_id, verify_time, id'
+            cursor.execute(sql, params)
+            events: Dict[int, List[Tuple]] = {}
+            for row in cursor.fetchall():
+                t = _parse_utc(row['verify_time'])
+                if t is not None:
+                    events.setdefault(row['account_id'], []).append((t, bool(row['verify_result']), row['verify_method']))
+            return events
+        finally:
+            conn.close()
+
+    @classmethod
+    def lifetimes(cls, events: List[Tuple]) -> Tuple[List[float], List[float]]:
+        """
+        从单个账号的事件序列中提取有效期样本
+        :returns: (已过期的各代有效期秒数, 未观察到过期的各代已存活秒数)
+        """
+        expired, survived = [], []
+        start = last_ok = None
+        for t, ok, method in events:
+            if ok and method in cls.RENEWAL_METHODS:
+                if start is not None:
+                    survived.append((t - start).total_seconds())
+                start = last_ok = t
+            elif start is None:
+                continue
+            elif ok:
+                last_ok = t
+            elif method in cls.FAILURE_METHODS:
+                expired.append(((last_ok - start).total_seconds() + (t - start).total_seconds()) / 2)
+                start = last_ok = None
+        if start is not None and last_ok > start:
+            survived.append((last_ok - start).total_seconds())
+        return expired, survived
+
+    def _summarize(self, events: Dict[int, List[Tuple]]) -> Dict:
+        expired, survived = [], []
+        for account_events in events.values():
+            e, s = self.lifetimes(account_events)
+            expired.extend(e)
+            survived.extend(s)
+        summary = {'samples': len(expired), 'survived_max': max(survived) if survived else None, 'lifetime': None}
+        if len(expired) >= self.min_samples:
+            summary['lifetime'] = _quantile(expired, self.quantile)
+            summary['median'] = _quantile(expired, 0.5)
+        return summary
+
+    def platform_summary(self, platform_type: int) -> Dict:
+        if platform_type not in self._platform_cache:
+            self._platform_cache[platform_type] = self._summarize(self._load_events(platform_type=platform_type))
+        return self._platform_cache[platform_type]
+
+    def estimate(self, account_id: int, platform_type: int) -> Dict:
+        """
+        估计账号 Cookie 有效期
+        :returns: {'lifetime': 秒或None, 'survived_max': 秒或None, 'source': 'account'/'platform'/'default'}
+        """
+        summary = self._summarize(self._load_events(account_id=account_id))
+        if summary['lifetime'] is not None:
+            return {**summary, 'source': 'account'}
+        platform = self.platform_summary(platform_type)
+        if platform['lifetime'] is not None:
+            return {**platform, 'source': 'platform'}
+        survived = max(filter(None, (summary['survived_max'], platform['survived_max'])), default=None)
+        return {'lifetime': None, 'survived_max': survived, 'samples': platform['samples'], 'source': 'default'}
+
+    # ---------------------------
+    # 刷新计划
+    # ---------------------------
+    def plan(self, account: Dict, now: datetime = None) -> Dict:
+        """
+        计算账号的下次刷新时间（假设 Cookie 刚刚登录/刷新）
+        :param account: user_info 行（需要 id、type、refresh_interval_days）
+        :returns: {'next_refresh_time', 'predicted_expiry_time', 'interval_hours', 'source'}
+        """
+        now = now or datetime.now()
+        estimate = self.estimate(account['id'], int(account['type']))
+        default_interval = timedelta(days=account.get('refresh_interval_days') or 7)
+        predicted_expiry = None
+        if estimate['lifetime'] is not None:
+            lifetime = timedelta(seconds=estimate['lifetime'])
+            predicted_expiry = now + lifetime
+            interval = lifetime * self.safety
+        elif estimate['survived_max']:
+            # 尚未观察到过期：至少按已存活的最长时间刷新，并逐步放大探测真实有效期
+            interval = max(default_interval, timedelta(seconds=estimate['survived_max'] * self.growth))
+        else:
+            interval = default_interval
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        # 只向前抖动，保证不晚于计划时间
+        interval = max(self.min_interval, interval * (1 - random.uniform(0, self.jitter)))
+        return {
+            'next_refresh_time': (now + interval).strftime(_TIME_FORMAT),
+            'predicted_expiry_time': predicted_expiry.strftime(_TIME_FORMAT) if predicted_expiry else None,
+            'interval_hours': round(interval.total_seconds() / 3600, 2),
+            'source': estimate['source'],
+            'samples': estimate.get('samples', 0),
+        }
+
+    def schedule(self, account_id: int) -> Optional[Dict]:
+        """为刚登录/刷新过的账号安排下次刷新并保存预测过期时间"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT id, type, refresh_interval_days FROM user_info WHERE id = ?",
+                (account_id,),
+            )
+            row = cursor.fetchone()
+            if not row or not row['refresh_interval_days']:
+                return None
+            plan = self.plan(dict(row))
+            cursor.execute("""
+                UPDATE user_info
+                SET next_refresh_time = ?,
+                    predicted_expiry_time = ?,
+                    update_time = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (plan['next_refresh_time'], plan['predicted_expiry_time'], account_id))
+            conn.commit()
+            return plan
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # 报表
+    # ---------------------------
+    def report(self) -> Dict:
+        """
+        刷新计划报表：各平台有效期估计、预测与实际过期时间对比、未来24小时刷新量
+        实际过期取验证失败时的时间，与失败当时账号的预测过期时间对比（误差为负表示早于预测过期）
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT DISTINCT type FROM user_info")
+            platform_types = [row['type'] for row in cursor.fetchall()]
+
+            cursor.execute(f"""
+                SELECT platform_type, verify_time, predicted_expiry_time
+                FROM cookie_verification_log
+                WHERE verify_result = 0
+                  AND predicted_expiry_time IS NOT NULL
+                  AND verify_method IN ({','.join('?' * len(self.FAILURE_METHODS))})
+                  AND verify_time >= datetime('now', ?)
+            """, (*self.FAILURE_METHODS, f'-{self.history_days} days'))
+            errors: Dict[int, List[float]] = {}
+            for row in cursor.fetchall():
+                actual, predicted = _parse_utc(row['verify_time']), _parse_local(row['predicted_expiry_time'])
+                if actual and predicted:
+                    errors.setdefault(row['platform_type'], []).append((actual - predicted).total_seconds() / 3600)
+
+            now = datetime.now()
+            cursor.execute("""
+                SELECT type, COUNT(1) AS cnt FROM user_info
+                WHERE auto_refresh_enabled = 1 AND next_refresh_time IS NOT NULL AND next_refresh_time <= ?
+                GROUP BY type
+            """, ((now + timedelta(hours=24)).strftime(_TIME_FORMAT),))
+            upcoming = {row['type']: row['cnt'] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+
+        def hours(seconds):
+            return round(seconds / 3600, 2) if seconds else None
+
+        platforms = {}
+        for platform_type in platform_types:
+            summary = self.platform_summary(platform_type)
+            platform_errors = errors.get(platform_type, [])
+            platforms[str(platform_type)] = {
+                'samples': summary['samples'],
+                'lifetime_hours': hours(summary['lifetime']),
+                'median_lifetime_hours': hours(summary.get('median')),
+                'survived_max_hours': hours(summary['survived_max']),
+                'expired_observed': len(platform_errors),
+                'expired_before_predicted': sum(1 for e in platform_errors if e < 0),
+                'mean_error_hours': round(sum(platform_errors) / len(platform_errors), 2) if platform_errors else None,
+                'refresh_due_24h': upcoming.get(platform_type, 0),
+            }
+        return {'platforms': platforms, 'generated_at': now.strftime(_TIME_FORMAT)}
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+任务重试策略
+根据上传失败的错误信息分类，决定是否重试以及重试等待时间（指数退避 + 随机抖动）。
+重试不在执行器内 sleep，而是写入任务的 not_before 后重新排队，失败的任务不再占用 worker 并发名额。
+
+配置（环境变量）：
+    TASK_RETRY_BASE_SECONDS   第一次重试的基础等待时间（默认30秒），之后每次翻倍
+    TASK_RETRY_MAX_SECONDS    单次等待上限（默认1800秒）
+"""
+import os
+import random
+import re
+from typing import Optional
+
+
+class ErrorKind:
+    """错误类型"""
+    AUTH = 'auth'              # Cookie 失效/需要登录：重试无意义，需重新登录
+    TRANSIENT = 'transient'    # 网络/浏览器临时错误：退避后重试
+    TIMEOUT = 'timeout'        # 页面元素等待超时（平台页面慢或改版）：退避后重试
+    PERMANENT = 'permanent'    # 文件/账号不存在、平台不支持等：不重试
+
+    RETRYABLE = (TRANSIENT, TIMEOUT)
+
+
+# 按顺序匹配，先匹配到的类型优先
+_PATTERNS = [
+    (ErrorKind.AUTH, re.compile(
+        r'cookie\s*(文件)?\s*(失效|过期|无效|不存在)|重新登录|未登录|扫码登录|登录失效|'
+        r'login required|not logged in|unauthori[sz]ed|\b401\b', re.I)),
+    (ErrorKind.PERMANENT, re.compile(
+        r'文件不存在|账号不存在|不支持的平台|格式不支持|不支持该格式|文件过大|超过.*限制|视频不兼容|'
+        r'违规|no such file|FileNotFoundError|unsupported|invalid file', re.I)),
+    (ErrorKind.TIMEOUT, re.compile(
+        r'timeout|timed out|超时|waiting for (selector|locator|url)', re.I)),
+    (ErrorKind.TRANSIENT, re.compile(
+        r'net::ERR_|ECONNRESET|ECONNREFUSED|connection (reset|refused|closed|aborted)|'
+        r'target (page, context or browser )?(has been )?closed|browser has been closed|'
+        r'proxy|socket|temporar|\b50[234]\b|网络|连接', re.I)),
+]
+
+
+def classify_error(error_message: str, error_type: str = None) -> str:
+    """
+    根据错误信息（及异常类名）判断错误类型
+    :param error_message: 异常信息
+    :param error_type: 异常类名（如 TimeoutError、FileNotFoundError）
+    :returns: ErrorKind 中的类型，无法识别时视为临时错误
+    """
+    text = f"{error_type or ''}: {error_message or ''}"
+    for kind, pattern in _PATTERNS:
+        if pattern.search(text):
+            return kind
+    return ErrorKind.TRANSIENT
+
+
+class RetryPolicy:
+    """指数退避 + 随机抖动的重试策略"""
+
+    def __init__(self, base_delay: float = None, max_delay: float = None):
+        self.base_delay = float(base_delay or os.environ.get("TASK_RETRY_BASE_SECONDS", "30"))
+        self.max_delay = float(max_delay or os.environ.get("TASK_RETRY_MAX_SECONDS", "1800"))
+
+    def backoff(self, attempt: int) -> float:
+        """
+        第 attempt 次重试（从1开始）的等待时间
+        上限为 base * 2^(attempt-1)，在 [上限/2, 上限] 之间随机，避免同时失败的任务同时重试
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def next_delay(self, kind: str, retry_count: int, max_retry: int) -> Optional[float]:
+        """
+        决定是否重试
+        :param kind: 错误类型
+        :param retry_count: 已重试次数
+        :param max_retry: 最大重试次数
+        :returns: 重试等待秒数；不重试返回 None
+        """
+        if kind not in ErrorKind.RETRYABLE or retry_count >= max_retry:
+            return None
+        return self.backoff(retry_count + 1)
@@ -4,24 +4,47 @@
 定时任务服务
 负责定期执行Cookie刷新等定时任务
 """
-import threading
+import heapq
 import time
 import asyncio
 import os
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from services.cookie_refresh_service import CookieRefreshService
 from services.account_service import AccountService
+from services.refresh_executor import RefreshExecutor
+from services.task_worker import get_task_worker
 
 
 class SchedulerService:
-    """定时任务服务"""
+    """
+    定时任务服务
+
+    Cookie 刷新调度运行在任务 worker 的事件循环上：按账号的 next_refresh_time 维护最小堆，
+    休眠到最早到期的账号再刷新；账号的刷新时间变化时（AccountService 刷新计划监听器）立即更新堆并唤醒，
+    不再定时轮询数据库。到期账号交给 RefreshExecutor 按全局/平台/代理/内存预算限制并发刷新，
+    近期有待发布任务的账号优先。刷新失败的账号推迟 COOKIE_REFRESH_RETRY_SECONDS 秒后重试。
+    """
+    
+    # 最长休眠时间：到期后重新全量加载，兜底其他进程直接修改数据库的情况
+    MAX_SLEEP_SECONDS = 3600
     
     def __init__(self):
         self.cookie_refresh_service = CookieRefreshService()
         self.account_service = AccountService()
+        self.retry_seconds = float(os.environ.get("COOKIE_REFRESH_RETRY_SECONDS", "1800"))
         self._running = False
-        self._refresh_thread: Optional[threading.Thread] = None
+        self._future: Optional[Future] = None
+        
+        # 以下对象仅在 worker 事件循环内访问
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heap: List[Tuple[float, int]] = []   # (到期时间戳, 账号ID)
+        self._due: Dict[int, float] = {}            # 堆中有效条目，用于惰性删除
+        self._refreshing = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._executor: Optional[RefreshExecutor] = None
+        self._stats = {'wakeups': 0, 'refreshed': 0, 'succeeded': 0, 'failed': 0, 'notified': 0}
     
     def start_cookie_refresh_scheduler(self):
         """启动Cookie刷新定时任务"""
@@ -30,73 +53,122 @@ class SchedulerService:
             return
         
         self._running = True
-        self._refresh_thread = threading.Thread(
-            target=self._refresh_scheduler_loop,
-            daemon=True,
-            name="CookieRefreshScheduler"
-        )
-        self._refresh_thread.start()
+        AccountService.add_refresh_listener(self._on_refresh_changed)
+        self._future = get_task_worker().run_coroutine(self._refresh_scheduler_loop())
         print("✅ Cookie刷新定时任务已启动")
     
     def stop_cookie_refresh_scheduler(self):
         """停止Cookie刷新定时任务"""
         self._running = False
-        if self._refresh_thread:
-            self._refresh_thread.join(timeout=5)
+        AccountService.remove_refresh_listener(self._on_refresh_changed)
+        if self._future:
+            self._future.cancel()
+            self._future = None
         print("✅ Cookie刷新定时任务已停止")
     
-    def _refresh_scheduler_loop(self):
-        """Cookie刷新调度循环（可配置间隔）"""
-        interval_seconds = int(os.environ.get("COOKIE_REFRESH_CHECK_INTERVAL_SECONDS", "600"))
-        concurrency = int(os.environ.get("COOKIE_REFRESH_CONCURRENCY", "1"))
-        while self._running:
-            try:
-                print(f"🔄 Cookie刷新检查开始: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} (interval={interval_seconds}s, concurrency={concurrency})")
-                self.refresh_expired_cookies(concurrency=concurrency)
-
-                # 休眠到下一轮（支持提前停止）
-                slept = 0
-                while self._running and slept < interval_seconds:
-                    time.sleep(min(1, interval_seconds - slept))
-                    slept += 1
+    def stats(self) -> Dict:
+        """调度状态（线程安全的快照）"""
+        heap = self._heap
+        return {
+            **self._stats,
+            'running': self._running,
+            'scheduled': len(self._due),
+            'refreshing': len(self._refreshing),
+            'next_due_in': max(0.0, round(heap[0][0] - time.time(), 1)) if heap else None,
+            'executor': self._executor.stats() if self._executor else None,
+        }
+    
+    def _on_refresh_changed(self, account_ids: List[int]):
+        """账号刷新计划变化（可在任意线程调用）"""
+        loop = self._loop
+        if loop is not None and self._running:
+            loop.call_soon_threadsafe(self._reload, account_ids)
+    
+    @staticmethod
+    def _parse_time(value: str) -> Optional[float]:
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp()
+        except (TypeError, ValueError):
+            return None
+    
+    def _set_due(self, account_id: int, due: Optional[float]):
+        if due is None:
+            self._due.pop(account_id, None)
+            return
+        if self._due.get(account_id) == due:
+            return
+        self._due[account_id] = due
+        heapq.heappush(self._heap, (due, account_id))
+    
+    def _reload(self, account_ids: List[int] = None):
+        """从数据库加载账号的下次刷新时间（account_ids 为空时全量加载）"""
+        try:
+            schedule = self.account_service.get_refresh_schedule(account_ids)
+        except Exception as e:
+            print(f"❌ 加载Cookie刷新计划失败: {e}")
+            return
+        if account_ids is None:
+            self._heap = []
+            self._due = {}
+            ids = schedule.keys()
+        else:
+            self._stats['notified'] += 1
+            ids = account_ids
+        for account_id in ids:
+            self._set_due(account_id, self._parse_time(schedule.get(account_id)))
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _refresh_scheduler_loop(self):
+        """Cookie刷新调度循环：休眠到下一个到期账号或被刷新计划变更唤醒"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._executor = RefreshExecutor(self.cookie_refresh_service.refresh_account_cookie_background)
+        self._reload()
+        print(f"🔄 Cookie刷新调度已加载 {len(self._due)} 个账号 (max_active={self._executor.max_active})")
+        try:
+            while self._running:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    due, account_id = heapq.heappop(self._heap)
+                    if self._due.get(account_id) != due:
+                        continue
+                    del self._due[account_id]
+                    if account_id not in self._refreshing:
+                        self._refreshing.add(account_id)
+                        asyncio.create_task(self._refresh_one(account_id, due))
                 
-            except Exception as e:
-                print(f"❌ Cookie刷新调度器出错: {e}")
-                # 出错后等待一小段时间再继续，避免打爆日志
-                time.sleep(30)
+                timeout = self.MAX_SLEEP_SECONDS
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - now)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                    self._stats['wakeups'] += 1
+                except asyncio.TimeoutError:
+                    if timeout >= self.MAX_SLEEP_SECONDS:
+                        self._reload()
+        finally:
+            self._loop = None
     
-    def refresh_expired_cookies(self, concurrency: int = 1):
-        """
-        检查并刷新过期Cookie（每日执行）
-        在定时任务中调用
-        """
+    async def _refresh_one(self, account_id: int, due: float):
         try:
-            # 获取需要刷新的账号列表
-            accounts = self.cookie_refresh_service.get_accounts_need_refresh()
-            
-            if not accounts:
-                print("✅ 没有需要刷新的账号")
+            self._stats['refreshed'] += 1
+            result = await self._executor.refresh(account_id, order=due)
+            if result.get('success'):
+                # 成功时已通过 schedule_next_refresh 安排下次刷新
+                self._stats['succeeded'] += 1
                 return
-            
-            print(f"📋 发现 {len(accounts)} 个账号需要刷新Cookie")
-            
-            # 使用asyncio运行异步刷新任务
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            async def refresh_all():
-                return await self.cookie_refresh_service.batch_refresh_cookies_background(
-                    [acc['id'] for acc in accounts],
-                    concurrency=concurrency,
-                )
-            
-            results = loop.run_until_complete(refresh_all())
-            loop.close()
-            
-            print(f"✅ Cookie刷新完成: 成功 {results['success']} 个, 失败 {results['failed']} 个")
-            
+            self._stats['failed'] += 1
+            print(f"⚠️ 账号 {account_id} Cookie刷新失败: {result.get('message')}，{self.retry_seconds:.0f}秒后重试")
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"❌ 刷新过期Cookie时出错: {e}")
+            self._stats['failed'] += 1
+            print(f"❌ 账号 {account_id} Cookie刷新出错: {e}")
+        finally:
+            self._refreshing.discard(account_id)
+        self.account_service.postpone_refresh(account_id, self.retry_seconds)
     
     def notify_cookie_expiring(self):
         """
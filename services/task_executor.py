@@ -5,14 +5,22 @@
 负责执行发布任务，包括调用上传器、重试机制、错误处理等
 """
 import asyncio
-import sqlite3
+import os
+import random
+import socket
 import time
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
 from services.task_service import TaskService
 from services.account_service import AccountService
+from services.retry_policy import ErrorKind, RetryPolicy, classify_error
+from services.proxy_health_service import ProxyHealthService
+from services.upload_metrics_service import UploadMetricsService
+from services.media_probe_service import get_media_probe_service
 
 # 导入上传器
 from uploader.douyin_uploader.main import DouYinVideo
@@ -20,23 +28,55 @@ from uploader.ks_uploader.main import KSVideo
 from uploader.tencent_uploader.main import TencentVideo
 from uploader.xiaohongshu_uploader.main import XiaoHongShuVideo
 from utils.constant import TencentZoneTypes
+from myUtils.proxy_helper import build_proxy_config, get_proxy_config_dict
 from playwright.async_api import async_playwright
 
 
+def new_worker_id() -> str:
+    """生成 worker ID（主机名:进程号:随机后缀），用作任务租约持有者"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
 class TaskExecutor:
     """任务执行器"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        browser_pool=None,
+        worker_id: str = None,
+        lease_seconds: float = None,
+        exclusive_account: bool = False,
+        dry_run: bool = False,
+        retry_policy: RetryPolicy = None,
+        platform_types: Iterable[int] = None
+    ):
+        """
+        Args:
+            browser_pool: 共享浏览器池（BrowserPool），为空时每个任务单独启动浏览器
+            worker_id: 任务租约持有者ID，为空时自动生成
+            lease_seconds: 任务租约时长（秒），执行期间每 1/3 租约时长续期一次
+            exclusive_account: 领取任务时要求该账号没有其他执行中的任务（多 worker 进程共享数据库时使用）
+            dry_run: 模拟上传（不启动浏览器，随机等待后视为成功），用于本地测试多 worker 调度
+            retry_policy: 失败重试策略，默认按 TASK_RETRY_BASE_SECONDS / TASK_RETRY_MAX_SECONDS 指数退避
+            platform_types: 只领取这些平台的任务（sau_worker --platforms），为空时不限制
+        """
         self.task_service = TaskService()
         self.account_service = AccountService()
+        self.browser_pool = browser_pool
+        self.worker_id = worker_id or new_worker_id()
+        self.lease_seconds = float(lease_seconds or os.environ.get("TASK_LEASE_SECONDS", "120"))
+        self.exclusive_account = exclusive_account
+        self.dry_run = dry_run
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.platform_types = {int(p) for p in platform_types} if platform_types else None
+        self.proxy_health = ProxyHealthService()
+        self.metrics_service = UploadMetricsService()
+        self.media_probe = get_media_probe_service()
         self.db_path = BASE_DIR / "db" / "database.db"
     
     def _get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row
-        return conn
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
     
     def _get_account_info(self, account_id: int) -> Optional[Dict]:
         """获取账号信息"""
@@ -82,29 +122,55 @@ class TaskExecutor:
         finally:
             conn.close()
     
-    async def execute_task(self, task_id: int) -> Dict:
+    async def execute_task(self, task_id: int, max_retries: int = None) -> Dict:
         """
         执行单个任务
         
         Args:
             task_id: 任务ID
+            max_retries: 最大重试次数（默认使用任务的 max_retry）
         
         Returns:
             执行结果字典
         """
-        task = self.task_service.get_task(task_id)
+        # 原子领取任务（状态改为执行中并持有租约），避免多个 worker 重复执行
+        task = self.task_service.claim_task(
+            task_id, self.worker_id, self.lease_seconds, exclusive_account=self.exclusive_account,
+            platform_types=self.platform_types
+        )
         if not task:
-            return {'success': False, 'error': '任务不存在'}
-        
-        # 检查任务状态
-        if task['status'] != TaskService.STATUS_PENDING:
-            return {'success': False, 'error': f'任务状态不正确: {task["status"]}'}
-        
-        # 更新任务状态为执行中
-        self.task_service.update_task_status(task_id, TaskService.STATUS_RUNNING)
+            task = self.task_service.get_task(task_id)
+            if not task:
+                return {'success': False, 'claimed': False, 'error': '任务不存在'}
+            if self.platform_types and task['platform_type'] not in self.platform_types:
+                return {'success': False, 'claimed': False, 'error': f'本 worker 不处理平台 {task["platform_type"]} 的任务'}
+            if task['status'] == TaskService.STATUS_PENDING:
+                return {'success': False, 'claimed': False, 'error': '账号正在执行其他任务'}
+            return {'success': False, 'claimed': False, 'error': f'任务状态不正确: {task["status"]}'}
         
+        heartbeat = asyncio.create_task(self._keep_lease(task_id))
+        try:
+            return await self._run_claimed_task(task_id, task, max_retries)
+        finally:
+            heartbeat.cancel()
+    
+    async def _keep_lease(self, task_id: int):
+        """执行期间定期续期任务租约（心跳）"""
+        interval = max(1.0, self.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not self.task_service.renew_leases(self.worker_id, [task_id], self.lease_seconds):
+                    print(f"⚠️ 任务 {task_id} 租约已丢失（已取消或被其他 worker 接管）")
+                    return
+            except Exception as e:
+                print(f"任务 {task_id} 租约续期失败: {e}")
+    
+    async def _run_claimed_task(self, task_id: int, task: Dict, max_retries: int = None) -> Dict:
+        """执行已领取的任务"""
         start_time = time.time()
         error_message = None
+        error_type = None
         platform_video_id = None
         platform_video_url = None
         
@@ -125,11 +191,15 @@ class TaskExecutor:
             account_file = BASE_DIR / "cookiesFile" / account_info['filePath']
             video_file = BASE_DIR / "videoFile" / file_info['file_path']
             
-            if not account_file.exists():
+            if not self.dry_run and not account_file.exists():
                 raise Exception(f"账号Cookie文件不存在: {account_file}")
-            if not video_file.exists():
+            if not self.dry_run and not video_file.exists():
                 raise Exception(f"视频文件不存在: {video_file}")
             
+            # 启动浏览器前检查视频时长/宽高比（未探测的文件当场探测），不符合平台限制时直接失败
+            if not self.dry_run:
+                file_info = await self.media_probe.check_before_launch(task['platform_type'], file_info)
+            
             # 处理计划发布时间
             publish_date = None
             if task['schedule_enabled'] and task['scheduled_time']:
@@ -143,8 +213,17 @@ class TaskExecutor:
             # 解析tags
             tags = task['tags'] if isinstance(task['tags'], list) else []
             
+            # 启动浏览器前检查账号代理：不健康时延后重试（ProxyUnavailableError）或临时换用健康代理
+            # 替代代理只作用于本次上传，不影响同账号的其他任务和 Cookie 校验/登录
+            proxy_override = None
+            if not self.dry_run:
+                substitute = await self.proxy_health.check_before_launch(account_info.get('proxy_id'))
+                if substitute:
+                    proxy_override = build_proxy_config(substitute)
+            
             # 根据平台类型调用对应的上传器
             result = await self._execute_upload(
+                task_id=task_id,
                 platform_type=task['platform_type'],
                 title=task['title'],
                 file_path=str(video_file),
@@ -156,7 +235,8 @@ class TaskExecutor:
                 product_link=task.get('product_link', ''),
                 product_title=task.get('product_title', ''),
                 thumbnail_path=task.get('thumbnail_path', ''),
-                is_draft=task.get('is_draft', 0)
+                is_draft=task.get('is_draft', 0),
+                proxy_override=proxy_override
             )
             
             duration = int(time.time() - start_time)
@@ -168,7 +248,8 @@ class TaskExecutor:
                     status=TaskService.STATUS_SUCCESS,
                     platform_video_id=result.get('video_id'),
                     platform_video_url=result.get('video_url'),
-                    publish_time=datetime.now()
+                    publish_time=datetime.now(),
+                    lease_owner=self.worker_id
                 )
                 
                 # 更新账号使用统计
@@ -188,21 +269,47 @@ class TaskExecutor:
             else:
                 # 任务失败
                 error_message = result.get('error', '未知错误')
+                error_type = result.get('error_type')
                 raise Exception(error_message)
         
         except Exception as e:
             duration = int(time.time() - start_time)
             error_message = str(e)
             
-            # 更新任务状态为失败
-            self.task_service.update_task_status(
-                task_id=task_id,
-                status=TaskService.STATUS_FAILED,
-                error_message=error_message
-            )
+            # 按错误类型决定重新排队（指数退避）还是直接失败
+            error_kind = classify_error(error_message, error_type)
+            if max_retries is None:
+                max_retries = task.get('max_retry')
+            if max_retries is None:
+                max_retries = 3
+            delay = self.retry_policy.next_delay(error_kind, task.get('retry_count') or 0, max_retries)
+            retry_at = None
+            if delay is not None:
+                retry_at = self.task_service.schedule_retry(
+                    task_id, delay, error_message, error_kind, lease_owner=self.worker_id
+                )
+                if retry_at is not None:
+                    print(f"任务 {task_id} 失败（{error_kind}），{delay:.0f}秒后重试: {error_message}")
+            if retry_at is None:
+                self.task_service.update_task_status(
+                    task_id=task_id,
+                    status=TaskService.STATUS_FAILED,
+                    error_message=error_message,
+                    lease_owner=self.worker_id,
+                    error_kind=error_kind
+                )
             
             # 更新账号使用统计
             self.account_service.update_account_usage(task['account_id'], success=False)
+            if error_kind == ErrorKind.AUTH:
+                # 发布时发现 Cookie 失效，作为实际过期时间用于刷新计划
+                self.account_service.log_verifications([{
+                    'account_id': task['account_id'],
+                    'platform_type': task['platform_type'],
+                    'success': False,
+                    'verify_method': 'publish',
+                    'error_message': error_message,
+                }])
             
             # 记录到历史表
             self._record_to_history(
@@ -213,10 +320,17 @@ class TaskExecutor:
                 error_message=error_message
             )
             
-            return {'success': False, 'error': error_message, 'duration': duration}
+            return {
+                'success': False,
+                'error': error_message,
+                'error_kind': error_kind,
+                'retry_at': retry_at,
+                'duration': duration
+            }
     
     async def _execute_upload(
         self,
+        task_id: int,
         platform_type: int,
         title: str,
         file_path: str,
@@ -228,79 +342,81 @@ class TaskExecutor:
         product_link: str = '',
         product_title: str = '',
         thumbnail_path: str = '',
-        is_draft: int = 0
+        is_draft: int = 0,
+        proxy_override: Dict = None
     ) -> Dict:
         """
-        执行上传（调用对应的平台上传器）
+        执行上传（调用对应的平台上传器），结束后记录各步骤耗时（upload_step_metrics）
+
+        Args:
+            proxy_override: 本次上传使用的代理（账号代理不健康时的替代代理），为空时使用账号关联的代理
 
         Returns:
             {'success': True/False, 'video_id': str, 'video_url': str, 'error': str}
         """
+        if self.dry_run:
+            delay = random.uniform(0.5, 3)
+            print(f"[DryRun] 模拟上传: platform={platform_type}, account={account_id}, {delay:.1f}s")
+            await asyncio.sleep(delay)
+            return {'success': True, 'video_id': None, 'video_url': None}
+
+        app = None
         try:
-            async with async_playwright() as playwright:
-                if platform_type == 1:  # 小红书
-                    app = XiaoHongShuVideo(title, file_path, tags, publish_date, account_file, account_id=account_id)
-                elif platform_type == 2:  # 视频号
-                    category_val = TencentZoneTypes.LIFESTYLE.value if category else None
-                    app = TencentVideo(title, file_path, tags, publish_date, account_file, category_val, is_draft, account_id=account_id)
-                elif platform_type == 3:  # 抖音
-                    app = DouYinVideo(title, file_path, tags, publish_date, account_file, thumbnail_path, product_link, product_title, account_id=account_id)
-                elif platform_type == 4:  # 快手
-                    app = KSVideo(title, file_path, tags, publish_date, account_file, account_id=account_id)
-                else:
-                    return {'success': False, 'error': f'不支持的平台类型: {platform_type}'}
-                
-                # 执行上传
-                await app.upload(playwright)
-                
-                # 返回成功（目前上传器没有返回视频ID和URL，后续可以增强）
-                return {
-                    'success': True,
-                    'video_id': None,  # 后续可以从上传器获取
-                    'video_url': None  # 后续可以从上传器获取
-                }
+            if platform_type == 1:  # 小红书
+                app = XiaoHongShuVideo(title, file_path, tags, publish_date, account_file, account_id=account_id)
+            elif platform_type == 2:  # 视频号
+                category_val = TencentZoneTypes.LIFESTYLE.value if category else None
+                app = TencentVideo(title, file_path, tags, publish_date, account_file, category_val, is_draft, account_id=account_id)
+            elif platform_type == 3:  # 抖音
+                app = DouYinVideo(title, file_path, tags, publish_date, account_file, thumbnail_path, product_link, product_title, account_id=account_id)
+            elif platform_type == 4:  # 快手
+                app = KSVideo(title, file_path, tags, publish_date, account_file, account_id=account_id)
+            else:
+                return {'success': False, 'error': f'不支持的平台类型: {platform_type}'}
+
+            # 执行上传：优先使用共享浏览器池
+            if self.browser_pool is not None:
+                proxy_config = proxy_override or (get_proxy_config_dict(account_id) if account_id else None)
+                await app.upload_with_pool(self.browser_pool, proxy_config)
+            else:
+                async with async_playwright() as playwright:
+                    await app.upload(playwright, proxy_config=proxy_override)
+
+            # 返回成功（目前上传器没有返回视频ID和URL，后续可以增强）
+            return {
+                'success': True,
+                'video_id': None,  # 后续可以从上传器获取
+                'video_url': None  # 后续可以从上传器获取
+            }
         
         except Exception as e:
-            return {'success': False, 'error': str(e)}
+            return {'success': False, 'error': str(e), 'error_type': type(e).__name__}
+        finally:
+            if app is not None:
+                self._record_step_metrics(task_id, platform_type, account_id, app)
+
+    def _record_step_metrics(self, task_id: int, platform_type: int, account_id: int, app):
+        """记录上传器各步骤耗时（失败不影响任务结果）"""
+        try:
+            self.metrics_service.record_steps(task_id, platform_type, account_id, app.step_report())
+        except Exception as e:
+            print(f"记录任务 {task_id} 步骤耗时失败: {e}")
     
-    async def execute_with_retry(self, task_id: int, max_retries: int = 3) -> Dict:
+    async def execute_with_retry(self, task_id: int, max_retries: int = None) -> Dict:
         """
         带重试的任务执行
         
+        只执行一次：可重试的失败（网络、超时等）按指数退避写入任务的 not_before 并重新置为待发布，
+        由 worker 到期后再次领取；Cookie 失效、文件不存在等错误直接标记失败。
+        
         Args:
             task_id: 任务ID
-            max_retries: 最大重试次数
+            max_retries: 最大重试次数（默认使用任务的 max_retry）
         
         Returns:
-            执行结果
+            执行结果；重新排队时包含 retry_at（下次可执行的时间戳）
         """
-        task = self.task_service.get_task(task_id)
-        if not task:
-            return {'success': False, 'error': '任务不存在'}
-        
-        # 重试间隔（秒）：1, 5, 30
-        retry_delays = [1, 5, 30]
-        
-        for attempt in range(max_retries + 1):
-            if attempt > 0:
-                # 增加重试次数
-                self.task_service.increment_retry_count(task_id)
-                
-                # 等待重试
-                if attempt <= len(retry_delays):
-                    delay = retry_delays[attempt - 1]
-                    await asyncio.sleep(delay)
-            
-            result = await self.execute_task(task_id)
-            
-            if result['success']:
-                return result
-            
-            # 如果是最后一次尝试，返回失败
-            if attempt >= max_retries:
-                return result
-        
-        return result
+        return await self.execute_task(task_id, max_retries=max_retries)
     
     def _record_to_history(
         self,
@@ -6,10 +6,12 @@
 """
 import sqlite3
 import json
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
 
 
 class TaskService:
@@ -28,24 +30,28 @@ class TaskService:
         self._ensure_schema()
 
     def _ensure_schema(self):
-        """确保任务表具备必要字段（软删除等）"""
+        """确保任务表具备必要字段（软删除、执行租约、重试时间等）"""
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute("PRAGMA table_info(publish_tasks)")
             cols = {row["name"] for row in cursor.fetchall()}
-            if "is_deleted" not in cols:
-                cursor.execute("ALTER TABLE publish_tasks ADD COLUMN is_deleted INTEGER DEFAULT 0")
-                conn.commit()
+            for name, ddl in (
+                ("is_deleted", "INTEGER DEFAULT 0"),
+                ("lease_owner", "TEXT"),
+                ("lease_expires_at", "REAL"),
+                ("not_before", "REAL"),
+                ("error_kind", "TEXT"),
+            ):
+                if name not in cols:
+                    cursor.execute(f"ALTER TABLE publish_tasks ADD COLUMN {name} {ddl}")
+                    conn.commit()
         finally:
             conn.close()
     
     def _get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.row_factory = sqlite3.Row  # 使用Row工厂，可以通过列名访问
-        return conn
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
     
     def create_publish_task(
         self,
@@ -88,28 +94,21 @@ class TaskService:
         cursor = conn.cursor()
         
         try:
-            # 将tags列表转为JSON字符串
-            tags_json = json.dumps(tags if tags else [], ensure_ascii=False)
-            
-            # 处理计划发布时间
-            scheduled_time_str = None
-            if scheduled_time:
-                if isinstance(scheduled_time, datetime):
-                    scheduled_time_str = scheduled_time.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    scheduled_time_str = str(scheduled_time)
-            
-            cursor.execute('''
-                INSERT INTO publish_tasks (
-                    task_name, platform_type, account_id, file_id, title, tags,
-                    category, product_link, product_title, thumbnail_path,
-                    is_draft, schedule_enabled, scheduled_time, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                task_name, platform_type, account_id, file_id, title, tags_json,
-                category, product_link, product_title, thumbnail_path,
-                is_draft, schedule_enabled, scheduled_time_str, self.STATUS_PENDING
-            ))
+            cursor.execute(self._INSERT_TASK_SQL, self._build_task_values({
+                'task_name': task_name,
+                'platform_type': platform_type,
+                'account_id': account_id,
+                'file_id': file_id,
+                'title': title,
+                'tags': tags,
+                'category': category,
+                'product_link': product_link,
+                'product_title': product_title,
+                'thumbnail_path': thumbnail_path,
+                'is_draft': is_draft,
+                'schedule_enabled': schedule_enabled,
+                'scheduled_time': scheduled_time,
+            }))
             
             task_id = cursor.lastrowid
             conn.commit()
@@ -120,6 +119,108 @@ class TaskService:
         finally:
             conn.close()
     
+    _TASK_COLUMNS = (
+        'task_name', 'platform_type', 'account_id', 'file_id', 'title', 'tags',
+        'category', 'product_link', 'product_title', 'thumbnail_path',
+        'is_draft', 'schedule_enabled', 'scheduled_time', 'status'
+    )
+    _INSERT_TASK_SQL = f'''
+        INSERT INTO publish_tasks ({', '.join(_TASK_COLUMNS)})
+        VALUES ({', '.join('?' * len(_TASK_COLUMNS))})
+    '''
+    
+    def _build_task_values(self, task: Dict) -> tuple:
+        """将任务字典转为 INSERT 参数（tags 转 JSON，计划时间格式化）"""
+        # 将tags列表转为JSON字符串
+        tags = task.get('tags')
+        tags_json = json.dumps(tags if tags else [], ensure_ascii=False)
+        
+        # 处理计划发布时间
+        scheduled_time = task.get('scheduled_time')
+        scheduled_time_str = None
+        if scheduled_time:
+            if isinstance(scheduled_time, datetime):
+                scheduled_time_str = scheduled_time.strftime('%Y-%m-%d %H:%M:%S')
+            else:
+                scheduled_time_str = str(scheduled_time)
+        
+        return (
+            task.get('task_name'), task['platform_type'], task['account_id'], task['file_id'],
+            task['title'], tags_json,
+            task.get('category') or 0, task.get('product_link') or '', task.get('product_title') or '',
+            task.get('thumbnail_path') or '',
+            task.get('is_draft') or 0, task.get('schedule_enabled') or 0, scheduled_time_str,
+            self.STATUS_PENDING
+        )
+    
+    def _validate_tasks(self, cursor, tasks: List[Dict]):
+        """批量创建前统一校验：必填字段、计划时间格式、账号/文件是否存在"""
+        for index, task in enumerate(tasks):
+            for field in ('platform_type', 'account_id', 'file_id', 'title'):
+                if task.get(field) in (None, ''):
+                    raise ValueError(f"第 {index + 1} 个任务缺少字段: {field}")
+            scheduled_time = task.get('scheduled_time')
+            if task.get('schedule_enabled') and scheduled_time and not isinstance(scheduled_time, datetime):
+                for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+                    try:
+                        datetime.strptime(str(scheduled_time), fmt)
+                        break
+                    except ValueError:
+                        continue
+                else:
+                    raise ValueError(f"第 {index + 1} 个任务计划时间格式错误: {scheduled_time}")
+        
+        for table, field in (('user_info', 'account_id'), ('file_records', 'file_id')):
+            ids = sorted({int(task[field]) for task in tasks})
+            existing = set()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                cursor.execute(
+                    f"SELECT id FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                )
+                existing.update(row['id'] for row in cursor.fetchall())
+            missing = [i for i in ids if i not in existing]
+            if missing:
+                name = '账号' if field == 'account_id' else '文件'
+                raise ValueError(f"{name}不存在: {missing[:20]}")
+    
+    def create_tasks_bulk(self, tasks: List[Dict]) -> List[int]:
+        """
+        批量创建发布任务（一次校验，单个事务 executemany 插入）
+        
+        Args:
+            tasks: 任务字典列表，每个任务可单独指定字段：
+                platform_type, account_id, file_id, title（必填），
+                tags, category, product_link, product_title, thumbnail_path,
+                is_draft, schedule_enabled, scheduled_time, task_name
+        
+        Returns:
+            任务ID列表（与 tasks 顺序一致，ID 连续）
+        """
+        if not tasks:
+            return []
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            self._validate_tasks(cursor, tasks)
+            values = [self._build_task_values(task) for task in tasks]
+            
+            # 写锁在首条 INSERT 时获取并保持到提交，同一事务内自增ID连续
+            cursor.executemany(self._INSERT_TASK_SQL, values)
+            cursor.execute("SELECT last_insert_rowid() AS last_id")
+            last_id = cursor.fetchone()['last_id']
+            conn.commit()
+            return list(range(last_id - len(values) + 1, last_id + 1))
+        except ValueError:
+            conn.rollback()
+            raise
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"批量创建任务失败: {e}")
+        finally:
+            conn.close()
+    
     def create_batch_tasks(
         self,
         platform_type: int,
@@ -136,7 +237,7 @@ class TaskService:
         scheduled_times: List[datetime] = None
     ) -> List[int]:
         """
-        批量创建发布任务
+        批量创建发布任务（文件 × 账号，单个事务插入）
         
         Args:
             platform_type: 平台类型
@@ -155,29 +256,28 @@ class TaskService:
         Returns:
             任务ID列表
         """
-        task_ids = []
         scheduled_times = scheduled_times or [None] * len(file_ids)
+        tasks = []
         
         for file_idx, file_id in enumerate(file_ids):
+            scheduled_time = scheduled_times[file_idx] if file_idx < len(scheduled_times) else None
             for account_id in account_ids:
-                scheduled_time = scheduled_times[file_idx] if file_idx < len(scheduled_times) else None
-                task_id = self.create_publish_task(
-                    platform_type=platform_type,
-                    account_id=account_id,
-                    file_id=file_id,
-                    title=title,
-                    tags=tags,
-                    category=category,
-                    product_link=product_link,
-                    product_title=product_title,
-                    thumbnail_path=thumbnail_path,
-                    is_draft=is_draft,
-                    schedule_enabled=schedule_enabled,
-                    scheduled_time=scheduled_time
-                )
-                task_ids.append(task_id)
+                tasks.append({
+                    'platform_type': platform_type,
+                    'account_id': account_id,
+                    'file_id': file_id,
+                    'title': title,
+                    'tags': tags,
+                    'category': category,
+                    'product_link': product_link,
+                    'product_title': product_title,
+                    'thumbnail_path': thumbnail_path,
+                    'is_draft': is_draft,
+                    'schedule_enabled': schedule_enabled,
+                    'scheduled_time': scheduled_time,
+                })
         
-        return task_ids
+        return self.create_tasks_bulk(tasks)
     
     def get_task(self, task_id: int) -> Optional[Dict]:
         """
@@ -209,7 +309,9 @@ class TaskService:
         error_message: str = None,
         platform_video_id: str = None,
         platform_video_url: str = None,
-        publish_time: datetime = None
+        publish_time: datetime = None,
+        lease_owner: str = None,
+        error_kind: str = None
     ) -> bool:
         """
         更新任务状态
@@ -221,6 +323,8 @@ class TaskService:
             platform_video_id: 平台视频ID（成功时）
             platform_video_url: 平台视频链接（成功时）
             publish_time: 实际发布时间
+            lease_owner: 仅当任务租约仍由该 worker 持有时才更新（租约过期被其他 worker 接管后不覆盖）
+            error_kind: 错误类型（失败时，见 services.retry_policy.ErrorKind）
         
         Returns:
             是否更新成功
@@ -236,6 +340,10 @@ class TaskService:
                 update_fields.append('error_message = ?')
                 params.append(error_message)
             
+            if error_kind is not None:
+                update_fields.append('error_kind = ?')
+                params.append(error_kind)
+            
             if platform_video_id is not None:
                 update_fields.append('platform_video_id = ?')
                 params.append(platform_video_id)
@@ -252,12 +360,25 @@ class TaskService:
                 update_fields.append('publish_time = ?')
                 params.append(publish_time_str)
             
+            # 离开执行中状态时释放租约
+            if status != self.STATUS_RUNNING:
+                update_fields.append('lease_owner = NULL')
+                update_fields.append('lease_expires_at = NULL')
+            
+            # 手动重置为待发布时立即可执行
+            if status == self.STATUS_PENDING:
+                update_fields.append('not_before = NULL')
+            
+            where = 'id = ?'
             params.append(task_id)
+            if lease_owner is not None:
+                where += ' AND lease_owner = ?'
+                params.append(lease_owner)
             
             cursor.execute(f'''
                 UPDATE publish_tasks 
                 SET {', '.join(update_fields)}
-                WHERE id = ?
+                WHERE {where}
             ''', params)
             
             conn.commit()
@@ -297,6 +418,187 @@ class TaskService:
         finally:
             conn.close()
     
+    def claim_task(
+        self,
+        task_id: int,
+        owner: str,
+        lease_seconds: float,
+        exclusive_account: bool = False,
+        platform_types: Iterable[int] = None
+    ) -> Optional[Dict]:
+        """
+        原子领取待发布任务：状态改为发布中并写入租约（UPDATE ... RETURNING，多个 worker 进程只有一个能成功）
+        
+        Args:
+            task_id: 任务ID
+            owner: worker ID
+            lease_seconds: 租约时长（秒），执行期间需通过 renew_leases 续期
+            exclusive_account: 同一账号已有租约有效的执行中任务时不领取（跨进程账号互斥，避免 Cookie 文件被并发使用）
+            platform_types: 只领取这些平台的任务（sau_worker --platforms），为空时不限制
+        
+        Returns:
+            领取成功返回任务信息，任务不存在/非待发布/已删除/账号被占用/平台不符返回None
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            now = time.time()
+            sql = '''
+                UPDATE publish_tasks
+                SET status = ?, lease_owner = ?, lease_expires_at = ?, update_time = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = ? AND is_deleted = 0
+                  AND (not_before IS NULL OR not_before <= ?)
+            '''
+            params = [self.STATUS_RUNNING, owner, now + lease_seconds, task_id, self.STATUS_PENDING, now]
+            if platform_types:
+                platform_types = [int(p) for p in platform_types]
+                sql += f" AND platform_type IN ({','.join('?' * len(platform_types))})"
+                params += platform_types
+            if exclusive_account:
+                sql += '''
+                AND NOT EXISTS (
+                    SELECT 1 FROM publish_tasks AS running
+                    WHERE running.account_id = publish_tasks.account_id
+                      AND running.status = ? AND running.is_deleted = 0
+                      AND running.lease_expires_at >= ?
+                )
+                '''
+                params += [self.STATUS_RUNNING, now]
+            cursor.execute(sql + " RETURNING *", params)
+            row = cursor.fetchone()
+            conn.commit()
+            return self._row_to_dict(row) if row else None
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"领取任务失败: {e}")
+        finally:
+            conn.close()
+    
+    def schedule_retry(
+        self,
+        task_id: int,
+        delay_seconds: float,
+        error_message: str,
+        error_kind: str,
+        lease_owner: str = None
+    ) -> Optional[float]:
+        """
+        失败后重新排队：状态改回待发布，重试次数+1，并设置最早执行时间（not_before）
+        
+        Args:
+            task_id: 任务ID
+            delay_seconds: 距离下次执行的秒数
+            error_message: 本次错误信息
+            error_kind: 错误类型
+            lease_owner: 仅当任务租约仍由该 worker 持有时才更新
+        
+        Returns:
+            下次可执行的时间戳；任务已被取消或租约已丢失返回None
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            not_before = time.time() + delay_seconds
+            sql = '''
+                UPDATE publish_tasks
+                SET status = ?, retry_count = retry_count + 1, not_before = ?,
+                    error_message = ?, error_kind = ?,
+                    lease_owner = NULL, lease_expires_at = NULL, update_time = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = ?
+            '''
+            params = [self.STATUS_PENDING, not_before, error_message, error_kind, task_id, self.STATUS_RUNNING]
+            if lease_owner is not None:
+                sql += ' AND lease_owner = ?'
+                params.append(lease_owner)
+            cursor.execute(sql, params)
+            conn.commit()
+            return not_before if cursor.rowcount > 0 else None
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"设置任务重试失败: {e}")
+        finally:
+            conn.close()
+    
+    def renew_leases(self, owner: str, task_ids: List[int], lease_seconds: float) -> List[int]:
+        """
+        续期（心跳）该 worker 持有的任务租约
+        
+        Args:
+            owner: worker ID
+            task_ids: 任务ID列表
+            lease_seconds: 新的租约时长（秒）
+        
+        Returns:
+            续期成功的任务ID；不在列表中的任务租约已丢失
+        """
+        if not task_ids:
+            return []
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            placeholders = ','.join('?' * len(task_ids))
+            cursor.execute(f'''
+                UPDATE publish_tasks
+                SET lease_expires_at = ?
+                WHERE lease_owner = ? AND status = ? AND id IN ({placeholders})
+                RETURNING id
+            ''', [time.time() + lease_seconds, owner, self.STATUS_RUNNING] + list(task_ids))
+            renewed = [row['id'] for row in cursor.fetchall()]
+            conn.commit()
+            return renewed
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"续期任务租约失败: {e}")
+        finally:
+            conn.close()
+    
+    def reap_expired_leases(self) -> List[int]:
+        """
+        回收租约已过期的执行中任务（worker 进程崩溃/重启后遗留）
+        - 重试次数未用完：重置为待发布并累加重试次数
+        - 重试次数已用完：标记为失败
+        没有租约的执行中任务（升级前遗留）同样回收
+        
+        Returns:
+            重新排队的任务ID列表
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        expired = '''
+            status = ? AND is_deleted = 0
+            AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+        '''
+        
+        try:
+            now = time.time()
+            cursor.execute(f'''
+                UPDATE publish_tasks
+                SET status = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    error_message = '执行中断（租约过期），重试次数已用完',
+                    update_time = CURRENT_TIMESTAMP
+                WHERE {expired} AND retry_count >= max_retry
+            ''', (self.STATUS_FAILED, self.STATUS_RUNNING, now))
+            cursor.execute(f'''
+                UPDATE publish_tasks
+                SET status = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    retry_count = retry_count + 1,
+                    error_message = '执行中断（租约过期），已重新排队',
+                    update_time = CURRENT_TIMESTAMP
+                WHERE {expired}
+                RETURNING id
+            ''', (self.STATUS_PENDING, self.STATUS_RUNNING, now))
+            requeued = [row['id'] for row in cursor.fetchall()]
+            conn.commit()
+            return requeued
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"回收过期任务租约失败: {e}")
+        finally:
+            conn.close()
+    
     def cancel_task(self, task_id: int) -> bool:
         """
         取消任务
@@ -467,7 +769,75 @@ class TaskService:
             待执行任务列表
         """
         return self.list_tasks(status=self.STATUS_PENDING, limit=limit)
-    
+
+    def get_pending_task_schedules(self, task_ids: List[int] = None, platform_types: Iterable[int] = None) -> List[Dict]:
+        """
+        获取待执行任务的调度信息（仅包含调度所需字段，供后台 worker 构建定时堆）
+
+        Args:
+            task_ids: 只查询这些任务；为空时返回全部待执行任务
+            platform_types: 只查询这些平台的任务；为空时不限制
+
+        Returns:
+            [{id, platform_type, schedule_enabled, scheduled_time, not_before}, ...]，按ID升序
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            sql = '''
+                SELECT id, platform_type, schedule_enabled, scheduled_time, not_before FROM publish_tasks
+                WHERE status = ? AND is_deleted = 0
+            '''
+            params = [self.STATUS_PENDING]
+            if platform_types:
+                platform_types = [int(p) for p in platform_types]
+                sql += f" AND platform_type IN ({','.join('?' * len(platform_types))})"
+                params += platform_types
+            if task_ids is None:
+                cursor.execute(sql + " ORDER BY id ASC", params)
+                return [dict(row) for row in cursor.fetchall()]
+
+            rows = []
+            task_ids = list(task_ids)
+            # 分批查询，避免超过 SQLite 参数数量上限
+            for i in range(0, len(task_ids), 500):
+                chunk = task_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(
+                    sql + f" AND id IN ({placeholders}) ORDER BY id ASC",
+                    params + chunk
+                )
+                rows.extend(dict(row) for row in cursor.fetchall())
+            return rows
+        finally:
+            conn.close()
+
+    def get_pending_account_schedules(self, account_ids: List[int]) -> List[Dict]:
+        """
+        获取指定账号的待执行/执行中任务的计划时间（供 Cookie 刷新按任务紧迫程度排序）
+
+        Returns:
+            [{account_id, schedule_enabled, scheduled_time}, ...]
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        try:
+            rows = []
+            account_ids = list(account_ids)
+            for i in range(0, len(account_ids), 500):
+                chunk = account_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'''
+                    SELECT account_id, schedule_enabled, scheduled_time FROM publish_tasks
+                    WHERE status IN (?, ?) AND is_deleted = 0 AND account_id IN ({placeholders})
+                ''', [self.STATUS_PENDING, self.STATUS_RUNNING] + chunk)
+                rows.extend(dict(row) for row in cursor.fetchall())
+            return rows
+        finally:
+            conn.close()
+
     def _row_to_dict(self, row: sqlite3.Row) -> Dict:
         """将数据库行转为字典"""
         task_dict = dict(row)
@@ -0,0 +1,494 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+后台任务 worker
+进程内唯一的常驻事件循环，负责按计划时间取出发布任务并按全局/平台/账号并发限制并行执行。
+请求线程只需调用 submit() 投递任务ID，不再自行创建事件循环。
+"""
+import asyncio
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from myUtils.proxy_helper import get_proxy_config_dict
+from services.rate_limiter import RateLimiter
+from services.task_service import TaskService
+from utils.base_social_media import get_route_filter_stats
+from utils.concurrency import KeyedSemaphore, parse_limit_spec
+
+
+class TaskWorker:
+    """
+    常驻任务 worker
+
+    - 队列：按到期时间排序的最小堆（TASK_WORKER_QUEUE_SIZE 限制容量）+ SQLite（publish_tasks.status=待发布）兜底；
+      堆满时任务仍保留在数据库中，到期前自动补充
+    - 定时：定时任务在 scheduled_time 前 TASK_SCHEDULE_LEAD_SECONDS 秒到期
+      （平台端定时发布，如 "*=86400,3=1209600"，纯数字表示所有平台），
+      worker 休眠到下一个到期任务，投递/取消时提前唤醒
+    - 并发：全局并发（TASK_WORKER_CONCURRENCY）、
+      平台并发（TASK_WORKER_PLATFORM_CONCURRENCY，如 "3=2,4=1"）、
+      账号并发（TASK_WORKER_ACCOUNT_CONCURRENCY，默认1，避免同一 Cookie 文件被并发写入）
+    - 租约：执行中的任务由执行器持有租约并心跳续期（TASK_LEASE_SECONDS），
+      worker 每 TASK_LEASE_REAP_INTERVAL_SECONDS 秒回收过期租约并重新排队（进程崩溃/重启后恢复）
+    - 重试：可重试的失败由执行器按指数退避写入 not_before 并改回待发布，worker 到期后重新执行
+      （TASK_RETRY_BASE_SECONDS / TASK_RETRY_MAX_SECONDS），等待期间不占用并发名额
+    - 限速：按平台/账号/代理的令牌桶限速（RATE_LIMIT_PLATFORM / RATE_LIMIT_ACCOUNT / RATE_LIMIT_PROXY），
+      令牌不足的任务按需等待的时间推迟回堆中，不占用并发名额
+    - 多进程：设置 poll_interval（TASK_WORKER_POLL_SECONDS）后定期从数据库拉取待执行任务，
+      可启动多个 sau_worker.py 共享同一个数据库；任务通过原子领取分配，同一账号同时只会被一个进程使用
+    """
+
+    MAX_SLEEP_SECONDS = 300
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        platform_limits: Dict[str, int] = None,
+        account_concurrency: int = None,
+        queue_size: int = None,
+        schedule_leads: Dict[str, int] = None,
+        poll_interval: float = None,
+        platform_types: Iterable[int] = None,
+        dry_run: bool = False,
+        rate_limiter: RateLimiter = None,
+    ):
+        self.concurrency = max(1, int(concurrency or os.environ.get("TASK_WORKER_CONCURRENCY", "4")))
+        self.platform_limits = platform_limits or parse_limit_spec(
+            os.environ.get("TASK_WORKER_PLATFORM_CONCURRENCY", ""), default=self.concurrency
+        )
+        self.account_concurrency = int(account_concurrency or os.environ.get("TASK_WORKER_ACCOUNT_CONCURRENCY", "1"))
+        self.queue_size = max(1, int(queue_size or os.environ.get("TASK_WORKER_QUEUE_SIZE", "10000")))
+        self.schedule_leads = schedule_leads or self._parse_schedule_leads(
+            os.environ.get("TASK_SCHEDULE_LEAD_SECONDS", "")
+        )
+        self.reap_interval = max(1.0, float(os.environ.get("TASK_LEASE_REAP_INTERVAL_SECONDS", "60")))
+        self.poll_interval = float(poll_interval or os.environ.get("TASK_WORKER_POLL_SECONDS", "0")) or None
+        self.platform_types = {int(p) for p in platform_types} if platform_types else None
+        self.dry_run = dry_run
+        self.rate_limiter = rate_limiter or RateLimiter.from_env()
+        # RUN_TASK_WORKER=0：任务由独立的 sau_worker 进程执行，本进程投递任务时不启动 worker
+        self.autostart = os.environ.get("RUN_TASK_WORKER", "1") == "1"
+        self.worker_id: Optional[str] = None
+        self.dispatching = False
+
+        self.task_service = TaskService()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._running = False
+
+        # 以下对象仅在 worker 事件循环内访问
+        self._heap: List[Tuple[float, int]] = []   # (到期时间戳, 任务ID)
+        self._due: Dict[int, float] = {}            # 堆中有效条目，用于惰性删除
+        self._backlog_due: Optional[float] = None   # 仅在数据库中的任务的最早到期时间
+        self._parked: List[Dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._queued_ids = set()
+        self._running_ids = set()
+        self._last_poll = 0.0
+        self._global_sem: Optional[asyncio.Semaphore] = None
+        self._platform_sem: Optional[KeyedSemaphore] = None
+        self._account_sem: Optional[KeyedSemaphore] = None
+        self._browser_pool = None
+        self._executor = None
+        self._stats = {
+            'submitted': 0, 'completed': 0, 'succeeded': 0, 'failed': 0,
+            'overflowed': 0, 'reaped': 0, 'contended': 0, 'retried': 0,
+        }
+
+    # ---------------------------
+    # 生命周期（可在任意线程调用）
+    # ---------------------------
+    def start(self, dispatch: bool = True):
+        """
+        启动 worker 线程和事件循环
+        :param dispatch: 是否执行发布任务；为 False 时只提供事件循环（如供 Cookie 刷新调度使用）
+        """
+        with self._start_lock:
+            if self._running:
+                return
+            self._running = True
+            self.dispatching = dispatch
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._thread_main, daemon=True, name="TaskWorker")
+            self._thread.start()
+        self._ready.wait(timeout=10)
+        if dispatch:
+            print(f"✅ 任务 worker 已启动 (concurrency={self.concurrency}, queue_size={self.queue_size})")
+        else:
+            print("✅ worker 事件循环已启动（不执行发布任务）")
+
+    def stop(self, timeout: float = 10):
+        """停止 worker（正在执行的任务会被取消）"""
+        with self._start_lock:
+            if not self._running:
+                return
+            self._running = False
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        print("✅ 任务 worker 已停止")
+
+    def is_running(self) -> bool:
+        return self._running and self._loop is not None
+
+    def submit(self, task_ids: Iterable[int]):
+        """投递任务（线程安全，立即返回）"""
+        task_ids = [int(t) for t in task_ids]
+        if not self.is_running():
+            if not self.autostart:
+                return
+            self.start()
+        if not self.dispatching:
+            # 事件循环只供调度/探测使用（RUN_TASK_WORKER=0）：任务留在数据库中由 sau_worker 执行
+            return
+        self._loop.call_soon_threadsafe(self._enqueue_many, task_ids)
+
+    def discard(self, task_ids: Iterable[int]):
+        """任务被取消/删除时通知 worker 移出队列（线程安全）"""
+        task_ids = [int(t) for t in task_ids]
+        if self.is_running() and self.dispatching:
+            self._loop.call_soon_threadsafe(self._discard_many, task_ids)
+
+    def run_coroutine(self, coro) -> Future:
+        """
+        在 worker 事件循环中运行协程（线程安全），返回 concurrent.futures.Future
+        worker 未启动时按 RUN_TASK_WORKER 决定是否同时开始执行发布任务
+        """
+        if not self.is_running():
+            self.start(dispatch=self.autostart)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stats(self) -> Dict:
+        """worker 运行状态（线程安全的快照）"""
+        stats = dict(self._stats)
+        stats.update({
+            'worker_id': self.worker_id,
+            'running': self.is_running(),
+            'dispatching': self.dispatching,
+            'queued': len(self._queued_ids),
+            'parked': len(self._parked),
+            'in_flight': len(self._running_ids),
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'backlog_due': self._backlog_due,
+        })
+        heap = self._heap
+        if heap:
+            stats['next_due_in'] = max(0.0, round(heap[0][0] - time.time(), 1))
+        if self._platform_sem is not None:
+            stats['active_by_platform'] = {str(k): v for k, v in self._platform_sem.active().items()}
+        if self._browser_pool is not None:
+            stats['browser_pool'] = self._browser_pool.stats()
+        stats['route_filter'] = get_route_filter_stats()
+        if self.rate_limiter.enabled():
+            stats['rate_limiter'] = self.rate_limiter.stats()
+        return stats
+
+    # ---------------------------
+    # 事件循环内部
+    # ---------------------------
+    def _thread_main(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._main())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ 任务 worker 异常退出: {e}")
+        finally:
+            self._running = False
+            self._ready.set()
+            loop.close()
+            self._loop = None
+
+    async def _main(self):
+        if not self.dispatching:
+            self._ready.set()
+            await asyncio.Event().wait()
+            return
+
+        from services.task_executor import TaskExecutor, new_worker_id
+        if not self.dry_run:
+            from services.browser_pool import BrowserPool
+
+        self._heap = []
+        self._due = {}
+        self._parked = []
+        self._wakeup = asyncio.Event()
+        self._global_sem = asyncio.Semaphore(self.concurrency)
+        self._platform_sem = KeyedSemaphore.from_spec(self.platform_limits)
+        self._account_sem = KeyedSemaphore(lambda key: self.account_concurrency)
+        self._browser_pool = None if self.dry_run else BrowserPool()
+        self.worker_id = new_worker_id()
+        self._executor = TaskExecutor(
+            browser_pool=self._browser_pool,
+            worker_id=self.worker_id,
+            exclusive_account=self.account_concurrency == 1,
+            dry_run=self.dry_run,
+            platform_types=self.platform_types,
+        )
+        self._ready.set()
+
+        # 进程启动时回收上次遗留的执行中任务，并从数据库恢复待执行任务
+        self._reap_expired()
+        self._backlog_due = 0.0
+        reaper = asyncio.create_task(self._reap_loop())
+        try:
+            await self._dispatch_loop()
+        finally:
+            reaper.cancel()
+            if self._browser_pool is not None:
+                await self._browser_pool.close()
+
+    async def _shutdown(self):
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    def _reap_expired(self):
+        try:
+            requeued = self.task_service.reap_expired_leases()
+        except Exception as e:
+            print(f"回收过期任务租约失败: {e}")
+            return
+        if requeued:
+            print(f"♻️ 回收 {len(requeued)} 个租约过期的任务并重新排队: {requeued}")
+            self._stats['reaped'] += len(requeued)
+            self._enqueue_many(requeued)
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            self._reap_expired()
+
+    @staticmethod
+    def _parse_schedule_leads(spec: str) -> Dict[str, int]:
+        spec = (spec or '').strip()
+        if spec.isdigit():
+            return {'*': int(spec)}
+        return parse_limit_spec(spec, default=86400)
+
+    def _due_time(self, row: Dict) -> float:
+        """计算任务到期时间：非定时任务立即到期，定时任务提前 lead 秒到期，失败重试的任务不早于 not_before"""
+        return max(self._schedule_due(row), row.get('not_before') or 0.0)
+
+    def _schedule_due(self, row: Dict) -> float:
+        if not row.get('schedule_enabled') or not row.get('scheduled_time'):
+            return 0.0
+        scheduled_time = None
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+            try:
+                scheduled_time = datetime.strptime(row['scheduled_time'], fmt)
+                break
+            except (TypeError, ValueError):
+                continue
+        if scheduled_time is None:
+            return 0.0
+        lead = self.schedule_leads.get(str(row['platform_type']), self.schedule_leads.get('*', 0))
+        return max(0.0, scheduled_time.timestamp() - lead)
+
+    def _enqueue_many(self, task_ids):
+        self._stats['submitted'] += len(task_ids)
+        task_ids = [t for t in task_ids if t not in self._queued_ids and t not in self._running_ids]
+        if task_ids:
+            # 回收的租约和 submit() 投递的任务同样按 --platforms 过滤
+            for row in self.task_service.get_pending_task_schedules(task_ids, platform_types=self.platform_types):
+                self._enqueue(row['id'], self._due_time(row))
+        self._wakeup.set()
+
+    def _enqueue(self, task_id: int, due: float) -> bool:
+        if task_id in self._queued_ids or task_id in self._running_ids:
+            return False
+        if len(self._queued_ids) >= self.queue_size:
+            # 任务仍为待发布状态保存在数据库中，到期前从数据库补充
+            self._stats['overflowed'] += 1
+            self._mark_backlog(due)
+            return False
+        heapq.heappush(self._heap, (due, task_id))
+        self._due[task_id] = due
+        self._queued_ids.add(task_id)
+        return True
+
+    def _discard_many(self, task_ids):
+        for task_id in task_ids:
+            self.rate_limiter.forget(task_id)
+            if self._due.pop(task_id, None) is not None:
+                self._queued_ids.discard(task_id)
+        parked = [t for t in self._parked if t['id'] in task_ids]
+        for task in parked:
+            self._parked.remove(task)
+            self._queued_ids.discard(task['id'])
+        # 堆中的旧条目在弹出时跳过；堆顶可能变化，唤醒调度协程重新计算休眠时间
+        self._wakeup.set()
+
+    def _refill_from_db(self):
+        """从数据库补充最早到期的待执行任务，直到堆填满"""
+        self._backlog_due = None
+        self._last_poll = time.time()
+        rows = [
+            row for row in self.task_service.get_pending_task_schedules(platform_types=self.platform_types)
+            if row['id'] not in self._queued_ids and row['id'] not in self._running_ids
+        ]
+        free = self.queue_size - len(self._queued_ids)
+        candidates = heapq.nsmallest(free + 1, ((self._due_time(row), row['id']) for row in rows))
+        for due, task_id in candidates[:free]:
+            self._enqueue(task_id, due)
+        if len(candidates) > free:
+            # 剩余任务的到期时间都不早于此，届时再补充
+            self._backlog_due = candidates[free][0]
+
+    def _mark_backlog(self, due: float):
+        if self._backlog_due is None or due < self._backlog_due:
+            self._backlog_due = due
+
+    def _can_refill(self) -> bool:
+        return self._backlog_due is not None and len(self._queued_ids) < self.queue_size
+
+    def _can_start(self, task: Dict) -> bool:
+        return not self._platform_sem.locked(task['platform_type']) and not self._account_sem.locked(task['account_id'])
+
+    def _rate_keys(self, task: Dict) -> Dict:
+        keys = task.get('_rate_keys')
+        if keys is None:
+            keys = {'platform': task['platform_type'], 'account': task['account_id']}
+            if self.rate_limiter.enabled('proxy'):
+                proxy = get_proxy_config_dict(task['account_id'])
+                keys['proxy'] = proxy['server'] if proxy else None
+            task['_rate_keys'] = keys
+        return keys
+
+    def _rate_deferred(self, task: Dict) -> bool:
+        """令牌不足时把任务按需等待的时间推迟回堆中（不占用并发名额），返回是否已推迟"""
+        if not self.rate_limiter.enabled():
+            return False
+        ok, wait = self.rate_limiter.try_acquire(self._rate_keys(task), token=task['id'])
+        if ok:
+            return False
+        due = time.time() + wait
+        heapq.heappush(self._heap, (due, task['id']))
+        self._due[task['id']] = due
+        return True
+
+    async def _next_runnable(self) -> Dict:
+        """
+        取出下一个已到期且可立即执行的任务
+        账号/平台并发已满的任务暂存到 parked，等对应名额释放后优先执行，避免占用全局并发名额
+        """
+        while True:
+            for task in list(self._parked):
+                if self._can_start(task):
+                    self._parked.remove(task)
+                    if self._rate_deferred(task):
+                        continue
+                    return task
+
+            now = time.time()
+            if self.poll_interval and now - self._last_poll >= self.poll_interval:
+                # 轮询模式：其他进程写入的任务只存在于数据库中
+                self._mark_backlog(now)
+            # 堆中已无早于积压任务的条目时才补充，避免每次调度都扫描数据库
+            if (self._can_refill() and self._backlog_due <= now
+                    and (not self._heap or self._heap[0][0] > self._backlog_due)):
+                self._refill_from_db()
+
+            while self._heap and self._heap[0][0] <= now:
+                due, task_id = heapq.heappop(self._heap)
+                if self._due.get(task_id) != due:
+                    continue  # 已取消或已重新入堆
+                del self._due[task_id]
+                task = self.task_service.get_task(task_id)
+                if not task or task['status'] != TaskService.STATUS_PENDING or task.get('is_deleted'):
+                    self._queued_ids.discard(task_id)
+                    continue
+                if self._can_start(task):
+                    if self._rate_deferred(task):
+                        continue
+                    return task
+                self._parked.append(task)
+
+            # 休眠到下一个到期时间（有上限，防止系统时间调整后睡过头），投递/取消/名额释放时提前唤醒
+            timeout = self.MAX_SLEEP_SECONDS
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - now)
+            if self._can_refill():
+                timeout = min(timeout, self._backlog_due - now)
+            if self.poll_interval:
+                timeout = min(timeout, self._last_poll + self.poll_interval - now)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch_loop(self):
+        while self._running:
+            await self._global_sem.acquire()
+            try:
+                task = await self._next_runnable()
+            except BaseException:
+                self._global_sem.release()
+                raise
+            # 名额在调度协程内同步占用，保证 _can_start 的判断不会失效
+            self._platform_sem.try_acquire(task['platform_type'])
+            self._account_sem.try_acquire(task['account_id'])
+            self._queued_ids.discard(task['id'])
+            self._running_ids.add(task['id'])
+            asyncio.create_task(self._run(task))
+
+    async def _run(self, task: Dict):
+        task_id = task['id']
+        retry_at = None
+        try:
+            result = await self._executor.execute_with_retry(task_id)
+            if result.get('claimed') is False:
+                # 已被其他进程领取，或账号正被其他进程使用：稍后从数据库重新检查
+                self._stats['contended'] += 1
+                if self.rate_limiter.enabled():
+                    self.rate_limiter.refund(self._rate_keys(task))
+                self._mark_backlog(time.time() + (self.poll_interval or 5))
+                return
+            retry_at = result.get('retry_at')
+            if retry_at is not None:
+                self._stats['retried'] += 1
+                return
+            self._stats['completed'] += 1
+            if result.get('success'):
+                self._stats['succeeded'] += 1
+            else:
+                self._stats['failed'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._stats['failed'] += 1
+            print(f"任务 {task_id} 执行失败: {e}")
+        finally:
+            self._platform_sem.release(task['platform_type'])
+            self._account_sem.release(task['account_id'])
+            self._running_ids.discard(task_id)
+            if retry_at is not None:
+                self._enqueue(task_id, retry_at)
+            self._global_sem.release()
+            self._wakeup.set()
+
+
+_worker: Optional[TaskWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_task_worker() -> TaskWorker:
+    """获取进程内唯一的任务 worker"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TaskWorker()
+        return _worker
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上传步骤耗时统计服务
+任务执行完成后把上传器（BaseUploader）各步骤的耗时写入 upload_step_metrics 表，
+按平台/步骤汇总平均值、P50/P95 和失败次数，用于定位各平台的耗时集中在哪个步骤。
+"""
+from typing import Dict, List, Optional
+
+from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
+
+
+class UploadMetricsService:
+    """上传步骤耗时统计服务"""
+
+    def __init__(self):
+        self.db_path = BASE_DIR / "db" / "database.db"
+        self._ensure_schema()
+
+    def _get_connection(self):
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path)
+
+    def _ensure_schema(self):
+        """确保步骤耗时表存在（本地库未重建时自动创建）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS upload_step_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER,                          -- 关联publish_tasks.id
+                platform_type INTEGER NOT NULL,           -- 平台类型
+                account_id INTEGER,                       -- 账号ID
+                step TEXT NOT NULL,                       -- 步骤名：launch/navigate/attach_file/...
+                duration_ms INTEGER NOT NULL,             -- 步骤耗时（毫秒）
+                success INTEGER NOT NULL,                 -- 步骤是否完成：0失败 1成功
+                pacing TEXT,                              -- 节奏模式（UPLOAD_PACING）
+                create_time DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_upload_step_metrics_task ON upload_step_metrics(task_id)")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_upload_step_metrics_platform ON upload_step_metrics(platform_type, create_time)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record_steps(self, task_id: Optional[int], platform_type: int, account_id: Optional[int], report: Dict) -> int:
+        """
+        记录一次上传的步骤耗时
+
+        Args:
+            task_id: 任务ID
+            platform_type: 平台类型
+            account_id: 账号ID
+            report: BaseUploader.step_report() 的返回值
+
+        Returns:
+            写入的记录数
+        """
+        failed_step = report.get('failed_step')
+        rows = [
+            (task_id, platform_type, account_id, step, int(seconds * 1000), 0 if step == failed_step else 1, report.get('pacing'))
+            for step, seconds in (report.get('steps') or {}).items()
+        ]
+        if not rows:
+            return 0
+        conn = self._get_connection()
+        try:
+            conn.executemany('''
+                INSERT INTO upload_step_metrics
+                (task_id, platform_type, account_id, step, duration_ms, success, pacing)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+
+    def get_task_steps(self, task_id: int) -> List[Dict]:
+        """获取任务各次执行的步骤耗时（按写入顺序）"""
+        conn = self._get_connection()
+        try:
+            cursor = conn.execute('''
+                SELECT step, duration_ms, success, pacing, create_time
+                FROM upload_step_metrics WHERE task_id = ? ORDER BY id
+            ''', (task_id,))
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def get_step_stats(self, platform_type: int = None, days: int = 7) -> List[Dict]:
+        """
+        按平台/步骤汇总耗时
+
+        Args:
+            platform_type: 平台类型（为空时统计全部平台）
+            days: 统计最近多少天
+
+        Returns:
+            [{'platform_type', 'step', 'count', 'fail_count', 'avg_ms', 'p50_ms', 'p95_ms', 'max_ms'}, ...]
+        """
+        sql = "SELECT platform_type, step, duration_ms, success FROM upload_step_metrics WHERE create_time >= datetime('now', ?)"
+        params = [f'-{int(days)} days']
+        if platform_type:
+            sql += " AND platform_type = ?"
+            params.append(platform_type)
+
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        groups: Dict[tuple, Dict] = {}
+        for row in rows:
+            group = groups.setdefault((row['platform_type'], row['step']), {'durations': [], 'fail_count': 0})
+            group['durations'].append(row['duration_ms'])
+            if not row['success']:
+                group['fail_count'] += 1
+
+        def percentile(values: List[int], p: float) -> int:
+            return values[min(len(values) - 1, int(len(values) * p))]
+
+        stats = []
+        for (platform, step), group in groups.items():
+            durations = sorted(group['durations'])
+            stats.append({
+                'platform_type': platform,
+                'step': step,
+                'count': len(durations),
+                'fail_count': group['fail_count'],
+                'avg_ms': int(sum(durations) / len(durations)),
+                'p50_ms': percentile(durations, 0.5),
+                'p95_ms': percentile(durations, 0.95),
+                'max_ms': durations[-1],
+            })
+        stats.sort(key=lambda s: (s['platform_type'], -s['avg_ms']))
+        return stats
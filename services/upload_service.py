@@ -0,0 +1,673 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+文件上传服务
+上传内容按块写入磁盘（内存占用与文件大小无关），写入的同时增量计算 MD5 / SHA-256，
+完成后移动到 videoFile/YYYY/MM/DD/ 并写入 file_records（filesize、md5_hash、sha256_hash、mime_type、file_type）。
+
+分块上传流程（可断点续传）：
+    init(filename, size)            创建上传会话并预分配临时文件，返回 upload_id 和分块大小
+    write_chunk(upload_id, offset)  写入一个分块（按 chunk_size 对齐，可并行、乱序）
+    status(upload_id)               查询缺失的字节区间，连接中断后只补传缺失部分
+    complete(upload_id)             校验分块齐全/哈希并入库
+会话（文件大小、分块大小、已接收分块位图）保存在 upload_sessions 表，服务重启后可继续上传。
+
+按内容去重：media_blobs 以 MD5（唯一索引）登记磁盘上的每份内容及引用计数，file_records.blob_id 指向它。
+上传完成时内容已存在则只新增文件记录、丢弃临时文件；init 时提供 md5 可直接秒传。
+删除文件记录时引用计数减一，最后一个引用删除时才删除磁盘文件。
+
+配置（环境变量）：
+    UPLOAD_CHUNK_SIZE_MB       建议分块大小（默认8MB）
+    UPLOAD_MAX_FILE_SIZE_MB    单个文件大小上限（默认10240MB）
+    UPLOAD_SESSION_TTL_HOURS   未完成的上传会话保留时长（默认24小时）
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from conf import BASE_DIR
+from utils.sqlite_pool import get_connection
+
+# 读写缓冲块大小
+COPY_BUFFER_SIZE = 1024 * 1024
+# 分块大小允许范围
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+class UploadError(Exception):
+    """上传请求不合法（会话不存在、偏移不连续、大小或哈希不符等）"""
+
+    def __init__(self, msg: str, code: int = 400, data: Dict = None):
+        super().__init__(msg)
+        self.code = code
+        self.data = data
+
+
+class StreamHasher:
+    """边写边算哈希"""
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def update(self, data: bytes):
+        self.md5.update(data)
+        self.sha256.update(data)
+        self.size += len(data)
+
+    def copy(self, src: BinaryIO, dst: Optional[BinaryIO], limit: int = None) -> int:
+        """
+        从 src 按块读取写入 dst，同时更新哈希
+        :param dst: 为空时只计算哈希
+        :param limit: 最多读取的字节数（为空时读到 EOF）
+        :returns: 本次读取的字节数
+        """
+        written = 0
+        while limit is None or written < limit:
+            size = COPY_BUFFER_SIZE if limit is None else min(COPY_BUFFER_SIZE, limit - written)
+            data = src.read(size)
+            if not data:
+                break
+            if dst is not None:
+                dst.write(data)
+            self.update(data)
+            written += len(data)
+        return written
+
+
+def detect_mime(filename: str):
+    """根据扩展名返回 (mime_type, file_type)"""
+    mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    major = mime_type.split('/', 1)[0]
+    return mime_type, major if major in ('video', 'image') else 'other'
+
+
+def _preallocate(path: Path, size: int):
+    """创建并预分配临时文件（支持时使用 posix_fallocate 分配磁盘块，否则生成稀疏文件）"""
+    with open(path, 'wb') as f:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+
+class UploadSession:
+    """
+    一个分块上传会话
+    已接收分块记录在位图中（第 i 位表示第 i 块）。哈希对象无法序列化，只在内存中沿连续已接收的前缀推进，
+    服务重启后从磁盘上的前缀重新计算。
+    """
+
+    def __init__(self, upload_id: str, filename: str, size: int, chunk_size: int, temp_path: Path, bitmap: bytes = None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.temp_path = temp_path
+        self.chunk_count = max(1, -(-size // chunk_size))
+        self.bitmap = bytearray(bitmap) if bitmap else bytearray((self.chunk_count + 7) // 8)
+        self.hasher = StreamHasher()
+        # 哈希已覆盖的连续前缀长度
+        self.hashed_offset = 0
+        self.lock = threading.Lock()
+        self.hash_lock = threading.Lock()
+        self.complete_lock = threading.Lock()
+
+    def chunk_length(self, index: int) -> int:
+        return max(0, min(self.chunk_size, self.size - index * self.chunk_size))
+
+    def has(self, index: int) -> bool:
+        return bool(self.bitmap[index >> 3] & (1 << (index & 7)))
+
+    def mark(self, index: int) -> bytes:
+        """标记分块已接收，返回位图快照"""
+        with self.lock:
+            self.bitmap[index >> 3] |= 1 << (index & 7)
+            return bytes(self.bitmap)
+
+    def received_bytes(self) -> int:
+        with self.lock:
+            return sum(self.chunk_length(i) for i in range(self.chunk_count) if self.has(i))
+
+    def missing_ranges(self) -> List[List[int]]:
+        """缺失的字节区间 [[start, end), ...]（相邻缺失分块合并）"""
+        ranges: List[List[int]] = []
+        with self.lock:
+            for i in range(self.chunk_count):
+                if self.has(i) or not self.chunk_length(i):
+                    continue
+                start = i * self.chunk_size
+                end = start + self.chunk_length(i)
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1][1] = end
+                else:
+                    ranges.append([start, end])
+        return ranges
+
+    def status(self) -> Dict:
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunk_count': self.chunk_count,
+            'received_bytes': self.received_bytes(),
+            'missing_ranges': self.missing_ranges(),
+        }
+
+    def write(self, offset: int, stream: BinaryIO, length: int) -> int:
+        """把 stream 中 length 字节按位置写入临时文件（不同分块可并行写入）"""
+        written = 0
+        fd = os.open(self.temp_path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            while written < length:
+                data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+                if not data:
+                    break
+                if hasattr(os, 'pwrite'):
+                    os.pwrite(fd, data, offset + written)
+                else:
+                    # Windows 没有 pwrite：每个请求独立的 fd，seek 后写入
+                    os.lseek(fd, offset + written, os.SEEK_SET)
+                    os.write(fd, data)
+                written += len(data)
+        finally:
+            os.close(fd)
+        return written
+
+    def advance_hash(self, wait: bool = False) -> StreamHasher:
+        """
+        哈希沿连续已接收的分块推进（从磁盘读回刚写入的数据，通常命中页缓存）
+        :param wait: 是否等待其它线程的推进完成（complete 时需要完整哈希）
+        """
+        while True:
+            if not self.hash_lock.acquire(blocking=wait):
+                return self.hasher
+            try:
+                with open(self.temp_path, 'rb') as f:
+                    while True:
+                        index = self.hashed_offset // self.chunk_size
+                        with self.lock:
+                            if index >= self.chunk_count or not self.has(index):
+                                break
+                        length = self.chunk_length(index)
+                        f.seek(self.hashed_offset)
+                        self.hasher.copy(f, None, limit=length)
+                        self.hashed_offset += length
+            finally:
+                self.hash_lock.release()
+            # 释放锁后再检查一次：避免其它线程在本线程推进期间标记的分块没人处理
+            index = self.hashed_offset // self.chunk_size
+            with self.lock:
+                if wait or index >= self.chunk_count or not self.has(index):
+                    return self.hasher
+
+
+class UploadService:
+    """文件上传服务"""
+
+    def __init__(self):
+        self.db_path = BASE_DIR / "db" / "database.db"
+        self.video_dir = Path(BASE_DIR / "videoFile")
+        self.temp_dir = self.video_dir / ".uploads"
+        self.chunk_size = int(float(os.environ.get("UPLOAD_CHUNK_SIZE_MB", "8")) * 1024 * 1024)
+        self.max_file_size = int(float(os.environ.get("UPLOAD_MAX_FILE_SIZE_MB", "10240")) * 1024 * 1024)
+        self.session_ttl = float(os.environ.get("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600
+        self._sessions: Dict[str, UploadSession] = {}
+        self._lock = threading.Lock()
+        self._ensure_schema()
+
+    def _get_connection(self):
+        """获取数据库连接（连接池按线程复用，close() 归还连接）"""
+        return get_connection(self.db_path, foreign_keys=False)
+
+    def _ensure_schema(self):
+        """确保文件表具备 SHA-256/blob_id 字段、上传会话表和内容去重表存在"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                upload_id TEXT PRIMARY KEY,               -- 会话ID
+                filename TEXT NOT NULL,                   -- 原始文件名
+                size INTEGER NOT NULL,                    -- 文件总大小（字节）
+                chunk_size INTEGER NOT NULL,              -- 分块大小（字节）
+                received_bitmap BLOB NOT NULL,            -- 已接收分块位图（第 i 位表示第 i 块）
+                received_bytes INTEGER DEFAULT 0,         -- 已接收字节数
+                temp_path TEXT NOT NULL,                  -- 预分配的临时文件路径
+                status TEXT DEFAULT 'uploading',          -- 状态：uploading/completed/aborted
+                file_id INTEGER,                          -- 完成后关联 file_records.id
+                create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_upload_sessions_status ON upload_sessions(status, update_time)"
+            )
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_blobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                md5_hash TEXT NOT NULL UNIQUE,            -- 内容MD5（去重键）
+                sha256_hash TEXT,                         -- 内容SHA-256
+                file_path TEXT NOT NULL,                  -- 磁盘文件相对路径（videoFile 下）
+                size_bytes INTEGER NOT NULL,              -- 文件大小（字节）
+                ref_count INTEGER DEFAULT 1,              -- 引用该文件的 file_records 数量
+                create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+                update_time DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            conn.commit()
+            cursor.execute("PRAGMA table_info(file_records)")
+            cols = {row["name"] for row in cursor.fetchall()}
+            for name, ddl in (
+                ("sha256_hash", "TEXT"),
+                ("blob_id", "INTEGER"),
+            ):
+                if name not in cols:
+                    cursor.execute(f"ALTER TABLE file_records ADD COLUMN {name} {ddl}")
+                    conn.commit()
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_records_md5_hash ON file_records(md5_hash)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_records_blob_id ON file_records(blob_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_records_file_path ON file_records(file_path)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ---------------------------
+    # 单请求上传（/uploadSave、/upload）
+    # ---------------------------
+    def save_stream(self, stream: BinaryIO, filename: str, record: bool = True) -> Dict:
+        """
+        将上传流按块写入 videoFile/YYYY/MM/DD/uuid_filename，边写边算哈希
+        :param record: 是否写入 file_records
+        :returns: 文件信息（含 id、file_path、filesize、md5_hash 等）
+        """
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.temp_dir / f"{uuid.uuid4().hex}.part"
+        hasher = StreamHasher()
+        try:
+            with open(temp_path, 'wb') as f:
+                hasher.copy(stream, f, limit=self.max_file_size + 1)
+            if hasher.size > self.max_file_size:
+                raise UploadError(f"文件超过大小上限 {self.max_file_size // (1024 * 1024)}MB", code=413)
+            return self._finalize(temp_path, filename, hasher, record=record)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    # ---------------------------
+    # 分块上传（可断点续传）
+    # ---------------------------
+    def init(self, filename: str, size: int, chunk_size: int = None) -> Dict:
+        """
+        创建分块上传会话：预分配临时文件，会话和已接收分块位图保存在 upload_sessions 表
+        :param size: 文件总大小（字节）
+        :param chunk_size: 分块大小（字节，默认 UPLOAD_CHUNK_SIZE_MB）
+        """
+        if not filename:
+            raise UploadError("filename is required")
+        if size is None or size < 0:
+            raise UploadError("size is required")
+        if size > self.max_file_size:
+            raise UploadError(f"文件超过大小上限 {self.max_file_size // (1024 * 1024)}MB", code=413)
+        chunk_size = min(max(int(chunk_size or self.chunk_size), MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        self._cleanup_expired()
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+
+        upload_id = uuid.uuid4().hex
+        temp_path = self.temp_dir / f"{upload_id}.part"
+        _preallocate(temp_path, size)
+        session = UploadSession(upload_id, filename, size, chunk_size, temp_path)
+
+        conn = self._get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO upload_sessions (upload_id, filename, size, chunk_size, received_bitmap, temp_path)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (upload_id, filename, size, chunk_size, bytes(session.bitmap), str(temp_path)))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session.status()
+
+    def _get_session(self, upload_id: str) -> 'UploadSession':
+        """从内存获取会话；服务重启后从 upload_sessions 表恢复"""
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None:
+                return session
+            conn = self._get_connection()
+            try:
+                row = conn.execute(
+                    "SELECT * FROM upload_sessions WHERE upload_id = ? AND status = 'uploading'", (upload_id,)
+                ).fetchone()
+            finally:
+                conn.close()
+            if row is None or not Path(row['temp_path']).exists():
+                raise UploadError("上传会话不存在或已过期", code=404)
+            session = UploadSession(
+                upload_id, row['filename'], row['size'], row['chunk_size'], Path(row['temp_path']),
+                bitmap=row['received_bitmap'],
+            )
+            self._sessions[upload_id] = session
+            return session
+
+    def status(self, upload_id: str) -> Dict:
+        """会话状态：已接收字节数和缺失的字节区间"""
+        return self._get_session(upload_id).status()
+
+    def write_chunk(self, upload_id: str, offset: int, stream: BinaryIO, length: int = None) -> Dict:
+        """
+        写入一个分块（可并行、乱序），按偏移直接写入预分配文件的对应位置
+        :param offset: 分块起始位置，必须按 chunk_size 对齐
+        :param length: 分块长度（请求 Content-Length），除最后一块外必须等于 chunk_size
+        :returns: 会话状态
+        """
+        session = self._get_session(upload_id)
+        if offset < 0 or offset % session.chunk_size or offset >= max(session.size, 1):
+            raise UploadError("分块偏移未按 chunk_size 对齐或超出文件大小", data=session.status())
+        index = offset // session.chunk_size
+        expected = session.chunk_length(index)
+        if length is not None and length != expected:
+            raise UploadError(f"分块长度应为 {expected} 字节", data=session.status())
+
+        if not session.has(index):
+            written = session.write(offset, stream, expected)
+            if written != expected:
+                # 连接中断：该分块不标记为已接收，客户端重传即可
+                raise UploadError("分块数据不完整", data=session.status())
+            bitmap = session.mark(index)
+            self._save_progress(session, bitmap)
+            session.advance_hash()
+        return session.status()
+
+    def _save_progress(self, session: 'UploadSession', bitmap: bytes):
+        conn = self._get_connection()
+        try:
+            conn.execute('''
+                UPDATE upload_sessions
+                SET received_bitmap = ?, received_bytes = ?, update_time = CURRENT_TIMESTAMP
+                WHERE upload_id = ?
+            ''', (bitmap, session.received_bytes(), session.upload_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def complete(self, upload_id: str, md5: str = None, sha256: str = None) -> Dict:
+        """
+        完成分块上传：校验分块齐全和（可选）客户端哈希，移动文件并入库
+        """
+        session = self._get_session(upload_id)
+        with session.complete_lock:
+            missing = session.missing_ranges()
+            if missing:
+                raise UploadError("分块未全部上传", code=409, data=session.status())
+            hasher = session.advance_hash(wait=True)
+            if md5 and md5.lower() != hasher.md5.hexdigest():
+                raise UploadError("MD5 校验失败", code=422)
+            if sha256 and sha256.lower() != hasher.sha256.hexdigest():
+                raise UploadError("SHA-256 校验失败", code=422)
+            result = self._finalize(session.temp_path, session.filename, hasher)
+            self._close_session(upload_id, 'completed', file_id=result['id'])
+            return result
+
+    def abort(self, upload_id: str) -> bool:
+        """取消分块上传并删除临时文件"""
+        try:
+            session = self._get_session(upload_id)
+        except UploadError:
+            return False
+        with session.complete_lock:
+            if session.temp_path.exists():
+                session.temp_path.unlink()
+            self._close_session(upload_id, 'aborted')
+        return True
+
+    def _close_session(self, upload_id: str, status: str, file_id: int = None):
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        conn = self._get_connection()
+        try:
+            conn.execute('''
+                UPDATE upload_sessions SET status = ?, file_id = ?, update_time = CURRENT_TIMESTAMP
+                WHERE upload_id = ?
+            ''', (status, file_id, upload_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _cleanup_expired(self):
+        """清理超过 UPLOAD_SESSION_TTL_HOURS 未更新的会话"""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT upload_id FROM upload_sessions
+                WHERE status = 'uploading' AND update_time < datetime('now', ?)
+            ''', (f'-{int(self.session_ttl)} seconds',)).fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            if not self.abort(row['upload_id']):
+                self._close_session(row['upload_id'], 'aborted')
+
+    # ---------------------------
+    # 入库（按内容去重）
+    # ---------------------------
+    def _find_blob(self, conn, md5_hash: str) -> Optional[Dict]:
+        """按 MD5 查找已登记的内容（media_blobs.md5_hash 唯一）"""
+        row = conn.execute("SELECT * FROM media_blobs WHERE md5_hash = ?", (md5_hash,)).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _same_content(blob: Dict, size_bytes: int, sha256_hash: Optional[str]) -> bool:
+        """MD5 相同时再比较大小和 SHA-256（双方都有时），不一致视为 MD5 碰撞"""
+        if blob['size_bytes'] != size_bytes:
+            return False
+        return not (sha256_hash and blob['sha256_hash'] and sha256_hash.lower() != blob['sha256_hash'])
+
+    def _blob_file_exists(self, blob: Dict) -> bool:
+        return (self.video_dir / blob['file_path']).exists()
+
+    def _begin(self, conn):
+        # 查找和引用计数在同一个写事务里完成，并发上传同一内容时只会保存一份
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    def _insert_record(self, conn, info: Dict, blob_id: int) -> int:
+        cursor = conn.execute('''
+            INSERT INTO file_records
+            (uuid, filename, file_path, filesize, file_type, mime_type, md5_hash, sha256_hash, blob_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (info['uuid'], info['filename'], info['file_path'], info['filesize'], info['file_type'],
+              info['mime_type'], info['md5_hash'], info['sha256_hash'], blob_id))
+        return cursor.lastrowid
+
+    def _file_info(self, filename: str, size_bytes: int, md5_hash: str, sha256_hash: Optional[str]) -> Dict:
+        mime_type, file_type = detect_mime(filename)
+        return {
+            'id': None,
+            'uuid': str(uuid.uuid1()),
+            'filename': filename,
+            'file_path': None,
+            'filesize': round(size_bytes / (1024 * 1024), 2),
+            'size_bytes': size_bytes,
+            'mime_type': mime_type,
+            'file_type': file_type,
+            'md5_hash': md5_hash,
+            'sha256_hash': sha256_hash,
+            'deduplicated': False,
+        }
+
+    def link_existing(self, filename: str, md5: str, size: int, sha256: str = None) -> Optional[Dict]:
+        """
+        秒传：内容已存在（MD5 和大小一致，提供 SHA-256 时一并校验）时直接新建文件记录，引用已有文件
+        :returns: 文件信息；内容不存在时返回 None，客户端按正常流程上传
+        """
+        if not filename or not md5 or size is None:
+            return None
+        md5 = md5.lower()
+        conn = self._get_connection()
+        try:
+            self._begin(conn)
+            blob = self._find_blob(conn, md5)
+            if blob is None or not self._same_content(blob, size, sha256) or not self._blob_file_exists(blob):
+                return None
+            info = self._file_info(filename, size, md5, blob['sha256_hash'])
+            info['file_path'] = blob['file_path']
+            info['deduplicated'] = True
+            conn.execute(
+                "UPDATE media_blobs SET ref_count = ref_count + 1, update_time = CURRENT_TIMESTAMP WHERE id = ?",
+                (blob['id'],),
+            )
+            info['id'] = self._insert_record(conn, info, blob['id'])
+            conn.commit()
+        finally:
+            conn.close()
+        self._submit_probe(info)
+        return info
+
+    def _finalize(self, temp_path: Path, filename: str, hasher: StreamHasher, record: bool = True) -> Dict:
+        """
+        入库：内容已存在时新增一条引用已有文件的记录并丢弃临时文件，
+        否则移动到按日期分目录的最终位置，登记到 media_blobs 并写入 file_records
+
+        同一 MD5 已登记但大小/SHA-256 不同（MD5 碰撞）时不去重：文件单独保存，记录不关联 media_blobs；
+        已登记内容的磁盘文件丢失时，新文件替换该行的路径，原有引用保持不变
+        """
+        info = self._file_info(filename, hasher.size, hasher.md5.hexdigest(), hasher.sha256.hexdigest())
+        if not record:
+            info['file_path'] = self._store(temp_path, info)
+            return info
+
+        conn = self._get_connection()
+        stored_path = None
+        try:
+            self._begin(conn)
+            blob = self._find_blob(conn, info['md5_hash'])
+            if blob is not None and not self._same_content(blob, info['size_bytes'], info['sha256_hash']):
+                print(f"⚠️ MD5 相同但内容不同，不去重: md5={info['md5_hash']}")
+                stored_path = info['file_path'] = self._store(temp_path, info)
+                blob_id = None
+            elif blob is not None and self._blob_file_exists(blob):
+                info['file_path'] = blob['file_path']
+                info['deduplicated'] = True
+                blob_id = blob['id']
+                conn.execute(
+                    "UPDATE media_blobs SET ref_count = ref_count + 1, update_time = CURRENT_TIMESTAMP WHERE id = ?",
+                    (blob_id,),
+                )
+            elif blob is not None:
+                # 同一内容的磁盘文件已丢失：新文件替换该行的路径
+                stored_path = info['file_path'] = self._store(temp_path, info)
+                blob_id = blob['id']
+                conn.execute('''
+                    UPDATE media_blobs
+                    SET file_path = ?, sha256_hash = COALESCE(sha256_hash, ?), ref_count = ref_count + 1,
+                        update_time = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (info['file_path'], info['sha256_hash'], blob_id))
+            else:
+                stored_path = info['file_path'] = self._store(temp_path, info)
+                blob_id = conn.execute('''
+                    INSERT INTO media_blobs (md5_hash, sha256_hash, file_path, size_bytes, ref_count)
+                    VALUES (?, ?, ?, ?, 1)
+                ''', (info['md5_hash'], info['sha256_hash'], info['file_path'], info['size_bytes'])).lastrowid
+            info['id'] = self._insert_record(conn, info, blob_id)
+            conn.commit()
+        except Exception:
+            if stored_path:
+                (self.video_dir / stored_path).unlink(missing_ok=True)
+            raise
+        finally:
+            conn.close()
+        if info['deduplicated']:
+            print(f"♻️ 内容已存在，复用文件: {info['file_path']}")
+        self._submit_probe(info)
+        return info
+
+    def _submit_probe(self, info: Dict):
+        """新文件记录投递到后台媒体探测队列（填充时长、宽高）"""
+        if info['file_type'] != 'video':
+            return
+        try:
+            from services.media_probe_service import get_media_probe_service
+            get_media_probe_service().submit(info['id'])
+        except Exception as e:
+            print(f"⚠️ 投递媒体探测失败 file_id={info['id']}: {e}")
+
+    def _store(self, temp_path: Path, info: Dict) -> str:
+        """移动到 videoFile/YYYY/MM/DD/uuid_filename，返回相对路径"""
+        date_dir = datetime.now().strftime("%Y/%m/%d")
+        save_dir = self.video_dir / date_dir
+        save_dir.mkdir(parents=True, exist_ok=True)
+        final_filename = f"{info['uuid']}_{info['filename']}"
+        os.replace(temp_path, save_dir / final_filename)
+        return f"{date_dir}/{final_filename}"
+
+    def delete_file(self, file_id: int) -> Optional[Dict]:
+        """
+        删除文件记录；磁盘文件在最后一个引用被删除时才删除
+        :returns: 被删除的记录，不存在时返回 None
+        """
+        conn = self._get_connection()
+        try:
+            self._begin(conn)
+            row = conn.execute("SELECT * FROM file_records WHERE id = ?", (file_id,)).fetchone()
+            if row is None:
+                return None
+            record = dict(row)
+            conn.execute("DELETE FROM file_records WHERE id = ?", (file_id,))
+            if record.get('blob_id'):
+                conn.execute("UPDATE media_blobs SET ref_count = ref_count - 1 WHERE id = ?", (record['blob_id'],))
+                blob = conn.execute(
+                    "SELECT ref_count FROM media_blobs WHERE id = ?", (record['blob_id'],)
+                ).fetchone()
+                unlink = blob is None or blob['ref_count'] <= 0
+                if unlink:
+                    conn.execute("DELETE FROM media_blobs WHERE id = ?", (record['blob_id'],))
+            else:
+                # 去重之前的旧记录：没有其它记录指向同一路径时才删除
+                unlink = conn.execute(
+                    "SELECT 1 FROM file_records WHERE file_path = ? LIMIT 1", (record['file_path'],)
+                ).fetchone() is None
+            conn.commit()
+        finally:
+            conn.close()
+
+        file_path = self.video_dir / record['file_path']
+        if not unlink:
+            print(f"♻️ 文件仍被其它记录引用，保留: {file_path}")
+        elif file_path.exists():
+            try:
+                file_path.unlink()  # 删除文件
+                print(f"✅ 实际文件已删除: {file_path}")
+            except Exception as e:
+                print(f"⚠️ 删除实际文件失败: {e}")
+        else:
+            print(f"⚠️ 实际文件不存在: {file_path}")
+        return record
+
+
+_upload_service: Optional[UploadService] = None
+_upload_service_lock = threading.Lock()
+
+
+def get_upload_service() -> UploadService:
+    """进程内共享的上传服务（分块上传会话保存在内存中）"""
+    global _upload_service
+    with _upload_service_lock:
+        if _upload_service is None:
+            _upload_service = UploadService()
+        return _upload_service
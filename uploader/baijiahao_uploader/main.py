@@ -10,6 +10,7 @@ import asyncio
 from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
 from utils.base_social_media import set_init_script
 from utils.log import baijiahao_logger
+from utils.waits import pace, wait_visible
 from utils.network import async_retry
 
 
@@ -90,9 +91,9 @@ class BaiJiaHaoVideo(object):
             except:
                 await page.locator('div.select-wrap').nth(0).click()
         # page.locator(f'div.rc-virtual-list-holder-inner >> text={publish_date_day}').click()
-        await page.wait_for_timeout(2000)
+        await pace(2)
         await page.locator(f'div.rc-virtual-list  div.cheetah-select-item >> text={publish_date_day}').click()
-        await page.wait_for_timeout(2000)
+        await pace(2)
 
         # 改为随机点击一个 hour
         for _ in range(3):
@@ -102,14 +103,14 @@ class BaiJiaHaoVideo(object):
                 break
             except:
                 await page.locator('div.select-wrap').nth(1).click()
-        await page.wait_for_timeout(2000)
+        await wait_visible(page, 'div.rc-virtual-list:visible div.cheetah-select-item-option', 5000)
         current_choice_hour = await page.locator('div.rc-virtual-list:visible div.cheetah-select-item-option').count()
-        await page.wait_for_timeout(2000)
+        await pace(2)
         await page.locator('div.rc-virtual-list:visible div.cheetah-select-item-option').nth(
             random.randint(1, current_choice_hour-3)).click()
         # 2024.08.05 current_choice_hour的获取可能有问题，页面有7，这里获取了10，暂时硬编码至6
 
-        await page.wait_for_timeout(2000)
+        await pace(2)
         await page.locator("button >> text=定时发布").click()
 
 
@@ -150,7 +151,7 @@ class BaiJiaHaoVideo(object):
 
         # 填充标题和话题
         # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
+        await pace(1)
         baijiahao_logger.info("正在填充标题和话题...")
         await self.add_title_tags(page)
 
@@ -179,7 +180,7 @@ class BaiJiaHaoVideo(object):
 
         await context.storage_state(path=self.account_file)  # 保存cookie
         baijiahao_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        await pace(2)  # 这里延迟是为了方便眼睛直观的观看
         # 关闭浏览器上下文和浏览器实例
         await context.close()
         await browser.close()
@@ -212,7 +213,7 @@ class BaiJiaHaoVideo(object):
             try:
                 await schedule_element.click()
                 await page.wait_for_selector('div.select-wrap:visible', timeout=3000)
-                await page.wait_for_timeout(timeout=2000)
+                await pace(2)
                 baijiahao_logger.info("开始点击发布定时...")
                 await self.set_schedule_time(page, publish_date)
                 break
@@ -273,7 +274,7 @@ class BaiJiaHaoVideo(object):
 
         # 点击"全网"标签
         await page.locator('div.rounded-lg.border:has-text("全网")').click()
-        await asyncio.sleep(1)  # 这里延迟是为了方便眼睛直观的观看
+        await pace(1)  # 这里延迟是为了方便眼睛直观的观看
 
         # 点击 "上传视频" 按钮
         # await page.locator("div[class^='video-main-container'] input").set_input_files(self.file_path)
@@ -489,13 +490,10 @@ class BaiJiaHaoVideo(object):
 
         print(f"[循环完成] 准备关闭浏览器")
 
-        # 暂停 1000s
-        await asyncio.sleep(1000)  # 这里延迟是为了方便眼睛直观的观看
-
         # 退出前保存 storage 信息
         await context.storage_state(path=self.account_file)  # 保存cookie
         baijiahao_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
+        await pace(2)  # 这里延迟是为了方便眼睛直观的观看
         # 关闭浏览器上下文和浏览器实例
         await context.close()
         await browser.close()
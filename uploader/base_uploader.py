@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+上传器基类
+
+各平台上传流程统一拆成命名步骤，由基类负责浏览器启动/代理/context 创建、按顺序执行步骤、
+记录每个步骤的耗时（StepTimer）和保存 cookie，子类只实现页面操作：
+
+    launch          启动浏览器（或从浏览器池分配）并创建 context（基类实现）
+    navigate        打开发布页面，检查登录状态
+    attach_file     选择视频文件，进入编辑页面
+    fill_meta       填写标题、话题、封面、合集等元数据
+    wait_transcode  等待视频上传/转码完成
+    publish         设置定时、商品、封面等需要视频上传完成后才能操作的选项并点击发布
+    confirm         等待平台确认发布成功（必要时重新点击发布）
+
+fill_meta 默认在 wait_transcode 之前执行，填写元数据与视频上传并行；
+需要先上传完成才能编辑的平台覆盖 STEP_ORDER。
+"""
+from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Dict, Optional
+
+from playwright.async_api import Playwright, async_playwright
+
+from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
+from utils.base_social_media import set_init_script, set_route_filter
+from utils.log import logger
+from utils.waits import StepTimer, pace
+
+STEP_LAUNCH = "launch"
+STEP_NAVIGATE = "navigate"
+STEP_ATTACH_FILE = "attach_file"
+STEP_WAIT_TRANSCODE = "wait_transcode"
+STEP_FILL_META = "fill_meta"
+STEP_PUBLISH = "publish"
+STEP_CONFIRM = "confirm"
+
+UPLOAD_STEPS = (STEP_LAUNCH, STEP_NAVIGATE, STEP_ATTACH_FILE, STEP_WAIT_TRANSCODE, STEP_FILL_META, STEP_PUBLISH, STEP_CONFIRM)
+
+
+class BaseUploader(object):
+    # 平台名（SOCIAL_MEDIA_*），用于请求过滤和步骤耗时统计
+    platform: str = ""
+    # 日志前缀，如 "DouYin"
+    display_name: str = ""
+    # 平台日志（utils.log 中的 *_logger）
+    logger = logger
+    # 页面步骤执行顺序（launch 由基类在步骤之前执行）
+    STEP_ORDER = (STEP_NAVIGATE, STEP_ATTACH_FILE, STEP_FILL_META, STEP_WAIT_TRANSCODE, STEP_PUBLISH, STEP_CONFIRM)
+
+    def __init__(self, title, file_path, tags, publish_date: datetime, account_file, account_id=None):
+        self.title = title  # 视频标题
+        self.file_path = file_path
+        self.tags = tags
+        self.publish_date = publish_date
+        self.account_file = account_file
+        self.account_id = account_id
+        self.local_executable_path = LOCAL_CHROME_PATH or None
+        self.headless = LOCAL_CHROME_HEADLESS
+        self.timer = StepTimer(self.platform or type(self).__name__)
+        self.current_step: Optional[str] = None
+
+    # ---------------------------
+    # 子类实现的页面步骤
+    # ---------------------------
+    async def navigate(self, page):
+        raise NotImplementedError
+
+    async def attach_file(self, page):
+        raise NotImplementedError
+
+    async def fill_meta(self, page):
+        raise NotImplementedError
+
+    async def wait_transcode(self, page):
+        raise NotImplementedError
+
+    async def publish(self, page):
+        raise NotImplementedError
+
+    async def confirm(self, page):
+        raise NotImplementedError
+
+    # ---------------------------
+    # 可覆盖的钩子
+    # ---------------------------
+    def resolve_account_file(self) -> str:
+        """返回 storage_state 使用的 cookie 文件路径"""
+        return str(self.account_file)
+
+    def context_options(self) -> Dict:
+        """new_context 的额外参数（如 viewport）"""
+        return {}
+
+    # ---------------------------
+    # 执行流程
+    # ---------------------------
+    async def upload(self, playwright: Playwright, proxy_config: Dict = None) -> None:
+        """
+        单独启动浏览器上传
+        :param proxy_config: 指定本次使用的代理（如替代代理），为空时使用账号关联的代理
+        """
+        async with AsyncExitStack() as stack:
+            with self._step(STEP_LAUNCH):
+                # 配置了 LOCAL_CHROME_PATH 时使用系统内浏览器（视频号用 chromium 会造成h264错误）
+                launch_options = {"headless": self.headless}
+                if self.local_executable_path:
+                    launch_options["executable_path"] = self.local_executable_path
+                browser = await playwright.chromium.launch(**launch_options)
+                stack.push_async_callback(browser.close)
+                account_file = self.resolve_account_file()
+
+                # 获取代理配置（如果有关联的代理）
+                if proxy_config is None and self.account_id:
+                    from myUtils.proxy_helper import get_proxy_config_dict
+                    proxy_config = get_proxy_config_dict(self.account_id)
+
+                # 创建浏览器上下文配置
+                context_config = {**self.context_options(), "storage_state": account_file}
+                if proxy_config:
+                    context_config["proxy"] = proxy_config
+                    print(f"[{self.display_name} Upload] Using proxy: {proxy_config}")
+
+                # 创建一个浏览器上下文，使用指定的 cookie 文件
+                context = await browser.new_context(**context_config)
+                stack.push_async_callback(context.close)
+                context = await set_init_script(context)
+                context = await set_route_filter(context, self.platform)
+
+            await self._run_steps(context, account_file)
+            await pace(2)  # 这里延迟是为了方便眼睛直观的观看
+
+    async def upload_with_pool(self, browser_pool, proxy_config=None) -> None:
+        """从共享浏览器池获取 context 上传（不单独启动浏览器）"""
+        async with AsyncExitStack() as stack:
+            with self._step(STEP_LAUNCH):
+                account_file = self.resolve_account_file()
+                if proxy_config:
+                    print(f"[{self.display_name} Upload] Using proxy: {proxy_config}")
+                context = await stack.enter_async_context(browser_pool.context(
+                    storage_state=account_file,
+                    proxy=proxy_config,
+                    key=self.account_id,
+                    platform=self.platform,
+                    **self.context_options(),
+                ))
+            await self._run_steps(context, account_file)
+
+    async def main(self):
+        async with async_playwright() as playwright:
+            await self.upload(playwright)
+
+    async def _run_steps(self, context, account_file: str) -> None:
+        """在已创建的浏览器上下文中按顺序执行页面步骤，完成后保存 cookie"""
+        page = await context.new_page()
+        self.logger.info(f'[+]正在上传-------{self.title}.mp4')
+        for name in self.STEP_ORDER:
+            with self._step(name):
+                await getattr(self, name)(page)
+        self.current_step = None
+
+        await context.storage_state(path=account_file)  # 保存cookie
+        self.logger.success('  [-]cookie更新完毕！')
+        self.logger.info(self.timer.format())
+
+    def _step(self, name: str):
+        # 出错时 current_step 停留在失败的步骤
+        self.current_step = name
+        return self.timer.step(name)
+
+    def step_report(self) -> Dict:
+        """
+        步骤耗时报告
+        :returns: {'name', 'pacing', 'total', 'steps': {step: 秒}, 'failed_step'}
+        """
+        # steps 使用未取整的耗时，便于按毫秒入库
+        return {**self.timer.report(), 'steps': dict(self.timer.steps), 'failed_step': self.current_step}
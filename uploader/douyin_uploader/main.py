@@ -2,13 +2,15 @@
 from datetime import datetime
 from pathlib import Path
 
-from playwright.async_api import Playwright, async_playwright, Page
+from playwright.async_api import async_playwright, Page
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from uploader.base_uploader import BaseUploader
+from utils.base_social_media import SOCIAL_MEDIA_DOUYIN, set_init_script
 from utils.log import douyin_logger
+from utils.waits import pace, wait_for_any, wait_visible
 
 
 async def cookie_auth(account_file):
@@ -64,17 +66,14 @@ async def douyin_cookie_gen(account_file):
         await context.storage_state(path=account_file)
 
 
-class DouYinVideo(object):
+class DouYinVideo(BaseUploader):
+    platform = SOCIAL_MEDIA_DOUYIN
+    display_name = "DouYin"
+    logger = douyin_logger
+
     def __init__(self, title, file_path, tags, publish_date: datetime, account_file, thumbnail_path=None, productLink='', productTitle='', account_id=None):
-        self.title = title  # 视频标题
-        self.file_path = file_path
-        self.tags = tags
-        self.publish_date = publish_date
-        self.account_file = account_file
-        self.account_id = account_id
+        super().__init__(title, file_path, tags, publish_date, account_file, account_id=account_id)
         self.date_format = '%Y年%m月%d日 %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
         self.thumbnail_path = thumbnail_path
         self.productLink = productLink
         self.productTitle = productTitle
@@ -84,66 +83,35 @@ class DouYinVideo(object):
         label_element = page.locator("[class^='radio']:has-text('定时发布')")
         # 在选中的 label 元素下点击 checkbox
         await label_element.click()
-        await asyncio.sleep(1)
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M")
 
-        await asyncio.sleep(1)
+        await wait_visible(page, '.semi-input[placeholder="日期和时间"]', timeout=5000)
         await page.locator('.semi-input[placeholder="日期和时间"]').click()
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
 
-        await asyncio.sleep(1)
+        await pace(1)
 
     async def handle_upload_error(self, page):
         douyin_logger.info('视频出错了，重新上传中')
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
-        else:
-            browser = await playwright.chromium.launch(headless=self.headless)
-
+    def resolve_account_file(self) -> str:
         # 确保 account_file 是绝对路径字符串
         account_file_path = str(Path(self.account_file).resolve())
 
         # 检查文件是否存在
         if not Path(account_file_path).exists():
             douyin_logger.error(f'[!] Cookie 文件不存在: {account_file_path}')
-            await browser.close()
             raise FileNotFoundError(f'Cookie 文件不存在: {account_file_path}')
 
         douyin_logger.info(f'[+] 使用 Cookie 文件: {account_file_path}')
+        return account_file_path
 
-        # 获取代理配置（如果有关联的代理）
-        proxy_config = None
-        if self.account_id:
-            from myUtils.proxy_helper import get_proxy_config_dict
-            proxy_config = get_proxy_config_dict(self.account_id)
-
-        # 创建浏览器上下文配置
-        context_config = {"storage_state": account_file_path}
-        if proxy_config:
-            context_config["proxy"] = proxy_config
-            print(f"[DouYin Upload] Using proxy: {proxy_config}")
-
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        try:
-            context = await browser.new_context(**context_config)
-        except Exception as e:
-            douyin_logger.error(f'[!] 加载 Cookie 文件失败: {e}')
-            await browser.close()
-            raise
-        context = await set_init_script(context)
-
-        # 创建一个新的页面
-        page = await context.new_page()
+    async def navigate(self, page):
         # 🔍 在这里添加 pause 来调试 cookie 加载
         # await page.pause()  # 会打开 Playwright Inspector
-
-        douyin_logger.info(f'[+]正在上传-------{self.title}.mp4')
         douyin_logger.info(f'[-] 正在打开主页...')
         
         # 导航到目标 URL
@@ -165,7 +133,8 @@ class DouYinVideo(object):
         
         # 检查是否出现登录提示
         try:
-            await asyncio.sleep(1)  # 等待页面渲染
+            # 等待登录提示或上传按钮渲染出来
+            await wait_for_any(page, ['text=手机号登录', 'text=扫码登录', 'text=上传视频'], timeout=5000)
             if await page.get_by_text('手机号登录').count() > 0 or await page.get_by_text('扫码登录').count() > 0:
                 douyin_logger.error('[!] 检测到登录页面，Cookie 已失效')
                 await page.screenshot(path="debug_login_detected.png", full_page=True)
@@ -181,8 +150,9 @@ class DouYinVideo(object):
         except Exception as e:
             douyin_logger.warning(f'[!] 等待 networkidle 超时，继续执行: {e}')
         
-        await asyncio.sleep(1)  # 额外等待确保页面渲染完成
-        
+        await pace(1)  # 额外等待确保页面渲染完成
+
+    async def attach_file(self, page):
         # 尝试多种方式上传文件
         upload_success = False
         
@@ -290,10 +260,12 @@ class DouYinVideo(object):
                 except:
                     print("  [-] 超时未进入视频发布页面，重新尝试...")
                     await asyncio.sleep(0.5)  # 等待 0.5 秒后重新尝试
+
+    async def fill_meta(self, page):
         # 填充标题和话题
         # 检查是否存在包含输入框的元素
         # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
+        await wait_visible(page, 'text=作品标题', timeout=5000)
         douyin_logger.info(f'  [-] 正在填充标题和话题...')
         title_container = page.get_by_text('作品标题').locator("..").locator("xpath=following-sibling::div[1]").locator("input")
         if await title_container.count():
@@ -311,25 +283,23 @@ class DouYinVideo(object):
             await page.type(css_selector, "#" + tag)
             await page.press(css_selector, "Space")
         douyin_logger.info(f'总共添加{len(self.tags)}个话题')
+
+    async def wait_transcode(self, page):
         while True:
-            # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
-            try:
-                #  新版：定位重新上传
-                number = await page.locator('[class^="long-card"] div:has-text("重新上传")').count()
-                if number > 0:
-                    douyin_logger.success("  [-]视频上传完毕")
-                    break
-                else:
-                    douyin_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-
-                    if await page.locator('div.progress-div > div:has-text("上传失败")').count():
-                        douyin_logger.error("  [-] 发现上传出错了... 准备重试")
-                        await self.handle_upload_error(page)
-            except:
-                douyin_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+            # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待（出现后立即返回）
+            state = await wait_for_any(page, {
+                'done': '[class^="long-card"] div:has-text("重新上传")',  # 新版：定位重新上传
+                'failed': 'div.progress-div > div:has-text("上传失败")',
+            }, timeout=2000, state='attached')
+            if state == 'done':
+                douyin_logger.success("  [-]视频上传完毕")
+                break
+            douyin_logger.info("  [-] 正在上传视频中...")
+            if state == 'failed':
+                douyin_logger.error("  [-] 发现上传出错了... 准备重试")
+                await self.handle_upload_error(page)
 
+    async def publish(self, page):
         if self.productLink and self.productTitle:
             douyin_logger.info(f'  [-] 正在设置商品链接...')
             await self.set_product_link(page, self.productLink, self.productTitle)
@@ -353,13 +323,12 @@ class DouYinVideo(object):
         if self.publish_date != 0:
             await self.set_schedule_time_douyin(page, self.publish_date)
 
+        await self.click_publish(page)
+
+    async def confirm(self, page):
         # 判断视频是否发布成功
         while True:
-            # 判断视频是否发布成功
             try:
-                publish_button = page.get_by_role('button', name="发布", exact=True)
-                if await publish_button.count():
-                    await publish_button.click()
                 await page.wait_for_url("https://creator.douyin.com/creator-micro/content/manage**",
                                         timeout=3000)  # 如果自动跳转到作品页面，则代表发布成功
                 douyin_logger.success("  [-]视频发布成功")
@@ -370,13 +339,12 @@ class DouYinVideo(object):
                 douyin_logger.info("  [-] 视频正在发布中...")
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(0.5)
+                await self.click_publish(page)
 
-        await context.storage_state(path=account_file_path)  # 保存cookie
-        douyin_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+    async def click_publish(self, page):
+        publish_button = page.get_by_role('button', name="发布", exact=True)
+        if await publish_button.count():
+            await publish_button.click()
 
     async def handle_auto_video_cover(self, page):
         """
@@ -395,17 +363,16 @@ class DouYinVideo(object):
                 print("  [-] 正在选择第一个推荐封面...")
                 try:
                     await recommend_cover.click()
-                    await asyncio.sleep(1)  # 等待选中生效
 
                     # 3. 处理可能的确认弹窗 "是否确认应用此封面？"
                     # 并不一定每次都会出现，健壮性判断：如果出现弹窗，则点击确定
                     confirm_text = "是否确认应用此封面？"
-                    if await page.get_by_text(confirm_text).first.is_visible():
+                    if await wait_visible(page, f'text={confirm_text}', timeout=1000):
                         print(f"  [-] 检测到确认弹窗: {confirm_text}")
                         # 直接点击"确定"按钮，不依赖脆弱的 CSS 类名
                         await page.get_by_role("button", name="确定").click()
                         print("  [-] 已点击确认应用封面")
-                        await asyncio.sleep(1)
+                        await wait_visible(page, f'text={confirm_text}', timeout=3000, state='hidden')
 
                     # 4. 等待封面效果检测通过
                     print("  [-] 等待封面效果检测...")
@@ -431,8 +398,8 @@ class DouYinVideo(object):
             await page.click('text="选择封面"')
             await page.wait_for_selector("div.dy-creator-content-modal")
             await page.click('text="设置竖封面"')
-            await page.wait_for_timeout(2000)  # 等待2秒
             # 定位到上传区域并点击
+            await wait_visible(page, "div[class^='semi-upload upload'] >> input.semi-upload-hidden-input", state='attached')
             await page.locator("div[class^='semi-upload upload'] >> input.semi-upload-hidden-input").set_input_files(thumbnail_path)
             await page.wait_for_timeout(2000)  # 等待2秒
             await page.locator("div#tooltip-container button:visible:has-text('完成')").click()
@@ -471,7 +438,6 @@ class DouYinVideo(object):
     async def handle_product_dialog(self, page: Page, product_title: str):
         """处理商品编辑弹窗"""
 
-        await page.wait_for_timeout(2000)
         await page.wait_for_selector('input[placeholder="请输入商品短标题"]', timeout=10000)
         short_title_input = page.locator('input[placeholder="请输入商品短标题"]')
         if not await short_title_input.count():
@@ -506,7 +472,6 @@ class DouYinVideo(object):
         
     async def set_product_link(self, page: Page, product_link: str, product_title: str):
         """设置商品链接功能"""
-        await page.wait_for_timeout(2000)  # 等待2秒
         try:
             # 定位"添加标签"文本，然后向上导航到容器，再找到下拉框
             await page.wait_for_selector('text=添加标签', timeout=10000)
@@ -539,10 +504,12 @@ class DouYinVideo(object):
                 return False
             await add_button.click()
             douyin_logger.debug("[+] 成功点击'添加链接'按钮")
-            ## 如果链接不可用
-            await page.wait_for_timeout(2000)
-            error_modal = page.locator('text=未搜索到对应商品')
-            if await error_modal.count():
+            ## 如果链接不可用（等待错误提示或商品编辑弹窗出现）
+            state = await wait_for_any(page, {
+                'error': 'text=未搜索到对应商品',
+                'dialog': 'input[placeholder="请输入商品短标题"]',
+            }, timeout=5000)
+            if state == 'error':
                 confirm_button = page.locator('button:has-text("确定")')
                 await confirm_button.click()
                 # await page.wait_for_selector('.semi-modal-content', state='hidden', timeout=5000)
@@ -559,9 +526,3 @@ class DouYinVideo(object):
         except Exception as e:
             douyin_logger.error(f"[-] 设置商品链接时出错: {str(e)}")
             return False
-
-    async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
-
-
@@ -1,14 +1,16 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import async_playwright
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from uploader.base_uploader import BaseUploader
+from utils.base_social_media import SOCIAL_MEDIA_KUAISHOU, set_init_script
 from utils.files_times import get_absolute_path
 from utils.log import kuaishou_logger
+from utils.waits import pace, wait_visible
 
 
 async def cookie_auth(account_file):
@@ -61,58 +63,27 @@ async def get_ks_cookie(account_file):
         await context.storage_state(path=account_file)
 
 
-class KSVideo(object):
+class KSVideo(BaseUploader):
+    platform = SOCIAL_MEDIA_KUAISHOU
+    display_name = "Kuaishou"
+    logger = kuaishou_logger
+
     def __init__(self, title, file_path, tags, publish_date: datetime, account_file, account_id=None):
-        self.title = title  # 视频标题
-        self.file_path = file_path
-        self.tags = tags
-        self.publish_date = publish_date
-        self.account_file = account_file
-        self.account_id = account_id
+        super().__init__(title, file_path, tags, publish_date, account_file, account_id=account_id)
         self.date_format = '%Y-%m-%d %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
 
     async def handle_upload_error(self, page):
         kuaishou_logger.error("视频出错了，重新上传中")
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        print(self.local_executable_path)
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=self.local_executable_path,
-            )
-        else:
-            browser = await playwright.chromium.launch(
-                headless=self.headless
-            )
-
-        # 获取代理配置（如果有关联的代理）
-        proxy_config = None
-        if self.account_id:
-            from myUtils.proxy_helper import get_proxy_config_dict
-            proxy_config = get_proxy_config_dict(self.account_id)
-
-        # 创建浏览器上下文配置
-        context_config = {"storage_state": f"{self.account_file}"}
-        if proxy_config:
-            context_config["proxy"] = proxy_config
-            print(f"[Kuaishou Upload] Using proxy: {proxy_config}")
-
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(**context_config)
-        context = await set_init_script(context)
-        # 创建一个新的页面
-        page = await context.new_page()
+    async def navigate(self, page):
         # 访问指定的 URL
         await page.goto("https://cp.kuaishou.com/article/publish/video")
-        kuaishou_logger.info('正在上传-------{}.mp4'.format(self.title))
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         kuaishou_logger.info('正在打开主页...')
         await page.wait_for_url("https://cp.kuaishou.com/article/publish/video")
+
+    async def attach_file(self, page):
         # 点击 "上传视频" 按钮
         upload_button = page.locator("button[class^='_upload-btn']")
         await upload_button.wait_for(state='visible')  # 确保按钮可见
@@ -122,18 +93,18 @@ class KSVideo(object):
         file_chooser = await fc_info.value
         await file_chooser.set_files(self.file_path)
 
-        await asyncio.sleep(2)
-
         # if not await page.get_by_text("封面编辑").count():
         #     raise Exception("似乎没有跳转到到编辑页面")
 
-        await asyncio.sleep(1)
+        # 等待进入编辑页面
+        await wait_visible(page, 'text=描述', timeout=10000)
 
-        # 等待按钮可交互
+        # 等待按钮可交互（新功能提示不一定出现）
         new_feature_button = page.locator('button[type="button"] span:text("我知道了")')
-        if await new_feature_button.count() > 0:
+        if await wait_visible(page, 'button[type="button"] span:text("我知道了")', timeout=1500):
             await new_feature_button.click()
 
+    async def fill_meta(self, page):
         kuaishou_logger.info("正在填充标题和话题...")
         await page.get_by_text("描述").locator("xpath=following-sibling::div").click()
         kuaishou_logger.info("clear existing title")
@@ -148,47 +119,28 @@ class KSVideo(object):
         for index, tag in enumerate(self.tags[:3], start=1):
             kuaishou_logger.info("正在添加第%s个话题" % index)
             await page.keyboard.type(f"#{tag} ")
-            await asyncio.sleep(2)
-
-        max_retries = 60  # 设置最大重试次数,最大等待时间为 2 分钟
-        retry_count = 0
+            await pace(2)
 
-        while retry_count < max_retries:
-            try:
-                # 获取包含 '上传中' 文本的元素数量
-                number = await page.locator("text=上传中").count()
-
-                if number == 0:
-                    kuaishou_logger.success("视频上传完毕")
-                    break
-                else:
-                    if retry_count % 5 == 0:
-                        kuaishou_logger.info("正在上传视频中...")
-                    await asyncio.sleep(2)
-            except Exception as e:
-                kuaishou_logger.error(f"检查上传状态时发生错误: {e}")
-                await asyncio.sleep(2)  # 等待 2 秒后重试
-            retry_count += 1
-
-        if retry_count == max_retries:
+    async def wait_transcode(self, page):
+        # 等待 '上传中' 提示消失，最大等待时间为 2 分钟（每 10 秒输出一次进度）
+        for _ in range(12):
+            if await wait_visible(page, "text=上传中", timeout=10000, state='detached'):
+                kuaishou_logger.success("视频上传完毕")
+                break
+            kuaishou_logger.info("正在上传视频中...")
+        else:
             kuaishou_logger.warning("超过最大重试次数，视频上传可能未完成。")
 
+    async def publish(self, page):
         # 定时任务
         if self.publish_date != 0:
             await self.set_schedule_time(page, self.publish_date)
+        await self.click_publish(page)
 
+    async def confirm(self, page):
         # 判断视频是否发布成功
         while True:
             try:
-                publish_button = page.get_by_text("发布", exact=True)
-                if await publish_button.count() > 0:
-                    await publish_button.click()
-
-                await asyncio.sleep(1)
-                confirm_button = page.get_by_text("确认发布")
-                if await confirm_button.count() > 0:
-                    await confirm_button.click()
-
                 # 等待页面跳转，确认发布成功
                 await page.wait_for_url(
                     "https://cp.kuaishou.com/article/manage/video?status=2&from=publish",
@@ -200,29 +152,28 @@ class KSVideo(object):
                 kuaishou_logger.info(f"视频正在发布中... 错误: {e}")
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(1)
+                await self.click_publish(page)
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        kuaishou_logger.info('cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+    async def click_publish(self, page):
+        publish_button = page.get_by_text("发布", exact=True)
+        if await publish_button.count() > 0:
+            await publish_button.click()
 
-    async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
+        confirm_button = page.get_by_text("确认发布")
+        if await wait_visible(page, 'text=确认发布', timeout=1000):
+            await confirm_button.click()
 
     async def set_schedule_time(self, page, publish_date):
         kuaishou_logger.info("click schedule")
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M:%S")
         await page.locator("label:text('发布时间')").locator('xpath=following-sibling::div').locator(
             '.ant-radio-input').nth(1).click()
-        await asyncio.sleep(1)
+        await wait_visible(page, 'div.ant-picker-input input[placeholder="选择日期时间"]', timeout=5000)
 
         await page.locator('div.ant-picker-input input[placeholder="选择日期时间"]').click()
-        await asyncio.sleep(1)
+        await pace(1)
 
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
-        await asyncio.sleep(1)
+        await pace(1)
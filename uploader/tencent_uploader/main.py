@@ -1,14 +1,16 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright
+from playwright.async_api import async_playwright
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from uploader.base_uploader import BaseUploader
+from utils.base_social_media import SOCIAL_MEDIA_TENCENT, set_init_script
 from utils.files_times import get_absolute_path
 from utils.log import tencent_logger
+from utils.waits import wait_for_any
 
 
 def format_str_for_short_title(origin_title: str) -> str:
@@ -81,18 +83,15 @@ async def weixin_setup(account_file, handle=False):
     return True
 
 
-class TencentVideo(object):
+class TencentVideo(BaseUploader):
+    platform = SOCIAL_MEDIA_TENCENT
+    display_name = "Tencent"
+    logger = tencent_logger
+
     def __init__(self, title, file_path, tags, publish_date: datetime, account_file, category=None, is_draft=False, account_id=None):
-        self.title = title  # 视频标题
-        self.file_path = file_path
-        self.tags = tags
-        self.publish_date = publish_date
-        self.account_file = account_file
-        self.account_id = account_id
+        super().__init__(title, file_path, tags, publish_date, account_file, account_id=account_id)
         self.category = category
-        self.headless = LOCAL_CHROME_HEADLESS
         self.is_draft = is_draft  # 是否保存为草稿
-        self.local_executable_path = LOCAL_CHROME_PATH or None
 
     async def set_schedule_time_tencent(self, page, publish_date):
         label_element = page.locator("label").filter(has_text="定时").nth(1)
@@ -136,36 +135,18 @@ class TencentVideo(object):
         file_input = page.locator('input[type="file"]')
         await file_input.set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium (这里使用系统内浏览器，用chromium 会造成h264错误
-        browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
-
-        # 获取代理配置（如果有关联的代理）
-        proxy_config = None
-        if self.account_id:
-            from myUtils.proxy_helper import get_proxy_config_dict
-            proxy_config = get_proxy_config_dict(self.account_id)
-
-        # 创建浏览器上下文配置
-        context_config = {"storage_state": f"{self.account_file}"}
-        if proxy_config:
-            context_config["proxy"] = proxy_config
-            print(f"[Tencent Upload] Using proxy: {proxy_config}")
-
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(**context_config)
-        context = await set_init_script(context)
-
-        # 创建一个新的页面
-        page = await context.new_page()
+    async def navigate(self, page):
         # 访问指定的 URL
         await page.goto("https://channels.weixin.qq.com/platform/post/create")
-        tencent_logger.info(f'[+]正在上传-------{self.title}.mp4')
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         await page.wait_for_url("https://channels.weixin.qq.com/platform/post/create")
+
+    async def attach_file(self, page):
         # await page.wait_for_selector('input[type="file"]', timeout=10000)
         file_input = page.locator('input[type="file"]')
         await file_input.set_input_files(self.file_path)
+
+    async def fill_meta(self, page):
         # 填充标题和话题
         await self.add_title_tags(page)
         # 添加商品
@@ -174,21 +155,17 @@ class TencentVideo(object):
         await self.add_collection(page)
         # 原创选择
         await self.add_original(page)
+
+    async def wait_transcode(self, page):
         # 检测上传状态
         await self.detect_upload_status(page)
+
+    async def publish(self, page):
         if self.publish_date != 0:
             await self.set_schedule_time_tencent(page, self.publish_date)
         # 添加短标题
         await self.add_short_title(page)
-
-        await self.click_publish(page)
-
-        await context.storage_state(path=f"{self.account_file}")  # 保存cookie
-        tencent_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+        await self.click_publish_button(page)
 
     async def add_short_title(self, page):
         short_title_element = page.get_by_text("短标题", exact=True).locator("..").locator(
@@ -198,22 +175,14 @@ class TencentVideo(object):
             short_title = format_str_for_short_title(self.title)
             await short_title_element.fill(short_title)
 
-    async def click_publish(self, page):
+    async def confirm(self, page):
         while True:
             try:
                 if self.is_draft:
-                    # 点击"保存草稿"按钮
-                    draft_button = page.locator('div.form-btns button:has-text("保存草稿")')
-                    if await draft_button.count():
-                        await draft_button.click()
                     # 等待跳转到草稿箱页面或确认保存成功
                     await page.wait_for_url("**/post/list**", timeout=5000)  # 使用通配符匹配包含post/list的URL
                     tencent_logger.success("  [-]视频草稿保存成功")
                 else:
-                    # 点击"发表"按钮
-                    publish_button = page.locator('div.form-btns button:has-text("发表")')
-                    if await publish_button.count():
-                        await publish_button.click()
                     await page.wait_for_url("https://channels.weixin.qq.com/platform/post/list", timeout=5000)
                     tencent_logger.success("  [-]视频发布成功")
                 break
@@ -232,27 +201,34 @@ class TencentVideo(object):
                 tencent_logger.exception(f"  [-] Exception: {e}")
                 tencent_logger.info("  [-] 视频正在发布中...")
                 await asyncio.sleep(0.5)
+                await self.click_publish_button(page)
+
+    async def click_publish_button(self, page):
+        if self.is_draft:
+            # 点击"保存草稿"按钮
+            button = page.locator('div.form-btns button:has-text("保存草稿")')
+        else:
+            # 点击"发表"按钮
+            button = page.locator('div.form-btns button:has-text("发表")')
+        if await button.count():
+            await button.click()
 
     async def detect_upload_status(self, page):
         while True:
-            # 匹配删除按钮，代表视频上传完毕，如果不存在，代表视频正在上传，则等待
-            try:
-                # 匹配删除按钮，代表视频上传完毕
-                if "weui-desktop-btn_disabled" not in await page.get_by_role("button", name="发表").get_attribute(
-                        'class'):
-                    tencent_logger.info("  [-]视频上传完毕")
-                    break
-                else:
-                    tencent_logger.info("  [-] 正在上传视频中...")
-                    await asyncio.sleep(2)
-                    # 出错了视频出错
-                    if await page.locator('div.status-msg.error').count() and await page.locator(
-                            'div.media-status-content div.tag-inner:has-text("删除")').count():
-                        tencent_logger.error("  [-] 发现上传出错了...准备重试")
-                        await self.handle_upload_error(page)
-            except:
-                tencent_logger.info("  [-] 正在上传视频中...")
-                await asyncio.sleep(2)
+            # "发表"按钮可用代表视频上传完毕，否则视频正在上传，则等待（按钮可用后立即返回）
+            state = await wait_for_any(page, {
+                'done': 'div.form-btns button:has-text("发表"):not(.weui-desktop-btn_disabled)',
+                'failed': 'div.status-msg.error',
+            }, timeout=2000, state='attached')
+            if state == 'done':
+                tencent_logger.info("  [-]视频上传完毕")
+                break
+            tencent_logger.info("  [-] 正在上传视频中...")
+            # 出错了视频出错
+            if state == 'failed' and await page.locator(
+                    'div.media-status-content div.tag-inner:has-text("删除")').count():
+                tencent_logger.error("  [-] 发现上传出错了...准备重试")
+                await self.handle_upload_error(page)
 
     async def add_title_tags(self, page):
         await page.locator("div.input-editor").click()
@@ -293,7 +269,3 @@ class TencentVideo(object):
                 await page.wait_for_timeout(1000)
             if await page.locator('button:has-text("声明原创"):visible').count():
                 await page.locator('button:has-text("声明原创"):visible').click()
-
-    async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
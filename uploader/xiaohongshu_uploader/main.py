@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from playwright.async_api import Playwright, async_playwright, Page
+from playwright.async_api import async_playwright, Page
 import os
 import asyncio
 
-from conf import LOCAL_CHROME_PATH, LOCAL_CHROME_HEADLESS
-from utils.base_social_media import set_init_script
+from conf import LOCAL_CHROME_HEADLESS
+from uploader.base_uploader import (
+    BaseUploader, STEP_ATTACH_FILE, STEP_CONFIRM, STEP_FILL_META, STEP_NAVIGATE, STEP_PUBLISH, STEP_WAIT_TRANSCODE,
+)
+from utils.base_social_media import SOCIAL_MEDIA_XIAOHONGSHU, set_init_script
 from utils.log import xiaohongshu_logger
+from utils.waits import pace, wait_visible
 
 
 async def cookie_auth(account_file):
@@ -63,18 +67,21 @@ async def xiaohongshu_cookie_gen(account_file):
         await context.storage_state(path=account_file)
 
 
-class XiaoHongShuVideo(object):
+class XiaoHongShuVideo(BaseUploader):
+    platform = SOCIAL_MEDIA_XIAOHONGSHU
+    display_name = "XiaoHongShu"
+    logger = xiaohongshu_logger
+    # 上传成功后才出现标题编辑区域
+    STEP_ORDER = (STEP_NAVIGATE, STEP_ATTACH_FILE, STEP_WAIT_TRANSCODE, STEP_FILL_META, STEP_PUBLISH, STEP_CONFIRM)
+
     def __init__(self, title, file_path, tags, publish_date: datetime, account_file, thumbnail_path=None, account_id=None):
-        self.title = title  # 视频标题
-        self.file_path = file_path
-        self.tags = tags
-        self.publish_date = publish_date
-        self.account_file = account_file
-        self.account_id = account_id
+        super().__init__(title, file_path, tags, publish_date, account_file, account_id=account_id)
         self.date_format = '%Y年%m月%d日 %H:%M'
-        self.local_executable_path = LOCAL_CHROME_PATH
-        self.headless = LOCAL_CHROME_HEADLESS
         self.thumbnail_path = thumbnail_path
+        self.viewport = {"width": 1600, "height": 900}
+
+    def context_options(self):
+        return {"viewport": self.viewport}
 
     async def set_schedule_time_xiaohongshu(self, page, publish_date):
         print("  [-] 正在设置定时发布时间...")
@@ -91,59 +98,34 @@ class XiaoHongShuVideo(object):
         label_element = page.locator("label:has-text('定时发布')")
         # # 在选中的 label 元素下点击 checkbox
         await label_element.click()
-        await asyncio.sleep(1)
         publish_date_hour = publish_date.strftime("%Y-%m-%d %H:%M")
         print(f"publish_date_hour: {publish_date_hour}")
 
-        await asyncio.sleep(1)
+        # 等待时间输入框出现，代替固定等待
+        await wait_visible(page, '.el-input__inner[placeholder="选择日期和时间"]', 5000)
         await page.locator('.el-input__inner[placeholder="选择日期和时间"]').click()
         await page.keyboard.press("Control+KeyA")
         await page.keyboard.type(str(publish_date_hour))
         await page.keyboard.press("Enter")
 
-        await asyncio.sleep(1)
+        await pace(1)
 
     async def handle_upload_error(self, page):
         xiaohongshu_logger.info('视频出错了，重新上传中')
         await page.locator('div.progress-div [class^="upload-btn-input"]').set_input_files(self.file_path)
 
-    async def upload(self, playwright: Playwright) -> None:
-        # 使用 Chromium 浏览器启动一个浏览器实例
-        if self.local_executable_path:
-            browser = await playwright.chromium.launch(headless=self.headless, executable_path=self.local_executable_path)
-        else:
-            browser = await playwright.chromium.launch(headless=self.headless)
-
-        # 获取代理配置（如果有关联的代理）
-        proxy_config = None
-        if self.account_id:
-            from myUtils.proxy_helper import get_proxy_config_dict
-            proxy_config = get_proxy_config_dict(self.account_id)
-
-        # 创建浏览器上下文配置
-        context_config = {
-            "viewport": {"width": 1600, "height": 900},
-            "storage_state": f"{self.account_file}"
-        }
-        if proxy_config:
-            context_config["proxy"] = proxy_config
-            print(f"[XiaoHongShu Upload] Using proxy: {proxy_config}")
-
-        # 创建一个浏览器上下文，使用指定的 cookie 文件
-        context = await browser.new_context(**context_config)
-        context = await set_init_script(context)
-
-        # 创建一个新的页面
-        page = await context.new_page()
+    async def navigate(self, page):
         # 访问指定的 URL
         await page.goto("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
-        xiaohongshu_logger.info(f'[+]正在上传-------{self.title}.mp4')
         # 等待页面跳转到指定的 URL，没进入，则自动等待到超时
         xiaohongshu_logger.info(f'[-] 正在打开主页...')
         await page.wait_for_url("https://creator.xiaohongshu.com/publish/publish?from=homepage&target=video")
+
+    async def attach_file(self, page):
         # 点击 "上传视频" 按钮
         await page.locator("div[class^='upload-content'] input[class='upload-input']").set_input_files(self.file_path)
 
+    async def wait_transcode(self, page):
         # 等待页面跳转到指定的 URL 2025.01.08修改在原有基础上兼容两种页面
         while True:
             try:
@@ -173,10 +155,11 @@ class XiaoHongShuVideo(object):
                 print(f"  [-] 检测过程出错: {str(e)}，重新尝试...")
                 await asyncio.sleep(0.5)  # 等待0.5秒后重新尝试
 
+    async def fill_meta(self, page):
         # 填充标题和话题
         # 检查是否存在包含输入框的元素
         # 这里为了避免页面变化，故使用相对位置定位：作品标题父级右侧第一个元素的input子元素
-        await asyncio.sleep(1)
+        await wait_visible(page, 'div.plugin.title-container, .notranslate', 5000)
         xiaohongshu_logger.info(f'  [-] 正在填充标题和话题...')
         title_container = page.locator('div.plugin.title-container').locator('input.d-text')
         if await title_container.count():
@@ -195,6 +178,7 @@ class XiaoHongShuVideo(object):
             await page.press(css_selector, "Space")
         xiaohongshu_logger.info(f'总共添加{len(self.tags)}个话题')
 
+    async def publish(self, page):
         # while True:
         #     # 判断重新上传按钮是否存在，如果不存在，代表视频正在上传，则等待
         #     try:
@@ -231,14 +215,12 @@ class XiaoHongShuVideo(object):
         if self.publish_date != 0:
             await self.set_schedule_time_xiaohongshu(page, self.publish_date)
 
+        await self.click_publish(page)
+
+    async def confirm(self, page):
         # 判断视频是否发布成功
         while True:
             try:
-                # 等待包含"定时发布"文本的button元素出现并点击
-                if self.publish_date != 0:
-                    await page.locator('button:has-text("定时发布")').click()
-                else:
-                    await page.locator('button:has-text("发布")').click()
                 await page.wait_for_url(
                     "https://creator.xiaohongshu.com/publish/success?**",
                     timeout=3000
@@ -249,23 +231,28 @@ class XiaoHongShuVideo(object):
                 xiaohongshu_logger.info("  [-] 视频正在发布中...")
                 await page.screenshot(full_page=True)
                 await asyncio.sleep(0.5)
+                await self.click_publish(page)
 
-        await context.storage_state(path=self.account_file)  # 保存cookie
-        xiaohongshu_logger.success('  [-]cookie更新完毕！')
-        await asyncio.sleep(2)  # 这里延迟是为了方便眼睛直观的观看
-        # 关闭浏览器上下文和浏览器实例
-        await context.close()
-        await browser.close()
+    async def click_publish(self, page):
+        try:
+            # 等待包含"定时发布"文本的button元素出现并点击
+            if self.publish_date != 0:
+                await page.locator('button:has-text("定时发布")').click()
+            else:
+                await page.locator('button:has-text("发布")').click()
+        except Exception as e:
+            xiaohongshu_logger.info(f"  [-] 点击发布按钮失败: {e}")
     
     async def set_thumbnail(self, page: Page, thumbnail_path: str):
         if thumbnail_path:
             await page.click('text="选择封面"')
             await page.wait_for_selector("div.semi-modal-content:visible")
             await page.click('text="设置竖封面"')
-            await page.wait_for_timeout(2000)  # 等待2秒
             # 定位到上传区域并点击
-            await page.locator("div[class^='semi-upload upload'] >> input.semi-upload-hidden-input").set_input_files(thumbnail_path)
-            await page.wait_for_timeout(2000)  # 等待2秒
+            upload_input = "div[class^='semi-upload upload'] >> input.semi-upload-hidden-input"
+            await wait_visible(page, upload_input, 5000, state='attached')
+            await page.locator(upload_input).set_input_files(thumbnail_path)
+            await wait_visible(page, "div[class^='extractFooter'] button:visible:has-text('完成')", 5000)
             await page.locator("div[class^='extractFooter'] button:visible:has-text('完成')").click()
             # finish_confirm_element = page.locator("div[class^='confirmBtn'] >> div:has-text('完成')")
             # if await finish_confirm_element.count():
@@ -291,7 +278,6 @@ class XiaoHongShuVideo(object):
         # 等待下拉列表加载
         print("等待下拉列表加载...")
         dropdown_selector = 'div.d-popover.d-popover-default.d-dropdown.--size-min-width-large'
-        await page.wait_for_timeout(3000)
         try:
             await page.wait_for_selector(dropdown_selector, timeout=3000)
             print("下拉列表已加载")
@@ -374,9 +360,3 @@ class XiaoHongShuVideo(object):
             # 截图保存（取消注释使用）
             # await page.screenshot(path=f"location_error_{location}.png")
             return False
-
-    async def main(self):
-        async with async_playwright() as playwright:
-            await self.upload(playwright)
-
-
@@ -1,5 +1,8 @@
+import os
+import threading
 from pathlib import Path
-from typing import List
+from typing import Dict, List
+from urllib.parse import urlsplit
 
 from conf import BASE_DIR
 
@@ -8,6 +11,7 @@ SOCIAL_MEDIA_TENCENT = "tencent"
 SOCIAL_MEDIA_TIKTOK = "tiktok"
 SOCIAL_MEDIA_BILIBILI = "bilibili"
 SOCIAL_MEDIA_KUAISHOU = "kuaishou"
+SOCIAL_MEDIA_XIAOHONGSHU = "xiaohongshu"
 
 
 def get_supported_social_media() -> List[str]:
@@ -22,3 +26,101 @@ async def set_init_script(context):
     stealth_js_path = Path(BASE_DIR / "utils/stealth.min.js")
     await context.add_init_script(path=stealth_js_path)
     return context
+
+
+# ---------------------------
+# 上传页面请求过滤
+# 上传只需要页面脚本和接口，图片/视频预览/字体以及第三方统计脚本都不影响发布流程，
+# 拦截后减少代理流量、页面更快可交互。
+#
+#     UPLOAD_ROUTE_FILTER               是否启用（默认1）
+#     UPLOAD_BLOCK_RESOURCE_TYPES       拦截的资源类型（默认 image,media,font）
+#     UPLOAD_ROUTE_ALLOW_<PLATFORM>     平台额外放行的 URL 片段，逗号分隔，如 UPLOAD_ROUTE_ALLOW_KUAISHOU=yximgs.com
+# ---------------------------
+# 第三方统计/埋点/监控域名（按域名后缀匹配）
+TRACKER_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "hm.baidu.com", "cnzz.com", "umeng.com", "growingio.com", "sensorsdata.cn",
+    "sentry.io", "mcs.snssdk.com", "mon.snssdk.com", "mcs.zijieapi.com", "mon.zijieapi.com",
+)
+# 任何平台都放行的 URL 片段：验证码、登录二维码被拦截会导致无法人工处理风控
+ALWAYS_ALLOW = ("captcha", "verify", "qrcode")
+# 平台默认放行的 URL 片段
+PLATFORM_ALLOW: Dict[str, tuple] = {
+    # 智能推荐封面从图片 CDN 加载，选封面流程需要
+    SOCIAL_MEDIA_DOUYIN: ("douyinpic.com", "byteimg.com"),
+    SOCIAL_MEDIA_TENCENT: (),
+    SOCIAL_MEDIA_KUAISHOU: (),
+    SOCIAL_MEDIA_XIAOHONGSHU: (),
+}
+# 被拦截请求的估算大小（字节），请求未发出无法得知实际大小
+_ESTIMATED_BYTES = {'image': 40_000, 'media': 1_000_000, 'font': 60_000, 'tracker': 20_000}
+
+_route_stats: Dict[str, Dict] = {}
+_route_stats_lock = threading.Lock()
+
+
+def _blocked_types() -> frozenset:
+    spec = os.environ.get("UPLOAD_BLOCK_RESOURCE_TYPES", "image,media,font")
+    return frozenset(t.strip() for t in spec.split(',') if t.strip())
+
+
+def _allow_patterns(platform: str) -> tuple:
+    extra = os.environ.get(f"UPLOAD_ROUTE_ALLOW_{platform.upper()}", "")
+    return ALWAYS_ALLOW + PLATFORM_ALLOW.get(platform, ()) + tuple(p.strip() for p in extra.split(',') if p.strip())
+
+
+def _is_tracker(url: str) -> bool:
+    host = (urlsplit(url).hostname or '').lower()
+    return any(host == d or host.endswith('.' + d) for d in TRACKER_DOMAINS)
+
+
+def _count(platform: str, blocked_as: str = None):
+    with _route_stats_lock:
+        stats = _route_stats.setdefault(platform, {
+            'requests': 0, 'blocked': 0, 'blocked_by_type': {}, 'estimated_bytes_saved': 0,
+        })
+        stats['requests'] += 1
+        if blocked_as:
+            stats['blocked'] += 1
+            stats['blocked_by_type'][blocked_as] = stats['blocked_by_type'].get(blocked_as, 0) + 1
+            stats['estimated_bytes_saved'] += _ESTIMATED_BYTES.get(blocked_as, 0)
+
+
+def get_route_filter_stats() -> Dict[str, Dict]:
+    """各平台请求过滤统计（拦截数量按类型、估算节省流量）"""
+    with _route_stats_lock:
+        return {
+            platform: {**stats, 'blocked_by_type': dict(stats['blocked_by_type'])}
+            for platform, stats in _route_stats.items()
+        }
+
+
+async def set_route_filter(context, platform: str):
+    """
+    为上传用的 BrowserContext 拦截非必要请求（不要用于登录页面）
+    :param context: BrowserContext
+    :param platform: 平台名（SOCIAL_MEDIA_*），用于平台放行规则和统计
+    """
+    if os.environ.get("UPLOAD_ROUTE_FILTER", "1") != "1":
+        return context
+    blocked_types = _blocked_types()
+    allow = _allow_patterns(platform)
+
+    async def handle(route):
+        request = route.request
+        url = request.url
+        blocked_as = None
+        if not any(p in url for p in allow):
+            if request.resource_type in blocked_types:
+                blocked_as = request.resource_type
+            elif _is_tracker(url):
+                blocked_as = 'tracker'
+        _count(platform, blocked_as)
+        if blocked_as:
+            await route.abort()
+        else:
+            await route.fallback()
+
+    await context.route("**/*", handle)
+    return context
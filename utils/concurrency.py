@@ -0,0 +1,123 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Optional
+
+
+def parse_limit_spec(spec: str, default=None, value_type: Callable = int) -> Dict[str, object]:
+    """
+    解析形如 "3=2,4=1,*=4" 的并发/限额配置
+    :param str spec: 配置字符串，"*" 表示默认值
+    :param default: 未配置 "*" 时的默认值
+    :param value_type: 值的解析函数（默认 int）
+    :returns: {key: limit}，key 为字符串
+    """
+    limits = {}
+    if default is not None:
+        limits['*'] = value_type(default)
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part or '=' not in part:
+            continue
+        key, value = part.split('=', 1)
+        try:
+            limits[key.strip()] = value_type(value.strip())
+        except ValueError:
+            print(f"Invalid limit spec ignored: {part}")
+    return limits
+
+
+class KeyedSemaphore:
+    """
+    按 key 分组的信号量（如：按平台、按账号、按代理限制并发）
+    必须在同一个事件循环内使用。
+    """
+
+    def __init__(self, limit_for: Callable[[Hashable], Optional[int]]):
+        """
+        :param limit_for: 根据 key 返回并发上限，返回 None/<=0 表示不限制
+        """
+        self._limit_for = limit_for
+        self._limits: Dict[Hashable, Optional[int]] = {}
+        self._active: Dict[Hashable, int] = {}
+        self._waiters: Dict[Hashable, Deque[asyncio.Future]] = {}
+
+    @classmethod
+    def from_spec(cls, limits: Dict[str, int]) -> "KeyedSemaphore":
+        return cls(lambda key: limits.get(str(key), limits.get('*')))
+
+    def limit(self, key) -> Optional[int]:
+        if key not in self._limits:
+            limit = self._limit_for(key)
+            self._limits[key] = limit if limit and limit > 0 else None
+        return self._limits[key]
+
+    def locked(self, key) -> bool:
+        limit = self.limit(key)
+        return limit is not None and self._active.get(key, 0) >= limit
+
+    def try_acquire(self, key) -> bool:
+        """非阻塞获取，成功返回 True"""
+        if self.locked(key) or self._waiters.get(key):
+            return False
+        self._active[key] = self._active.get(key, 0) + 1
+        return True
+
+    async def acquire(self, key):
+        if self.try_acquire(key):
+            return
+        waiters = self._waiters.setdefault(key, deque())
+        while True:
+            fut = asyncio.get_running_loop().create_future()
+            waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                # 已被唤醒但随即取消：把名额让给下一个等待者
+                if fut.done() and not fut.cancelled():
+                    self._wake_next(key)
+                raise
+            finally:
+                try:
+                    waiters.remove(fut)
+                except ValueError:
+                    pass
+                if not waiters:
+                    self._waiters.pop(key, None)
+            if not self.locked(key):
+                break
+            waiters = self._waiters.setdefault(key, deque())
+        self._active[key] = self._active.get(key, 0) + 1
+
+    def release(self, key):
+        count = self._active.get(key, 0) - 1
+        if count <= 0:
+            self._active.pop(key, None)
+        else:
+            self._active[key] = count
+        self._wake_next(key)
+
+    def _wake_next(self, key):
+        for fut in self._waiters.get(key, ()):
+            if not fut.done():
+                fut.set_result(None)
+                break
+
+    def slot(self, key) -> "_KeyedSlot":
+        """async with limiter.slot(key): ..."""
+        return _KeyedSlot(self, key)
+
+    def active(self) -> Dict[Hashable, int]:
+        return dict(self._active)
+
+
+class _KeyedSlot:
+    def __init__(self, owner: KeyedSemaphore, key):
+        self._owner = owner
+        self._key = key
+
+    async def __aenter__(self):
+        await self._owner.acquire(self._key)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._owner.release(self._key)
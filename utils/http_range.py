@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+按 HTTP Range / 条件请求返回本地文件（视频预览拖动进度条时只传输需要的部分）
+
+- Range：单个区间返回 206；多个区间返回 206 multipart/byteranges（相邻区间合并）；
+  区间全部越界返回 416；If-Range 不匹配时忽略 Range 返回完整文件
+- 条件请求：ETag（优先使用入库的内容哈希，否则由文件大小 + 修改时间生成）和 Last-Modified，
+  If-None-Match / If-Modified-Since 命中时返回 304
+- 零拷贝：WSGI 服务器提供 wsgi.file_wrapper 时（gunicorn、waitress 等），完整文件和到文件末尾的区间
+  交给服务器发送（gunicorn 使用 sendfile）；其余情况按块读取
+
+配置（环境变量）：
+    FILE_SENDFILE           是否使用 wsgi.file_wrapper（默认1）
+    FILE_RANGE_MAX_RANGES   单个请求最多的区间数，超过时返回完整文件（默认16）
+"""
+import mimetypes
+import os
+import unicodedata
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import is_resource_modified
+from werkzeug.wrappers import Request, Response
+
+# 按块读取的缓冲大小
+READ_BUFFER_SIZE = 256 * 1024
+
+
+def _read_range(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(READ_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _body(request: Request, path: str, start: int, length: int, size: int):
+    """文件 [start, start + length) 的响应体"""
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    # 只有区间到文件末尾时交给 file_wrapper：不按 Content-Length 截断的服务器也不会多发数据
+    # 浏览器拖动视频进度条发送的正是 "bytes=N-"
+    if (file_wrapper is not None and length > 0 and start + length == size
+            and os.environ.get("FILE_SENDFILE", "1") == "1"):
+        # 从文件当前偏移发送（gunicorn 使用 os.sendfile）
+        f = open(path, 'rb')
+        f.seek(start)
+        return file_wrapper(f, READ_BUFFER_SIZE)
+    return _read_range(path, start, length)
+
+
+def _content_disposition(headers: Headers, download_name: str):
+    try:
+        download_name.encode('ascii')
+        headers.set('Content-Disposition', 'attachment', filename=download_name)
+    except UnicodeEncodeError:
+        # 中文文件名：filename 为 ASCII 回退，filename* 为 UTF-8
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        headers.set('Content-Disposition', 'attachment', **{
+            'filename': simple,
+            'filename*': f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}",
+        })
+
+
+def _resolve_ranges(request: Request, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    解析 Range 头
+    :returns: 合并后的 [(start, stop), ...]；未请求 Range 返回 None，区间全部越界返回 []
+    """
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes':
+        return None
+    ranges = []
+    for start, stop in byte_range.ranges:
+        if start < 0:
+            start, stop = max(0, size + start), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            ranges.append((start, stop))
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, stop in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _if_range_matches(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return if_range.date >= last_modified
+    return True
+
+
+def send_range_file(
+    request: Request,
+    path: str,
+    etag: str = None,
+    mimetype: str = None,
+    as_attachment: bool = False,
+    download_name: str = None,
+) -> Response:
+    """
+    返回本地文件，支持 Range 和条件请求
+    :param etag: 强 ETag（如文件内容的 MD5）；为空时由文件大小 + 修改时间生成
+    :param download_name: 下载文件名（as_attachment 时使用，默认取文件名）
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = etag or f"{size:x}-{stat.st_mtime_ns:x}"
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    headers = Headers()
+    headers['Accept-Ranges'] = 'bytes'
+    if as_attachment:
+        _content_disposition(headers, download_name or os.path.basename(path))
+
+    def respond(body, status: int, length: Optional[int], content_type: str = mimetype) -> Response:
+        response = Response(body, status=status, headers=headers, content_type=content_type, direct_passthrough=True)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        if length is not None:
+            response.content_length = length
+        return response
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return respond(b'', 304, None)
+
+    ranges = None
+    if _if_range_matches(request, etag, last_modified):
+        ranges = _resolve_ranges(request, size)
+    max_ranges = int(os.environ.get("FILE_RANGE_MAX_RANGES", "16"))
+    if ranges is not None and len(ranges) > max_ranges:
+        ranges = None
+
+    if ranges is None:
+        return respond(_body(request, path, 0, size, size), 200, size)
+    if not ranges:
+        headers['Content-Range'] = f"bytes */{size}"
+        return respond(b'', 416, 0)
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+        return respond(_body(request, path, start, stop - start, size), 206, stop - start)
+
+    # 多个区间：multipart/byteranges，每个分段带自己的 Content-Type / Content-Range
+    boundary = uuid.uuid4().hex
+    parts = [
+        (
+            f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n".encode('latin-1'),
+            start, stop,
+        )
+        for start, stop in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode('latin-1')
+    length = sum(len(head) + (stop - start) for head, start, stop in parts) + 2 * (len(parts) - 1) + len(closing)
+
+    def multipart() -> Iterator[bytes]:
+        for index, (head, start, stop) in enumerate(parts):
+            yield (b'\r\n' if index else b'') + head
+            yield from _read_range(path, start, stop - start)
+        yield closing
+
+    return respond(multipart(), 206, length, content_type=f"multipart/byteranges; boundary={boundary}")
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+媒体文件信息探测（时长、宽高、编码）
+
+    probe_mp4(path)      纯 Python 解析 MP4/MOV 的 box 结构，只读取 moov 中的头部信息，不依赖外部程序
+    probe_ffprobe(path)  调用 ffprobe 子进程（支持 MP4 以外的容器和图片），需安装 ffmpeg
+
+返回统一的字典：{'duration': 秒, 'width', 'height', 'codec', 'rotation'}，
+width/height 为按旋转角度修正后的显示尺寸（手机竖拍视频通常存储为横向 + 90° 旋转）。
+"""
+import asyncio
+import json
+import math
+import shutil
+import struct
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+# 可由 probe_mp4 解析的扩展名
+MP4_EXTENSIONS = {'.mp4', '.m4v', '.mov', '.3gp'}
+
+# 需要进入内部查找的容器 box
+_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+class MediaProbeError(Exception):
+    """无法解析媒体文件"""
+
+
+def _iter_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """遍历 [start, end) 范围内的 box，返回 (类型, 内容起始位置, 内容结束位置)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise MediaProbeError(f"box 大小非法: {box_type!r} size={size}")
+        if offset + size > end:
+            raise MediaProbeError(f"文件被截断或结构损坏: {box_type!r}")
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _read_at(f: BinaryIO, offset: int, length: int) -> bytes:
+    f.seek(offset)
+    data = f.read(length)
+    if len(data) < length:
+        raise MediaProbeError("文件被截断")
+    return data
+
+
+def _parse_mvhd(f: BinaryIO, start: int) -> float:
+    version = _read_at(f, start, 1)[0]
+    if version == 1:
+        timescale, duration = struct.unpack('>IQ', _read_at(f, start + 20, 12))
+    else:
+        timescale, duration = struct.unpack('>II', _read_at(f, start + 12, 8))
+    return duration / timescale if timescale else 0.0
+
+
+def _parse_tkhd(f: BinaryIO, start: int) -> Tuple[int, int, int]:
+    """返回 (width, height, rotation)"""
+    version = _read_at(f, start, 1)[0]
+    # version 0/1 的时间字段长度不同，matrix 和宽高在其后
+    matrix_offset = start + (52 if version == 1 else 40)
+    a, b = struct.unpack('>ii', _read_at(f, matrix_offset, 8))
+    width, height = struct.unpack('>II', _read_at(f, matrix_offset + 36, 8))
+    rotation = int(round(math.degrees(math.atan2(b, a)))) % 360
+    return width >> 16, height >> 16, rotation
+
+
+def _parse_trak(f: BinaryIO, start: int, end: int) -> Optional[Dict]:
+    """解析一个 track，非视频 track 返回 None"""
+    track = {}
+    stack = [(start, end)]
+    while stack:
+        box_start, box_end = stack.pop()
+        for box_type, content_start, content_end in _iter_boxes(f, box_start, box_end):
+            if box_type == b'tkhd':
+                track['width'], track['height'], track['rotation'] = _parse_tkhd(f, content_start)
+            elif box_type == b'hdlr':
+                track['handler'] = _read_at(f, content_start + 8, 4)
+            elif box_type == b'stsd':
+                # version/flags(4) + entry_count(4) + 第一个 entry 的 size(4) + format(4)
+                track['codec'] = _read_at(f, content_start + 12, 4).decode('latin-1').strip()
+            elif box_type in _CONTAINER_BOXES:
+                stack.append((content_start, content_end))
+    if track.get('handler') != b'vide':
+        return None
+    return track
+
+
+def probe_mp4(path) -> Dict:
+    """
+    解析 MP4/MOV 文件头（只读取 box 头部和 moov，与文件大小无关）
+    :raises MediaProbeError: 不是 MP4 容器或结构损坏（如 moov 缺失：文件未传完整）
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        moov = None
+        for index, (box_type, content_start, content_end) in enumerate(_iter_boxes(f, 0, file_size)):
+            if index == 0 and box_type not in (b'ftyp', b'moov', b'wide', b'free', b'mdat', b'skip'):
+                raise MediaProbeError("不是 MP4/MOV 文件")
+            if box_type == b'moov':
+                moov = (content_start, content_end)
+                break
+        if moov is None:
+            raise MediaProbeError("缺少 moov box（文件不完整或不是 MP4/MOV 文件）")
+
+        duration = 0.0
+        video = None
+        for box_type, content_start, content_end in _iter_boxes(f, *moov):
+            if box_type == b'mvhd':
+                duration = _parse_mvhd(f, content_start)
+            elif box_type == b'trak' and video is None:
+                video = _parse_trak(f, content_start, content_end)
+
+    info = {'duration': round(duration, 3), 'width': None, 'height': None, 'codec': None, 'rotation': 0}
+    if video:
+        width, height, rotation = video.get('width'), video.get('height'), video.get('rotation', 0)
+        if rotation in (90, 270):
+            width, height = height, width
+        info.update({'width': width, 'height': height, 'codec': video.get('codec'), 'rotation': rotation})
+    return info
+
+
+def ffprobe_available() -> bool:
+    return shutil.which('ffprobe') is not None
+
+
+async def probe_ffprobe(path, timeout: float = 30) -> Dict:
+    """
+    调用 ffprobe 获取媒体信息
+    :raises MediaProbeError: ffprobe 执行失败或超时
+    """
+    proc = await asyncio.create_subprocess_exec(
+        'ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', str(path),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise MediaProbeError(f"ffprobe 超时（{timeout:.0f}秒）")
+    if proc.returncode != 0:
+        raise MediaProbeError(f"ffprobe 失败: {stderr.decode(errors='replace').strip()[:200]}")
+
+    data = json.loads(stdout or b'{}')
+    video = next((s for s in data.get('streams', []) if s.get('codec_type') == 'video'), None)
+    duration = (data.get('format') or {}).get('duration') or (video or {}).get('duration')
+    info = {
+        'duration': round(float(duration), 3) if duration not in (None, 'N/A') else None,
+        'width': None, 'height': None, 'codec': None, 'rotation': 0,
+    }
+    if video:
+        rotation = int(float((video.get('tags') or {}).get('rotate', 0)))
+        for side_data in video.get('side_data_list') or []:
+            if 'rotation' in side_data:
+                rotation = int(float(side_data['rotation']))
+        rotation %= 360
+        width, height = video.get('width'), video.get('height')
+        if rotation in (90, 270):
+            width, height = height, width
+        info.update({'width': width, 'height': height, 'codec': video.get('codec_name'), 'rotation': rotation})
+    return info
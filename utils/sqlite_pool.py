@@ -0,0 +1,195 @@
+"""
+SQLite 连接池
+
+每个线程复用一个长连接（sqlite3 连接不能跨线程使用），连接创建时统一设置：
+    journal_mode=WAL       读写不互相阻塞，多 worker 进程共享数据库时减少锁竞争
+    synchronous=NORMAL     WAL 模式下安全且明显减少 fsync
+    mmap_size / busy_timeout / cached_statements
+
+用法与 sqlite3.connect 保持一致，conn.close() 只是归还连接（未提交的事务会回滚）：
+    conn = get_connection()
+    try:
+        ...
+        conn.commit()
+    finally:
+        conn.close()
+
+    with get_connection(foreign_keys=False) as conn:   # 退出时提交/回滚并归还
+        ...
+
+同一线程内嵌套借出时共用同一连接：只有最外层的 with 提交/回滚事务，
+内层的 with 使用 SAVEPOINT，异常时只回滚内层的修改（ROLLBACK TO）。
+
+可通过环境变量调整：SQLITE_JOURNAL_MODE、SQLITE_SYNCHRONOUS、SQLITE_MMAP_SIZE、
+SQLITE_BUSY_TIMEOUT_MS、SQLITE_CACHED_STATEMENTS
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from conf import BASE_DIR
+
+DEFAULT_DB_PATH = BASE_DIR / "db" / "database.db"
+
+
+class _ThreadState:
+    """线程内的连接及其借出深度（同一线程内嵌套获取共用同一连接）"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.depth = 0
+        self.foreign_keys: Optional[bool] = None
+
+
+class PooledConnection:
+    """连接代理：close() 归还连接而不是关闭，其余属性/方法透传给 sqlite3.Connection"""
+
+    __slots__ = ('_state', '_released', '_savepoint')
+
+    def __init__(self, state: _ThreadState):
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, '_released', False)
+        object.__setattr__(self, '_savepoint', None)
+
+    def __getattr__(self, name):
+        return getattr(self._state.conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._state.conn, name, value)
+
+    def close(self):
+        """归还连接；最外层归还时回滚未提交的事务"""
+        if self._released:
+            return
+        object.__setattr__(self, '_released', True)
+        state = self._state
+        state.depth -= 1
+        if state.depth <= 0:
+            state.depth = 0
+            if state.conn.in_transaction:
+                state.conn.rollback()
+
+    def __enter__(self):
+        state = self._state
+        if state.depth > 1:
+            # 嵌套借出：事务由外层负责，内层只建立保存点
+            # 先显式 BEGIN，避免最外层保存点的 RELEASE 直接提交事务
+            if not state.conn.in_transaction:
+                state.conn.execute("BEGIN")
+            savepoint = f"pool_sp_{state.depth}"
+            state.conn.execute(f"SAVEPOINT {savepoint}")
+            object.__setattr__(self, '_savepoint', savepoint)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        conn = self._state.conn
+        try:
+            if self._savepoint is not None:
+                self._end_savepoint(rollback=exc_type is not None)
+            elif self._state.depth == 1:
+                if exc_type is None:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def _end_savepoint(self, rollback: bool):
+        conn = self._state.conn
+        if not conn.in_transaction:
+            # 内层显式 commit()/rollback() 已结束事务，保存点随之释放
+            return
+        try:
+            if rollback:
+                conn.execute(f"ROLLBACK TO {self._savepoint}")
+            conn.execute(f"RELEASE {self._savepoint}")
+        except sqlite3.OperationalError:
+            # 保存点已被内层的 commit()/rollback() 释放
+            pass
+
+
+class SQLitePool:
+    """单个数据库文件的连接池（按线程复用连接）"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        self.journal_mode = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+        self.synchronous = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+        self.mmap_size = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.busy_timeout_ms = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self.cached_statements = int(os.environ.get("SQLITE_CACHED_STATEMENTS", "256"))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'connections': 0, 'checkouts': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        with self._lock:
+            self._stats['connections'] += 1
+        return conn
+
+    def connection(self, foreign_keys: bool = True) -> PooledConnection:
+        """
+        借出当前线程的连接
+        :param foreign_keys: 是否启用外键约束（仅在没有未完成事务时切换）
+        """
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            state = _ThreadState(self._connect())
+            self._local.state = state
+        if state.depth == 0:
+            if state.conn.in_transaction:
+                state.conn.rollback()
+            if state.foreign_keys is not foreign_keys:
+                state.conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+                state.foreign_keys = foreign_keys
+        state.conn.row_factory = sqlite3.Row
+        state.depth += 1
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return PooledConnection(state)
+
+    def close_thread_connection(self):
+        """关闭当前线程的连接（线程退出前可调用，线程结束后连接也会随之回收）"""
+        state = getattr(self._local, 'state', None)
+        if state is not None:
+            self._local.state = None
+            state.conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'db_path': self.db_path, 'journal_mode': self.journal_mode}
+
+
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Union[str, Path] = None) -> SQLitePool:
+    """获取数据库文件对应的连接池（进程内单例）"""
+    key = str(db_path or DEFAULT_DB_PATH)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = SQLitePool(key)
+                _pools[key] = pool
+    return pool
+
+
+def get_connection(db_path: Union[str, Path] = None, foreign_keys: bool = True) -> PooledConnection:
+    """从连接池借出连接（row_factory 为 sqlite3.Row）"""
+    return get_pool(db_path).connection(foreign_keys=foreign_keys)
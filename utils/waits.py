@@ -0,0 +1,151 @@
+"""
+上传器等待工具
+用页面事件（元素出现、URL 变化、网络响应）代替固定 sleep，并区分「观感延迟」与「真正的等待」：
+
+    pace(seconds)        观感/防风控的节奏延迟，UPLOAD_PACING=fast 时跳过
+    wait_visible         等待元素出现，超时返回 False 而不是抛异常
+    wait_for_any         等待多个候选元素中任意一个出现，返回命中的 key
+    wait_for_response    等待匹配的网络响应
+    poll_until           轮询条件直到满足或超时（无法用事件表达的状态）
+    StepTimer            记录每个步骤耗时，上传结束时输出报告
+
+配置（环境变量）：
+    UPLOAD_PACING   normal（默认，保留原有节奏延迟）/ fast（去掉观感延迟，只保留事件等待）
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+def pacing_mode() -> str:
+    return os.environ.get("UPLOAD_PACING", "normal").lower()
+
+
+async def pace(seconds: float):
+    """观感/节奏延迟（fast 模式下跳过）"""
+    if pacing_mode() != "fast" and seconds > 0:
+        await asyncio.sleep(seconds)
+
+
+async def wait_visible(page, selector: str, timeout: float = 10000, state: str = "visible") -> bool:
+    """
+    等待元素达到指定状态
+    :param timeout: 毫秒
+    :returns: 是否在超时前满足
+    """
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def wait_for_any(
+    page,
+    selectors: Union[Dict[str, str], List[str]],
+    timeout: float = 10000,
+    state: str = "visible",
+) -> Optional[str]:
+    """
+    等待多个候选元素中任意一个出现
+    :param selectors: {key: selector} 或 selector 列表（key 为 selector 本身）
+    :param timeout: 毫秒
+    :returns: 最先出现的 key；超时返回 None
+    """
+    if not isinstance(selectors, dict):
+        selectors = {s: s for s in selectors}
+
+    async def watch(key: str, selector: str) -> str:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return key
+
+    tasks = [asyncio.ensure_future(watch(k, s)) for k, s in selectors.items()]
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return task.result()
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def wait_for_response(
+    page,
+    match: Union[str, Callable],
+    action: Callable[[], Awaitable] = None,
+    timeout: float = 30000,
+):
+    """
+    等待匹配的网络响应
+    :param match: URL 片段或 Playwright 响应谓词
+    :param action: 触发请求的操作（如点击发布），在开始监听后执行，避免错过响应
+    :param timeout: 毫秒
+    :returns: Response；超时返回 None
+    """
+    predicate = (lambda r: match in r.url) if isinstance(match, str) else match
+    try:
+        async with page.expect_response(predicate, timeout=timeout) as info:
+            if action is not None:
+                await action()
+        return await info.value
+    except PlaywrightTimeoutError:
+        return None
+
+
+async def poll_until(
+    condition: Callable[[], Awaitable[bool]],
+    timeout: float = None,
+    interval: float = 0.5,
+) -> bool:
+    """
+    轮询条件直到满足
+    :param timeout: 秒，为空时一直等待
+    :param interval: 轮询间隔（秒）
+    :returns: 是否在超时前满足
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if await condition():
+            return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+
+
+class StepTimer:
+    """上传步骤计时"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps: Dict[str, float] = {}
+        self._start = time.monotonic()
+
+    @contextmanager
+    def step(self, step_name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.steps[step_name] = self.steps.get(step_name, 0.0) + time.monotonic() - start
+
+    def report(self) -> Dict:
+        return {
+            'name': self.name,
+            'pacing': pacing_mode(),
+            'total': round(time.monotonic() - self._start, 2),
+            'steps': {k: round(v, 2) for k, v in self.steps.items()},
+        }
+
+    def format(self) -> str:
+        report = self.report()
+        steps = ', '.join(f"{k}={v}s" for k, v in report['steps'].items())
+        return f"[{report['name']}] 总耗时 {report['total']}s ({report['pacing']}): {steps}"